@@ -17,7 +17,7 @@ export default function Home() {
   useEffect(() => {
     const loadProducts = async () => {
       try {
-        const products = await productsApi.getAll();
+        const { products } = await productsApi.getCatalog();
         setFeaturedProducts(products.slice(0, 3));
       } catch (error) {
         console.error('Failed to fetch featured products:', error);
@@ -34,6 +34,22 @@ export default function ProductPage() {
     loadProduct();
   }, [productId]);
 
+  // Live stock: merge pushed counts into the loaded variants
+  const loadedId = product?.id;
+  useEffect(() => {
+    if (loadedId === undefined) return;
+    return productsApi.subscribeStock(loadedId, (updates) => {
+      const stockById = new Map(updates.map((update) => [update.id, update.stock]));
+      setProduct((current) => {
+        if (!current?.variants) return current;
+        const variants = current.variants.map((variant) =>
+          stockById.has(variant.id) ? { ...variant, stock: stockById.get(variant.id)! } : variant
+        );
+        return { ...current, variants, stock: variants.reduce((total, variant) => total + variant.stock, 0) };
+      });
+    });
+  }, [loadedId]);
+
   const loadProduct = async () => {
     try {
       setLoading(true);
@@ -166,7 +182,7 @@ export default function ProductPage() {
                   className="relative aspect-square"
                 >
                   <Image
-                    src={product.image}
+                    src={product.image_medium || product.image}
                     alt={product.name}
                     width={600}
                     height={600}
@@ -3,7 +3,7 @@
 import { useState, useEffect } from 'react';
 import { useSearchParams } from 'next/navigation';
 import { motion } from 'framer-motion';
-import { productsApi, Product } from '@/lib/api';
+import { GRID_FIELDS, productsApi, Product } from '@/lib/api';
 import { Input } from '@/components/ui/input';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Skeleton } from '@/components/ui/skeleton';
@@ -35,6 +35,8 @@ export default function ShopPage() {
       const data = await productsApi.getAll({
         team: teamFilter || undefined,
         search: search || undefined,
+        fields: GRID_FIELDS,
+        expand: 'variants',
       });
       setProducts(data);
     } catch (err) {
@@ -80,7 +80,7 @@ export default function ProductCard({ product }: ProductCardProps) {
         <Card className="hover:shadow-lg hover:border-amber-600 transition-all duration-300 overflow-hidden border border-gray-200 dark:border-gray-800 bg-white dark:bg-gray-900 rounded-none">
           <div className="relative overflow-hidden aspect-square">
             <Image
-              src={product.image}
+              src={product.image_thumb || product.image}
               alt={product.name}
               width={400}
               height={400}
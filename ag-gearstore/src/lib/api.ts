@@ -17,6 +17,8 @@ export interface Product {
   base_price: string;
   stock: number;
   image: string;
+  image_thumb: string;
+  image_medium: string;
   team: string;
   description: string;
   category: {
@@ -27,6 +29,40 @@ export interface Product {
   variants?: ProductVariant[];
 }
 
+export interface CatalogSnapshot {
+  categories: Array<{ id: number; name: string; slug: string }>;
+  products: Product[];
+}
+
+export interface FacetCount {
+  value: string;
+  count: number;
+}
+
+export interface ProductFacets {
+  total: number;
+  teams: FacetCount[];
+  sizes: FacetCount[];
+  price_bands: Array<FacetCount & { min: number | null; max: number | null }>;
+}
+
+export interface Suggestion {
+  type: 'product' | 'team' | 'category';
+  label: string;
+  id?: number;
+  slug?: string;
+}
+
+export interface RelatedProduct {
+  id: number;
+  name: string;
+  base_price: string;
+  team: string;
+  image: string;
+  image_thumb: string;
+  score: number;
+}
+
 export interface ApiResponse<T> {
   data: T;
   error?: string;
@@ -64,28 +100,103 @@ async function apiRequest<T>(endpoint: string, options?: RequestInit): Promise<T
   }
 }
 
+// What ProductCard renders: no description or category, variants for quick add
+export const GRID_FIELDS = 'id,name,base_price,image,image_thumb,team,stock,variants';
+
 export const productsApi = {
-  async getAll(params?: { team?: string; search?: string; price_min?: string; price_max?: string }): Promise<Product[]> {
+  async getAll(params?: {
+    team?: string;
+    search?: string;
+    price_min?: string;
+    price_max?: string;
+    // Sparse fieldsets, e.g. GRID_FIELDS; omit for the full product
+    fields?: string;
+    expand?: string;
+  }): Promise<Product[]> {
     const searchParams = new URLSearchParams();
     if (params?.team) searchParams.append('team', params.team);
     if (params?.search) searchParams.append('search', params.search);
     if (params?.price_min) searchParams.append('price_min', params.price_min);
     if (params?.price_max) searchParams.append('price_max', params.price_max);
+    if (params?.fields) searchParams.append('fields', params.fields);
+    if (params?.expand !== undefined) searchParams.append('expand', params.expand);
 
     const query = searchParams.toString();
     return apiRequest<Product[]>(`/api/store/products/${query ? `?${query}` : ''}`);
   },
 
+  // Counts per team, in-stock size and price band for the same filters as getAll
+  async getFacets(params?: {
+    team?: string;
+    search?: string;
+    price_min?: string;
+    price_max?: string;
+    size_available?: string;
+  }): Promise<ProductFacets> {
+    const searchParams = new URLSearchParams();
+    Object.entries(params ?? {}).forEach(([key, value]) => {
+      if (value) searchParams.append(key, value);
+    });
+
+    const query = searchParams.toString();
+    return apiRequest<ProductFacets>(`/api/store/products/facets/${query ? `?${query}` : ''}`);
+  },
+
+  // Typeahead matches on product names, teams and categories; cheap enough per keystroke
+  async suggest(q: string, limit = 8): Promise<Suggestion[]> {
+    const searchParams = new URLSearchParams({ q, limit: String(limit) });
+    return apiRequest<Suggestion[]>(`/api/store/products/suggest/?${searchParams}`);
+  },
+
+  // Pre-built snapshot of the whole catalog; the browser revalidates it by ETag
+  async getCatalog(): Promise<CatalogSnapshot> {
+    return apiRequest<CatalogSnapshot>('/api/store/catalog/', { cache: 'no-cache' });
+  },
+
   async getById(id: number): Promise<Product> {
     return apiRequest<Product>(`/api/store/products/${id}/`);
   },
 
+  // "Fans also bought", rebuilt offline from paid orders
+  async getRelated(id: number): Promise<RelatedProduct[]> {
+    return apiRequest<RelatedProduct[]>(`/api/store/products/${id}/related/`);
+  },
+
+  // Live variant stock over server-sent events; returns a function that stops listening
+  subscribeStock(id: number, onStock: (variants: Array<{ id: number; size: string; stock: number }>) => void) {
+    const source = new EventSource(`${API_URL}/api/store/products/${id}/stock/stream/`);
+    source.addEventListener('stock', (event) => onStock(JSON.parse((event as MessageEvent).data)));
+    return () => source.close();
+  },
+
   async getCategories() {
     return apiRequest<Array<{ id: number; name: string; slug: string }>>('/api/store/categories/');
   },
 };
 
+export interface CheckoutQuote {
+  quote_id: string;
+  items: Array<{ variant_id: number; product_name: string; size: string; quantity: number; price: number; subtotal: number }>;
+  subtotal_usd: string;
+  points: number;
+  subtotal: number;
+  delivery_fee: number;
+  total: number;
+  expires_at: number;
+}
+
 export const checkoutApi = {
+  // Price the cart once; pass quote_id to payment/initialize or auth-checkout
+  async quote(cartItems: Array<{ variant_id: number; quantity: number }>, deliveryFee: number) {
+    return apiRequest<CheckoutQuote>(
+      '/api/store/checkout/quote/',
+      {
+        method: 'POST',
+        body: JSON.stringify({ cart_items: cartItems, delivery_fee: deliveryFee }),
+      }
+    );
+  },
+
   async guestCheckout(cartItems: Array<{ product_id: number; quantity: number }>) {
     return apiRequest<{ order_id: string }>(
       '/api/store/guest-checkout/',
@@ -106,3 +217,72 @@ export const checkoutApi = {
     );
   },
 };
+
+export interface ServerCartLine {
+  variant_id: number;
+  product_id: number;
+  product_name: string;
+  size: string;
+  image: string;
+  quantity: number;
+  unit_price: string;
+  added_price: string;
+  price_changed: boolean;
+  available_stock: number;
+  in_stock: boolean;
+  subtotal: string;
+}
+
+export interface ServerCart {
+  items: ServerCartLine[];
+  item_count: number;
+  subtotal: string;
+  valid: boolean;
+  cart_token: string | null;
+}
+
+function cartRequest(endpoint: string, options: RequestInit = {}): Promise<ServerCart> {
+  const cartToken = localStorage.getItem('cart_token');
+  const authToken = localStorage.getItem('access_token');
+  return apiRequest<ServerCart>(endpoint, {
+    ...options,
+    headers: {
+      'Content-Type': 'application/json',
+      ...(authToken && { Authorization: `Bearer ${authToken}` }),
+      ...(cartToken && { 'X-Cart-Token': cartToken }),
+    },
+  }).then((cart) => {
+    // Guests keep their token; after login the guest cart has been merged
+    if (cart.cart_token) localStorage.setItem('cart_token', cart.cart_token);
+    else localStorage.removeItem('cart_token');
+    return cart;
+  });
+}
+
+export const cartApi = {
+  async get() {
+    return cartRequest('/api/store/cart/');
+  },
+
+  async addItem(variantId: number, quantity: number) {
+    return cartRequest('/api/store/cart/items/', {
+      method: 'POST',
+      body: JSON.stringify({ variant_id: variantId, quantity }),
+    });
+  },
+
+  async updateItem(variantId: number, quantity: number) {
+    return cartRequest(`/api/store/cart/items/${variantId}/`, {
+      method: 'PATCH',
+      body: JSON.stringify({ quantity }),
+    });
+  },
+
+  async removeItem(variantId: number) {
+    return cartRequest(`/api/store/cart/items/${variantId}/`, { method: 'DELETE' });
+  },
+
+  async clear() {
+    return cartRequest('/api/store/cart/', { method: 'DELETE' });
+  },
+};
@@ -21,10 +21,13 @@ interface LoginData {
 }
 
 export const login = async (data: LoginData): Promise<LoginResponse> => {
+  // The backend merges this guest cart into the account on login
+  const cartToken = localStorage.getItem('cart_token');
   const response = await fetch(`${API_URL}/api/users/login/`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
+      ...(cartToken && { 'X-Cart-Token': cartToken }),
     },
     body: JSON.stringify(data),
   });
@@ -37,6 +40,7 @@ export const login = async (data: LoginData): Promise<LoginResponse> => {
   const tokens: LoginResponse = await response.json();
   localStorage.setItem('access_token', tokens.access);
   localStorage.setItem('refresh_token', tokens.refresh);
+  localStorage.removeItem('cart_token');
   return tokens;
 };
 
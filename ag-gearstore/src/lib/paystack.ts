@@ -6,10 +6,12 @@ const API_URL = 'http://localhost:8000';
 
 export interface PaymentInitializeData {
   email: string;
-  cart_items: Array<{
+  // Either the cart, or a quote id from checkoutApi.quote
+  cart_items?: Array<{
     variant_id: number;
     quantity: number;
   }>;
+  quote_id?: string;
 }
 
 export interface PaymentInitializeResponse {
@@ -41,20 +43,38 @@ export interface PaymentVerifyResponse {
  * Initialize payment with Paystack
  */
 export async function initializePayment(
-  data: PaymentInitializeData
+  data: PaymentInitializeData,
+  maxQueueRetries = 10
 ): Promise<PaymentInitializeResponse> {
   try {
-    const response = await fetch(`${API_URL}/api/store/payment/initialize/`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify(data),
-    });
+    let queueToken: string | null = null;
+    let response: Response;
+    // A queued 503's body, already read while deciding whether to retry
+    let queued: { queue_token?: string; retry_after?: number; error?: string } | null = null;
+
+    for (let attempt = 0; ; attempt++) {
+      response = await fetch(`${API_URL}/api/store/payment/initialize/`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          ...(queueToken && { 'X-Queue-Token': queueToken }),
+        },
+        body: JSON.stringify(data),
+      });
+
+      // Checkout waiting room: keep our place and retry when told
+      queued = null;
+      if (response.status !== 503 || attempt >= maxQueueRetries) break;
+      queued = await response.json().catch(() => ({}));
+      if (!queued?.queue_token) break;
+      queueToken = queued.queue_token;
+      await new Promise((resolve) => setTimeout(resolve, (queued?.retry_after || 1) * 1000));
+    }
 
     if (!response.ok) {
-      const error = await response.json();
-      throw new Error(error.message || 'Payment initialization failed');
+      // The body can only be read once, so reuse it if the loop already did
+      const error = queued ?? (await response.json());
+      throw new Error(error.message || error.error || 'Payment initialization failed');
     }
 
     return await response.json();
@@ -0,0 +1,116 @@
+"""
+Response compression for JSON API responses
+
+Like django.middleware.gzip.GZipMiddleware, but:
+- prefers brotli when the brotli package is installed and the client
+  accepts it, falling back to gzip
+- only compresses JSON bodies of at least RESPONSE_COMPRESSION_MIN_SIZE
+- turns bodies of RESPONSE_COMPRESSION_STREAM_SIZE or more into a
+  streaming response compressed chunk by chunk, so the first bytes go out
+  before the whole list is compressed and no second full-size buffer is held
+- only compresses GET/HEAD responses, so request-specific secrets in POST
+  responses (tokens, payment links) are not exposed to BREACH-style attacks
+"""
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is used instead
+    brotli = None
+
+CHUNK_SIZE = 64 * 1024
+BROTLI_QUALITY = 5
+# Random gzip header bytes, as GZipMiddleware adds (BREACH mitigation)
+MAX_RANDOM_BYTES = 100
+
+
+def accepted_encoding(accept_encoding):
+    """Best encoding this server can produce for an Accept-Encoding header"""
+    tokens = {token.split(';')[0].strip().lower() for token in accept_encoding.split(',')}
+    if brotli is not None and 'br' in tokens:
+        return 'br'
+    if 'gzip' in tokens:
+        return 'gzip'
+    return None
+
+
+def _chunks(content):
+    for start in range(0, len(content), CHUNK_SIZE):
+        yield content[start:start + CHUNK_SIZE]
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of byte chunks, yielding output as it is produced"""
+    if encoding == 'gzip':
+        yield from compress_sequence(chunks, max_random_bytes=MAX_RANDOM_BYTES)
+        return
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compress_bytes(content, encoding):
+    if encoding == 'gzip':
+        return compress_string(content, max_random_bytes=MAX_RANDOM_BYTES)
+    return brotli.compress(content, quality=BROTLI_QUALITY)
+
+
+class CompressionMiddleware:
+    """Compress JSON responses with brotli or gzip, streaming large ones"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith('application/json'):
+            return response
+        if response.streaming and response.is_async:
+            return response
+        if not response.streaming and len(response.content) < settings.RESPONSE_COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = accepted_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        elif len(response.content) >= settings.RESPONSE_COMPRESSION_STREAM_SIZE:
+            response = self._stream(response, encoding)
+        else:
+            compressed = compress_bytes(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A compressed body is a different representation: weaken strong ETags
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _stream(self, response, encoding):
+        streaming = StreamingHttpResponse(
+            compress_stream(_chunks(response.content), encoding),
+            status=response.status_code,
+        )
+        for header, value in response.items():
+            if header.lower() != 'content-length':
+                streaming[header] = value
+        streaming.cookies = response.cookies
+        return streaming
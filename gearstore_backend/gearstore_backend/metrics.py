@@ -0,0 +1,236 @@
+"""
+In-process metrics registry with Prometheus text exposition
+
+Recording is lock-free on the hot path: every thread writes to its own
+shard, and shards are only summed when /metrics is scraped. A lock is taken
+once per thread per metric, when that thread's shard is created, and again
+when the thread exits and its shard is folded into the metric's base shard,
+so servers that replace worker threads do not accumulate dead shards.
+"""
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Seconds; covers fast catalog reads through slow gateway calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _add_values(total, key, values):
+    current = total.get(key)
+    if current is None:
+        total[key] = list(values)
+    else:
+        for i, value in enumerate(values):
+            current[i] += value
+
+
+class _ShardOwner:
+    """Lives in a thread's local storage; collected when the thread exits"""
+
+    __slots__ = ('__weakref__',)
+
+
+class _Metric:
+    """Per-thread sharded storage shared by counters and histograms"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        # Counts of threads that have exited
+        self._base = {}
+        self._shards = []
+        # Reentrant: a finalizer may run in a thread that already holds it
+        self._lock = threading.RLock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            owner = _ShardOwner()
+            with self._lock:
+                self._shards.append(shard)
+            weakref.finalize(owner, self._retire, shard)
+            self._local.owner = owner
+            self._local.shard = shard
+            return shard
+
+    def _retire(self, shard):
+        """Fold an exited thread's shard into the base shard"""
+        with self._lock:
+            self._shards.remove(shard)
+            for key, values in shard.items():
+                _add_values(self._base, key, values)
+
+    def _label_values(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _merged(self):
+        """Sum every thread's shard into {label_values: [values...]}"""
+        merged = {}
+        with self._lock:
+            for shard in [self._base, *self._shards]:
+                for key, values in list(shard.items()):
+                    _add_values(merged, key, list(values))
+        return merged
+
+    def render(self):
+        raise NotImplementedError
+
+    def _header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._label_values(labels)
+        values = shard.get(key)
+        if values is None:
+            shard[key] = [amount]
+        else:
+            values[0] += amount
+
+    def render(self):
+        lines = self._header()
+        for key, (value,) in sorted(self._merged().items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram of observed values (seconds)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._label_values(labels)
+        values = shard.get(key)
+        if values is None:
+            # One slot per bucket, then +Inf, sum
+            values = shard[key] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                values[i] += 1
+                break
+        else:
+            values[len(self.buckets)] += 1
+        values[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = self._header()
+        for key, values in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(values[-1])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds',
+    'Request latency by resolved view',
+    ('view', 'method', 'status'),
+)
+PAYSTACK_LATENCY = REGISTRY.histogram(
+    'paystack_request_duration_seconds',
+    'Paystack API call latency by operation and outcome',
+    ('operation', 'outcome'),
+)
+CHECKOUT_STOCK_REJECTIONS = REGISTRY.counter(
+    'checkout_stock_rejections_total',
+    'Checkout attempts rejected for insufficient stock',
+    ('endpoint',),
+)
+CHECKOUT_VALIDATION_FAILURES = REGISTRY.counter(
+    'checkout_validation_failures_total',
+    'Checkout attempts rejected by request validation',
+    ('endpoint',),
+)
+
+
+def metrics_view(request):
+    """Expose the registry in Prometheus text format"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
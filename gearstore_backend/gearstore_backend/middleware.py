@@ -0,0 +1,123 @@
+"""
+Per-request SQL and timing instrumentation
+"""
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import REQUEST_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Literals and IN-lists that differ between otherwise identical queries
+_NUMBER_RE = re.compile(r"\b\d+\b")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER_LIST_RE = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+
+
+def fingerprint(sql):
+    """Normalize a SQL statement so repeats of the same query shape compare equal"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_LIST_RE.sub('(...)', sql)
+    return sql
+
+
+class QueryRecorder:
+    """execute_wrapper that counts, times and fingerprints queries"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def repeated(self, threshold):
+        """Query shapes run at least `threshold` times, most frequent first"""
+        return [(sql, n) for sql, n in self.fingerprints.most_common() if n >= threshold]
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record query count, DB time and repeated queries for sampled requests
+
+    Emits a Server-Timing header and one JSON log line per sampled request.
+    Query shapes repeated QUERY_INSTRUMENTATION_REPEAT_THRESHOLD times or more
+    are reported as likely N+1s.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'QUERY_INSTRUMENTATION_SAMPLE_RATE', 1.0)
+        self.repeat_threshold = getattr(settings, 'QUERY_INSTRUMENTATION_REPEAT_THRESHOLD', 5)
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = recorder.duration * 1000
+        repeated = recorder.repeated(self.repeat_threshold)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db_ms:.2f};desc="{recorder.count} queries"',
+            f'app;dur={total_ms - db_ms:.2f}',
+            f'total;dur={total_ms:.2f}',
+        ])
+
+        log_line = json.dumps({
+            "event": "request_profile",
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(total_ms, 2),
+            "db_ms": round(db_ms, 2),
+            "queries": recorder.count,
+            "repeated_queries": [{"count": n, "sql": sql[:200]} for sql, n in repeated],
+        })
+        if repeated:
+            logger.warning(log_line)
+        else:
+            logger.info(log_line)
+
+        return response
+
+
+class MetricsMiddleware:
+    """Observe request latency per resolved view into the metrics registry"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            view=match.view_name if match else 'unresolved',
+            method=request.method,
+            status=response.status_code,
+        )
+        return response
@@ -0,0 +1,45 @@
+"""
+orjson-backed DRF renderer
+
+Drop-in replacement for rest_framework.renderers.JSONRenderer. orjson
+serializes dicts, lists, strings and numbers natively; anything it does not
+know (Decimal, datetimes, lazy strings, querysets) goes through DRF's own
+JSONEncoder.default, so responses match what JSONRenderer produces.
+Falls back to JSONRenderer when orjson is not installed, when
+UNICODE_JSON/COMPACT_JSON are turned off, or when an indent other than 2
+is requested (e.g. by the browsable API).
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional, JSONRenderer is used instead
+    orjson = None
+
+_drf_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer with orjson doing the encoding"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # orjson cannot escape non-ASCII or use spaced separators
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent not in (None, 2):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=_drf_default, option=option)
+
+        # Keep the output a strict JavaScript subset, as JSONRenderer does
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
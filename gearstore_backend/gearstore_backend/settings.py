@@ -14,6 +14,7 @@ from pathlib import Path
 from datetime import timedelta
 import os
 from dotenv import load_dotenv
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -54,6 +55,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'gearstore_backend.middleware.MetricsMiddleware',
+    'gearstore_backend.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -62,6 +65,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'gearstore_backend.middleware.QueryInstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'gearstore_backend.urls'
@@ -95,6 +99,19 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared state (waiting room, throttles) needs a cache all workers see, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://127.0.0.1:6379
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -140,9 +157,24 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 REST_FRAMEWORK = {
+    # orjson-backed JSON, see gearstore_backend/renderers.py
+    'DEFAULT_RENDERER_CLASSES': [
+        'gearstore_backend.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
+    # GCRA throttles on the AllowAny write endpoints, see gearstore_backend/throttling.py
+    'DEFAULT_THROTTLE_RATES': {
+        'checkout': os.getenv('THROTTLE_CHECKOUT', '30/min'),
+        'checkout_email': os.getenv('THROTTLE_CHECKOUT_EMAIL', '10/min'),
+        'register': os.getenv('THROTTLE_REGISTER', '10/hour'),
+        'register_email': os.getenv('THROTTLE_REGISTER_EMAIL', '3/hour'),
+    },
+    # Reverse proxies in front of the app; 0 ignores X-Forwarded-For, which
+    # clients can set to anything, and throttles by REMOTE_ADDR
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
 }
 
 SIMPLE_JWT = {
@@ -151,9 +183,97 @@ SIMPLE_JWT = {
 }
 
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
+CORS_ALLOW_HEADERS = (*default_headers, 'x-queue-token', 'x-cart-token')
 
 # Paystack Configuration
 PAYSTACK_SECRET_KEY = os.getenv('PAYSTACK_SECRET_KEY', 'sk_test_your_secret_key_here')
 PAYSTACK_PUBLIC_KEY = os.getenv('PAYSTACK_PUBLIC_KEY', 'pk_test_your_public_key_here')
 PAYSTACK_CALLBACK_URL = os.getenv('PAYSTACK_CALLBACK_URL', 'http://localhost:3000/payment/callback')
+# Point at `manage.py paystack_stub` for load testing
+PAYSTACK_BASE_URL = os.getenv('PAYSTACK_BASE_URL', 'https://api.paystack.co')
+
+# Request instrumentation (Server-Timing header + JSON log line)
+# Fraction of requests to profile; keep low in production
+QUERY_INSTRUMENTATION_SAMPLE_RATE = float(os.getenv('QUERY_INSTRUMENTATION_SAMPLE_RATE', '1.0' if DEBUG else '0.01'))
+# Same query shape this many times in one request is reported as a likely N+1
+QUERY_INSTRUMENTATION_REPEAT_THRESHOLD = int(os.getenv('QUERY_INSTRUMENTATION_REPEAT_THRESHOLD', '5'))
+
+# Checkout waiting room (store/admission.py)
+WAITING_ROOM = {
+    # Concurrent checkouts inside one worker process
+    'MAX_IN_FLIGHT': int(os.getenv('WAITING_ROOM_MAX_IN_FLIGHT', '16')),
+    # Checkouts admitted per second across the cluster
+    'CLUSTER_RATE': int(os.getenv('WAITING_ROOM_CLUSTER_RATE', '50')),
+    # Seconds a queue token stays valid
+    'TOKEN_MAX_AGE': 600,
+    # Per-room overrides, e.g. {'checkout': {'CLUSTER_RATE': 20}}
+    'ROOMS': {},
+}
 
+# Pre-built catalog snapshot served at /api/store/catalog/ (store/snapshots.py)
+CATALOG_SNAPSHOT_ROOT = os.getenv('CATALOG_SNAPSHOT_ROOT', str(MEDIA_ROOT / 'catalog'))
+# Rebuild automatically after product/variant/category saves, debounced by this many seconds
+CATALOG_SNAPSHOT_AUTO_BUILD = os.getenv('CATALOG_SNAPSHOT_AUTO_BUILD', 'True') == 'True'
+CATALOG_SNAPSHOT_DELAY = float(os.getenv('CATALOG_SNAPSHOT_DELAY', '2'))
+# Public origin of this API, used for absolute media URLs in the snapshot
+PUBLIC_API_URL = os.getenv('PUBLIC_API_URL', 'http://localhost:8000')
+
+# JSON response compression (gearstore_backend/compression.py)
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv('RESPONSE_COMPRESSION_MIN_SIZE', '1024'))
+# Bodies this large are compressed and sent as a stream of chunks
+RESPONSE_COMPRESSION_STREAM_SIZE = int(os.getenv('RESPONSE_COMPRESSION_STREAM_SIZE', str(256 * 1024)))
+
+# Seconds facet counts (/api/store/products/facets/) are cached per filter state
+FACET_CACHE_TTL = int(os.getenv('FACET_CACHE_TTL', '60'))
+# Seconds before each worker rebuilds its suggest index (store/suggest.py) even if it
+# saw no catalog change; bounds staleness when workers do not share a cache
+SUGGEST_INDEX_MAX_AGE = int(os.getenv('SUGGEST_INDEX_MAX_AGE', '300'))
+
+# Change feed (/api/store/changes/, store/changes.py): entries younger than this are
+# held back so concurrently committing transactions cannot be skipped. On PostgreSQL
+# it is counted from the oldest open write transaction and only needs to cover clock
+# skew; elsewhere keep it above the longest catalog write transaction
+CHANGE_FEED_SETTLE_SECONDS = float(os.getenv('CHANGE_FEED_SETTLE_SECONDS', '1'))
+
+# Live stock stream (store/live_stock.py): seconds between change feed polls, which
+# is also how long stock changes are coalesced, and between keepalive comments
+LIVE_STOCK_WINDOW = float(os.getenv('LIVE_STOCK_WINDOW', '0.5'))
+LIVE_STOCK_KEEPALIVE = float(os.getenv('LIVE_STOCK_KEEPALIVE', '15'))
+
+# Outgoing email; confirmations are queued in the outbox (store/outbox.py) and sent by
+# manage.py dispatch_outbox
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', "AG's GearStore <orders@localhost>")
+# Failed sends wait OUTBOX_RETRY_BASE_SECONDS, then twice as long each time
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('OUTBOX_RETRY_BASE_SECONDS', '30'))
+# Seconds a dispatcher holds the emails it claimed; must outlast sending one batch
+OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', '300'))
+
+# Seconds a checkout quote (store/quotes.py) stays payable
+CHECKOUT_QUOTE_TTL = int(os.getenv('CHECKOUT_QUOTE_TTL', '300'))
+
+# Bearer token required by /metrics; leave empty to expose it without auth
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'gearstore_backend.middleware': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,111 @@
+"""
+GCRA throttles for unauthenticated write endpoints
+
+The generic cell rate algorithm keeps a single timestamp per client (the
+theoretical arrival time, TAT) in the cache, so each check is a constant
+number of cache calls no matter how high the rate is. DRF's
+SimpleRateThrottle keeps a list of every request timestamp instead.
+
+Reading and advancing the TAT is done under a short per-client lock taken
+with cache.add, which is atomic on every cache backend, so concurrent
+requests from one client cannot both read the old TAT and slip through.
+
+Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], keyed by the
+view's `throttle_scope` (per IP) and `<throttle_scope>_email` (per email).
+"""
+import time
+
+from django.core.cache import cache as default_cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class GCRAThrottle(BaseThrottle):
+    """Base class; subclasses choose what identifies a client"""
+
+    cache = default_cache
+    cache_format = 'throttle:gcra:%(scope)s:%(ident)s'
+    scope_suffix = ''
+    timer = time.time
+    # Tries at the per-client lock before the request is turned away
+    lock_attempts = 20
+    lock_retry_delay = 0.005
+
+    def __init__(self):
+        self._wait = None
+
+    def get_ident_key(self, request, view):
+        """Value that identifies the client, or None to skip throttling"""
+        raise NotImplementedError
+
+    def get_rate(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return None, None
+        scope = f"{scope}{self.scope_suffix}"
+        return scope, api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+
+    def parse_rate(self, rate):
+        """'10/min' -> (10, 60)"""
+        num, period = rate.split('/')
+        duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+        return int(num), duration
+
+    def allow_request(self, request, view):
+        scope, rate = self.get_rate(view)
+        if rate is None:
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+
+        limit, period = self.parse_rate(rate)
+        emission_interval = period / limit
+        key = self.cache_format % {'scope': scope, 'ident': ident}
+        lock_key = f"{key}:lock"
+
+        for _ in range(self.lock_attempts):
+            if self.cache.add(lock_key, 1, timeout=1):
+                break
+            time.sleep(self.lock_retry_delay)
+        else:
+            # Only one client's own concurrent requests contend for its lock
+            self._wait = emission_interval
+            return False
+
+        try:
+            now = self.timer()
+            tat = max(self.cache.get(key, now), now)
+            new_tat = tat + emission_interval
+            # A full period's worth of requests may arrive as a burst
+            allow_at = new_tat - period
+            if now < allow_at:
+                self._wait = allow_at - now
+                return False
+
+            self.cache.set(key, new_tat, timeout=int(new_tat - now) + 1)
+            return True
+        finally:
+            self.cache.delete(lock_key)
+
+    def wait(self):
+        return self._wait
+
+
+class GCRAIPThrottle(GCRAThrottle):
+    """Throttle by client IP (REMOTE_ADDR, or X-Forwarded-For per NUM_PROXIES)"""
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+
+class GCRAEmailThrottle(GCRAThrottle):
+    """Throttle by the email address in the request body"""
+
+    scope_suffix = '_email'
+
+    def get_ident_key(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not email or not isinstance(email, str):
+            return None
+        return email.strip().lower()
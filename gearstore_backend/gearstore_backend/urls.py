@@ -14,13 +14,24 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.urls import include, path
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('users.urls')),
     path('api/store/', include('store.urls')),
     path('api/fanzone/', include('fanzone.urls')),
     path('api/loyalty/', include('loyalty.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
+
+# Serve product image renditions locally; use the web server or a CDN in production
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Admin CSS/JS in development; runserver does this itself, uvicorn does not
+urlpatterns += staticfiles_urlpatterns()
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gearstore_backend.settings')
 
 application = get_wsgi_application()
+
+# Build the search-as-you-type index before the first request
+from store.suggest import warm_index  # noqa: E402
+
+warm_index()
@@ -0,0 +1,186 @@
+"""
+Waiting room for checkout endpoints
+
+Bounds checkouts two ways:
+- per process: at most MAX_IN_FLIGHT requests inside the view at once
+- per cluster: a cache-backed fixed-window counter admitting at most
+  CLUSTER_RATE checkouts in each one-second window across all workers
+
+Turned-away clients get a signed queue token and a Retry-After header. The
+token holds the time their turn comes up; new arrivals queue behind it, so
+clients who retry as told get in ahead of fresh traffic. Each token is
+single use: presenting it spends it, and a client turned away again gets a
+new one, so a token cannot be shared to jump the queue more than once.
+"""
+import math
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from gearstore_backend.metrics import REGISTRY
+
+WAITING_ROOM_REJECTIONS = REGISTRY.counter(
+    'waiting_room_rejections_total',
+    'Requests turned away by a waiting room',
+    ('room',),
+)
+
+QUEUE_TOKEN_HEADER = 'X-Queue-Token'
+# Tries at the queue lock before a slot is estimated without it
+QUEUE_LOCK_ATTEMPTS = 20
+QUEUE_LOCK_RETRY_DELAY = 0.005
+_TOKEN_SALT = 'store.admission'
+
+
+class WaitingRoomFull(APIException):
+    """503 with Retry-After (DRF sets the header from `wait`) and a queue token"""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_code = 'waiting_room'
+
+    def __init__(self, token, position, wait):
+        self.wait = wait
+        super().__init__()
+        # Set directly so the numbers are not coerced to error strings
+        self.detail = {
+            "error": "Checkout is busy, you are in the queue",
+            "queue_token": token,
+            "queue_position": position,
+            "retry_after": wait,
+        }
+
+
+class WaitingRoom:
+    """Admission control shared by every view that names the same room"""
+
+    def __init__(self, name):
+        self.name = name
+        self._semaphore = None
+        self._semaphore_size = None
+        self._lock = threading.Lock()
+
+    @property
+    def config(self):
+        return {**settings.WAITING_ROOM, **settings.WAITING_ROOM.get('ROOMS', {}).get(self.name, {})}
+
+    def _process_slots(self, size):
+        with self._lock:
+            if self._semaphore_size != size:
+                self._semaphore = threading.BoundedSemaphore(size)
+                self._semaphore_size = size
+            return self._semaphore
+
+    def _key(self, suffix):
+        return f"waiting_room:{self.name}:{suffix}"
+
+    def _count_in_window(self, rate):
+        """Count the caller in this second's window; False once `rate` are in"""
+        key = self._key(f"window:{int(time.time())}")
+        cache.add(key, 0, timeout=5)
+        try:
+            return cache.incr(key) <= rate
+        except ValueError:
+            # Key expired between add and incr
+            return True
+
+    def _queue(self, now, rate):
+        """
+        Reserve the next slot at the back of the queue
+
+        The read and the write of next_slot happen under a short lock taken
+        with cache.add (as in gearstore_backend/throttling.py), so concurrent
+        rejections each get a slot of their own.
+        """
+        lock_key = self._key('next_slot:lock')
+        for _ in range(QUEUE_LOCK_ATTEMPTS):
+            if cache.add(lock_key, 1, timeout=1):
+                break
+            time.sleep(QUEUE_LOCK_RETRY_DELAY)
+        else:
+            # Heavy contention: hand out a slot well behind the current back of the queue
+            return max(now, cache.get(self._key('next_slot'), 0)) + QUEUE_LOCK_ATTEMPTS / rate
+        try:
+            backlog_until = cache.get(self._key('next_slot'), 0)
+            ready_at = max(now, backlog_until) + 1 / rate
+            cache.set(self._key('next_slot'), ready_at, timeout=int(ready_at - now) + 60)
+            return ready_at
+        finally:
+            cache.delete(lock_key)
+
+    def _reject(self, ready_at, now, rate):
+        WAITING_ROOM_REJECTIONS.inc(room=self.name)
+        token = signing.dumps(
+            {'room': self.name, 'ready_at': ready_at, 'nonce': secrets.token_urlsafe(12)}, salt=_TOKEN_SALT,
+        )
+        wait = max(1, math.ceil(ready_at - now))
+        raise WaitingRoomFull(token, max(1, round((ready_at - now) * rate)), wait)
+
+    def _read_token(self, token, max_age):
+        if not token:
+            return None
+        try:
+            data = signing.loads(token, salt=_TOKEN_SALT, max_age=max_age)
+        except signing.BadSignature:
+            return None
+        if data.get('room') != self.name or 'nonce' not in data:
+            return None
+        # Spend the token; a replay is treated as a fresh arrival
+        if not cache.add(self._key(f"token:{data['nonce']}"), True, timeout=max_age):
+            return None
+        return data['ready_at']
+
+    def enter(self, token=None):
+        """
+        Admit the caller or raise WaitingRoomFull
+
+        Returns:
+            The process slot to hand back to leave() when the request ends
+        """
+        config = self.config
+        rate = config['CLUSTER_RATE']
+        now = time.time()
+        ready_at = self._read_token(token, config['TOKEN_MAX_AGE'])
+
+        if ready_at is not None and ready_at > now:
+            # Came back early, keep their place
+            self._reject(ready_at, now, rate)
+        if ready_at is None and cache.get(self._key('next_slot'), 0) > now:
+            # Others are already waiting; join the back of the queue
+            self._reject(self._queue(now, rate), now, rate)
+
+        slots = self._process_slots(config['MAX_IN_FLIGHT'])
+        if not slots.acquire(blocking=False):
+            self._reject(ready_at if ready_at is not None else self._queue(now, rate), now, rate)
+        if not self._count_in_window(rate):
+            slots.release()
+            self._reject(ready_at if ready_at is not None else self._queue(now, rate), now, rate)
+        return slots
+
+    def leave(self, slots):
+        slots.release()
+
+
+CHECKOUT_WAITING_ROOM = WaitingRoom('checkout')
+
+
+class WaitingRoomMixin:
+    """Run a DRF view's handlers inside a waiting room"""
+
+    waiting_room = CHECKOUT_WAITING_ROOM
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._waiting_room_slots = self.waiting_room.enter(request.headers.get(QUEUE_TOKEN_HEADER))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        slots = getattr(self, '_waiting_room_slots', None)
+        if slots is not None:
+            self._waiting_room_slots = None
+            self.waiting_room.leave(slots)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        # Connect cart, quote and catalog snapshot invalidation and change tracking to catalog saves
+        from . import carts, changes, quotes, snapshots, versions  # noqa: F401
@@ -0,0 +1,317 @@
+"""
+Synthetic-catalog benchmarks for the store API
+
+Used by the benchmark_store management command and store/tests.py.
+"""
+import json
+import random
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from unittest import mock
+
+from gearstore_backend import compression
+from gearstore_backend.renderers import ORJSONRenderer
+from .models import Category, Product, ProductVariant
+from .payment import PaystackAPI
+from .serializers import ProductSerializer
+from .stats import percentile
+
+API_URL = '/api/store'
+
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL', '7', '8', '9', '10', '11', '12']
+TEAMS = ['Barcelona', 'Arsenal', 'Manchester City', 'PSG', 'Juventus', 'Ajax', 'Porto', 'Celtic']
+KINDS = ['Home Jersey', 'Away Jersey', 'Training Top', 'Cleats', 'Scarf', 'Track Jacket']
+
+# What the shop grid's product cards render
+GRID_QUERY = 'fields=id,name,base_price,image,image_thumb,team,stock&expand='
+
+
+class StubPaystackAPI(PaystackAPI):
+    """PaystackAPI that answers locally instead of calling api.paystack.co"""
+
+    def initialize_transaction(self, email, amount, reference, metadata=None):
+        return {
+            "status": True,
+            "message": "Authorization URL created",
+            "data": {
+                "authorization_url": f"https://checkout.paystack.com/{reference}",
+                "access_code": reference.lower(),
+                "reference": reference,
+            },
+        }
+
+    def verify_transaction(self, reference):
+        return {
+            "status": True,
+            "message": "Verification successful",
+            "data": {"reference": reference, "status": "success", "amount": 100000},
+        }
+
+
+def generate_catalog(products=100, variants=4, categories=5, seed=0):
+    """
+    Create a synthetic catalog in the current database
+
+    Args:
+        products: Number of products
+        variants: Sizes per product
+        categories: Number of categories
+        seed: Random seed so runs are repeatable
+
+    Returns:
+        dict: Catalog shape, stored alongside benchmark results
+    """
+    rng = random.Random(seed)
+    sizes = SIZES + [str(n) for n in range(13, 13 + max(0, variants - len(SIZES)))]
+
+    category_objs = Category.objects.bulk_create([
+        Category(name=f"Category {i}", slug=f"category-{i}") for i in range(categories)
+    ])
+
+    product_objs = Product.objects.bulk_create([
+        Product(
+            category=category_objs[i % categories],
+            name=f"{TEAMS[i % len(TEAMS)]} {rng.choice(KINDS)} {i}",
+            base_price=Decimal(rng.randrange(1999, 19999)) / 100,
+            image=f"https://images.example.com/products/{i}.jpeg",
+            team=TEAMS[i % len(TEAMS)] if rng.random() < 0.8 else '',
+            description=f"Synthetic product {i} for benchmarking",
+        )
+        for i in range(products)
+    ])
+
+    ProductVariant.objects.bulk_create([
+        ProductVariant(
+            product=product,
+            size=size,
+            stock=rng.randrange(0, 50),
+            price_override=Decimal(rng.randrange(1999, 19999)) / 100 if rng.random() < 0.1 else None,
+        )
+        for product in product_objs
+        for size in sizes[:variants]
+    ])
+
+    return {"products": products, "variants": variants, "categories": categories, "seed": seed}
+
+
+def _cart(variant_ids):
+    return [{"variant_id": variant_id, "quantity": 1} for variant_id in variant_ids]
+
+
+def build_scenarios():
+    """
+    Requests to time, as (name, method, path, payload, authenticated)
+
+    Reads fixtures from the current catalog, so call after generate_catalog.
+    """
+    product = Product.objects.order_by('id').first()
+    team = Product.objects.exclude(team='').values_list('team', flat=True).first() or TEAMS[0]
+    variant_ids = list(
+        ProductVariant.objects.filter(stock__gt=0).order_by('id').values_list('id', flat=True)[:2]
+    )
+    cart = _cart(variant_ids)
+
+    return [
+        ('product_list', 'get', f'{API_URL}/products/', None, False),
+        ('product_list_filtered', 'get',
+         f'{API_URL}/products/?team={team}&price_min=20&price_max=150&size_available=M', None, False),
+        ('product_list_grid', 'get', f'{API_URL}/products/?{GRID_QUERY}', None, False),
+        ('product_search', 'get', f'{API_URL}/products/?search=Jersey', None, False),
+        ('product_detail', 'get', f'{API_URL}/products/{product.id}/', None, False),
+        ('product_variants', 'get', f'{API_URL}/products/{product.id}/variants/', None, False),
+        ('guest_checkout', 'post', f'{API_URL}/guest-checkout/', {"cart_items": cart}, False),
+        ('auth_checkout', 'post', f'{API_URL}/auth-checkout/', {"cart_items": cart}, True),
+        ('payment_initialize', 'post', f'{API_URL}/payment/initialize/',
+         {"email": "bench@example.com", "cart_items": cart, "delivery_fee": 2000}, False),
+    ]
+
+
+def run_benchmarks(iterations=20, warmup=2, only=None):
+    """
+    Time every scenario against the current database
+
+    Args:
+        iterations: Timed requests per scenario
+        warmup: Untimed requests per scenario
+        only: Optional list of scenario names to run
+
+    Returns:
+        dict: {scenario: {"p50", "p95", "p99", "mean" (ms), "queries", "status", "bytes"}}
+    """
+    user, _ = User.objects.get_or_create(username='benchmark', defaults={'email': 'bench@example.com'})
+    anonymous = APIClient()
+    authenticated = APIClient()
+    authenticated.force_authenticate(user)
+
+    # Measure the endpoints, not the waiting room's admission rate or throttles
+    unlimited_room = {**settings.WAITING_ROOM, 'MAX_IN_FLIGHT': 10 ** 6, 'CLUSTER_RATE': 10 ** 9}
+    unthrottled = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+
+    results = {}
+    with mock.patch('store.views_payment.PaystackAPI', StubPaystackAPI), \
+            override_settings(WAITING_ROOM=unlimited_room, REST_FRAMEWORK=unthrottled):
+        for name, method, path, payload, needs_auth in build_scenarios():
+            if only and name not in only:
+                continue
+            client = authenticated if needs_auth else anonymous
+            send = getattr(client, method)
+            kwargs = {'format': 'json'} if payload is not None else {}
+
+            for _ in range(warmup):
+                send(path, payload, **kwargs)
+
+            timings = []
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    response = send(path, payload, **kwargs)
+                    timings.append((time.perf_counter() - start) * 1000)
+
+            results[name] = {
+                "p50": percentile(timings, 50),
+                "p95": percentile(timings, 95),
+                "p99": percentile(timings, 99),
+                "mean": sum(timings) / len(timings),
+                "queries": len(queries) // iterations,
+                "status": response.status_code,
+                "bytes": len(response.content),
+            }
+
+    return results
+
+
+def _time(func, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, result
+
+
+def run_rendering_benchmark(iterations=20):
+    """
+    Time rendering and compressing the full product list body
+
+    Serializes the current catalog once, then renders it with DRF's
+    JSONRenderer and with ORJSONRenderer, and compresses the result with each
+    encoding CompressionMiddleware can produce.
+
+    Returns:
+        dict: {"renderers": {name: {"p50", "mean", "bytes"}}, "saved_ms",
+               "identical", "compression": {encoding: {"mean", "bytes"}}}
+    """
+    products = Product.objects.select_related('category').prefetch_related('variants__stock_shards')
+    data = ProductSerializer(products, many=True).data
+
+    renderers = {}
+    bodies = {}
+    for name, renderer in (('json', JSONRenderer()), ('orjson', ORJSONRenderer())):
+        timings, bodies[name] = _time(lambda: renderer.render(data), iterations)
+        renderers[name] = {
+            "p50": percentile(timings, 50),
+            "mean": sum(timings) / len(timings),
+            "bytes": len(bodies[name]),
+        }
+
+    encodings = ['gzip'] + (['br'] if compression.brotli is not None else [])
+    compressed = {}
+    for encoding in encodings:
+        timings, body = _time(lambda: compression.compress_bytes(bodies['orjson'], encoding), iterations)
+        compressed[encoding] = {"mean": sum(timings) / len(timings), "bytes": len(body)}
+
+    return {
+        "renderers": renderers,
+        "saved_ms": renderers['json']['mean'] - renderers['orjson']['mean'],
+        "identical": bodies['json'] == bodies['orjson'],
+        "compression": compressed,
+    }
+
+
+def run_product_list_benchmark(iterations=5, query=''):
+    """
+    Time the product list through ProductSerializer and through render_products
+
+    Both paths query, build and render the full list for the current catalog.
+
+    Returns:
+        dict: {path: {"p50", "mean" (ms), "queries"}} plus "speedup" and "identical"
+    """
+    from .product_rows import render_products
+    from .views import ProductViewSet
+
+    request = Request(APIRequestFactory().get(f'{API_URL}/products/?{query}'))
+    view = ProductViewSet(action='list', request=request, format_kwarg=None, kwargs={})
+    renderer = ORJSONRenderer()
+
+    def serializer_path():
+        queryset = view.filter_queryset(view.get_queryset())
+        return renderer.render(ProductSerializer(queryset, many=True, context={'request': request}).data)
+
+    def rows_path():
+        queryset = view.filter_queryset(view.get_filtered_queryset())
+        return renderer.render(render_products(queryset, request.query_params, request))
+
+    results = {}
+    bodies = {}
+    for name, func in (('serializer', serializer_path), ('rows', rows_path)):
+        with CaptureQueriesContext(connection) as queries:
+            timings, bodies[name] = _time(func, iterations)
+        results[name] = {
+            "p50": percentile(timings, 50),
+            "mean": sum(timings) / len(timings),
+            "queries": len(queries) // iterations,
+        }
+    results["speedup"] = results['serializer']['mean'] / results['rows']['mean']
+    results["identical"] = bodies['serializer'] == bodies['rows']
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold=0.25, min_delta_ms=1.0):
+    """
+    List scenarios that regressed against a stored baseline
+
+    A scenario regresses when its p95 grows by more than `threshold` (and by
+    at least `min_delta_ms`, so sub-millisecond noise is ignored) or when it
+    issues more SQL queries than before.
+
+    Returns:
+        list: Human-readable regression descriptions, empty if none
+    """
+    regressions = []
+    for name, before in baseline.get('results', {}).items():
+        after = results.get(name)
+        if after is None:
+            continue
+        allowed = before['p95'] * (1 + threshold)
+        if after['p95'] > allowed and after['p95'] - before['p95'] >= min_delta_ms:
+            regressions.append(
+                f"{name}: p95 {after['p95']:.2f}ms > {before['p95']:.2f}ms (+{threshold:.0%} allowed)"
+            )
+        if after['queries'] > before['queries']:
+            regressions.append(f"{name}: {after['queries']} queries > {before['queries']}")
+    return regressions
+
+
+def load_baseline(path):
+    path = Path(path)
+    if not path.exists():
+        return None
+    with path.open() as f:
+        return json.load(f)
+
+
+def save_baseline(path, catalog, results):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w') as f:
+        json.dump({"catalog": catalog, "results": results}, f, indent=2, sort_keys=True)
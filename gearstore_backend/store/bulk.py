@@ -0,0 +1,192 @@
+"""
+Bulk catalog writes for merchandising tools
+
+These run a fixed number of queries however many rows they write: rows are
+checked against data loaded up front rather than one query per row, and
+written with bulk_create. Bulk writes send no post_save, so each sends
+catalog_bulk_changed (store/signals.py) once at the end, and change feed
+entries (store/changes.py) are inserted together.
+"""
+from django.db import transaction
+from rest_framework import serializers
+
+from .changes import batched_changes
+from .models import Category, Product, ProductVariant
+from .serializers import ProductBatchItemSerializer
+from .signals import catalog_bulk_changed
+
+# Products accepted by one batch_upsert_products call
+MAX_BATCH_PRODUCTS = 500
+
+# Product fields written by a batch item
+PRODUCT_FIELDS = ['name', 'category', 'base_price', 'image', 'team', 'description']
+
+
+def replace_variant_grid(product_id, rows):
+    """
+    Make a product's variants exactly `rows`, in one transaction
+
+    Sizes in `rows` are inserted or updated with one upsert; sizes not in
+    `rows` are deleted. Sharded variants (store/stock.py) are left alone: a
+    grid that would overwrite or delete one is rejected.
+
+    Args:
+        product_id: Product primary key
+        rows: Validated VariantGridRowSerializer(many=True) data
+
+    Returns:
+        list: The product's ProductVariants after the write, ordered by size
+
+    Raises:
+        Product.DoesNotExist: No such product
+        serializers.ValidationError: Per-row errors, in request order
+    """
+    with transaction.atomic(), batched_changes():
+        # Lock the product so two grid writes for it cannot interleave
+        if not Product.objects.select_for_update().filter(pk=product_id).exists():
+            raise Product.DoesNotExist
+        existing = {
+            variant['size']: variant
+            for variant in ProductVariant.objects.filter(product_id=product_id).values('id', 'size', 'sharded')
+        }
+
+        errors = [{} for _ in rows]
+        sizes = set()
+        for row, row_errors in zip(rows, errors):
+            if row['size'] in sizes:
+                row_errors['size'] = [f'Size "{row["size"]}" appears more than once']
+            elif existing.get(row['size'], {}).get('sharded'):
+                row_errors['stock'] = ['Stock for this size is sharded; disable sharding before replacing it']
+            sizes.add(row['size'])
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        removed = [variant for size, variant in existing.items() if size not in sizes]
+        sharded = sorted(variant['size'] for variant in removed if variant['sharded'])
+        if sharded:
+            raise serializers.ValidationError({
+                "error": f"Sizes with sharded stock cannot be removed: {', '.join(sharded)}"
+            })
+
+        ProductVariant.objects.bulk_create(
+            [
+                ProductVariant(
+                    product_id=product_id, size=row['size'], stock=row['stock'], price_override=row['price_override'],
+                )
+                for row in rows
+            ],
+            update_conflicts=True,
+            unique_fields=['product', 'size'],
+            update_fields=['stock', 'price_override'],
+        )
+        if removed:
+            ProductVariant.objects.filter(id__in=[variant['id'] for variant in removed]).delete()
+
+        variants = list(ProductVariant.objects.filter(product_id=product_id).order_by('size'))
+        catalog_bulk_changed.send(
+            sender=ProductVariant,
+            product_ids=[product_id],
+            variant_ids=[variant.id for variant in variants],
+        )
+    return variants
+
+
+def batch_upsert_products(items):
+    """
+    Create and update many products with their variants
+
+    Each item is validated on its own, against categories and existing
+    variants loaded once for the whole batch. An id may appear only once per
+    batch. Names need not be unique: order history tells products that share
+    a name apart by size (see store/recommendations.py). Valid items are
+    written together with bulk_create / bulk_update; invalid items are
+    reported and skipped without affecting the rest.
+
+    Args:
+        items: Raw item dicts (see ProductBatchItemSerializer)
+
+    Returns:
+        list: Per item, in request order, {"index", "status", "id"} with
+        status "created" or "updated", or {"index", "status": "error", "errors"}
+    """
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        serializer = ProductBatchItemSerializer(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {"index": index, "status": "error", "errors": serializer.errors}
+
+    slugs = {data['category'] for _, data in valid}
+    update_ids = {data['id'] for _, data in valid if 'id' in data}
+    categories = dict(Category.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+    existing_ids = set(Product.objects.filter(id__in=update_ids).values_list('id', flat=True))
+    existing_variants = {
+        (variant['product_id'], variant['size']): variant
+        for variant in ProductVariant.objects.filter(product_id__in=existing_ids).values(
+            'id', 'product_id', 'size', 'sharded',
+        )
+    }
+
+    creates, updates, seen_ids = [], [], set()
+    for index, data in valid:
+        errors = {}
+        product_id = data.get('id')
+        if data['category'] not in categories:
+            errors['category'] = [f'Unknown category "{data["category"]}"']
+        if product_id is not None and product_id not in existing_ids:
+            errors['id'] = [f'Product {product_id} does not exist']
+        elif product_id in seen_ids:
+            errors['id'] = ['An earlier item in this batch has this id']
+
+        sizes = [variant['size'] for variant in data['variants']]
+        if len(set(sizes)) != len(sizes):
+            errors['variants'] = ['Sizes must be unique']
+        elif any(existing_variants.get((product_id, size), {}).get('sharded') for size in sizes):
+            errors['variants'] = ['Sizes with sharded stock cannot be replaced']
+
+        if errors:
+            results[index] = {"index": index, "status": "error", "errors": errors}
+            continue
+        if product_id is not None:
+            seen_ids.add(product_id)
+        product = Product(
+            id=product_id,
+            category_id=categories[data['category']],
+            **{field: data[field] for field in PRODUCT_FIELDS if field != 'category'},
+        )
+        (updates if product_id is not None else creates).append((index, product, data['variants']))
+
+    if not creates and not updates:
+        return results
+
+    with transaction.atomic(), batched_changes():
+        Product.objects.bulk_create([product for _, product, _ in creates])
+        if updates:
+            Product.objects.bulk_update([product for _, product, _ in updates], PRODUCT_FIELDS)
+        variants = ProductVariant.objects.bulk_create(
+            [
+                ProductVariant(
+                    product_id=product.id, size=row['size'], stock=row['stock'], price_override=row['price_override'],
+                )
+                for _, product, rows in creates + updates
+                for row in rows
+            ],
+            update_conflicts=True,
+            unique_fields=['product', 'size'],
+            update_fields=['stock', 'price_override'],
+        )
+        catalog_bulk_changed.send(
+            sender=Product,
+            product_ids=[product.id for _, product, _ in creates + updates],
+            variant_ids=sorted(
+                {variant.id for variant in variants if variant.id is not None}
+                | {variant['id'] for variant in existing_variants.values()}
+            ),
+        )
+
+    for status, written in (('created', creates), ('updated', updates)):
+        for index, product, _ in written:
+            results[index] = {"index": index, "status": status, "id": product.id}
+    return results
@@ -0,0 +1,250 @@
+"""
+Server-side carts with cached, batch-revalidated summaries
+
+A cart summary reprices every line and checks its stock in one query. The
+result is cached together with a stamp per variant in the cart; saving a
+variant, its product or its stock shards (or decrementing its stock) gives
+that variant a new stamp. A cached summary is reused while every stamp it
+was built with is still current, so a price change on one shirt only
+invalidates the carts that hold that shirt.
+"""
+import secrets
+import uuid
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Cart, CartItem, Product, ProductVariant, VariantStockShard
+from .signals import catalog_bulk_changed
+
+CART_TOKEN_HEADER = 'X-Cart-Token'
+SUMMARY_TIMEOUT = 60 * 60
+
+
+def unit_price(variant):
+    """Variant price override if set, otherwise the product's base price"""
+    return variant.price_override if variant.price_override else variant.product.base_price
+
+
+def _summary_key(cart_id):
+    return f"cart:summary:{cart_id}"
+
+
+def _stamp_key(variant_id):
+    return f"cart:variant:{variant_id}"
+
+
+def touch_variants(variant_ids):
+    """Invalidate cached summaries of every cart holding these variants"""
+    stamp = uuid.uuid4().hex
+    cache.set_many({_stamp_key(variant_id): stamp for variant_id in variant_ids}, timeout=None)
+
+
+def touch_variants_on_commit(variant_ids):
+    """touch_variants once the current transaction commits, so no summary is rebuilt from uncommitted rows"""
+    variant_ids = list(variant_ids)
+    transaction.on_commit(lambda: touch_variants(variant_ids))
+
+
+def _current_stamps(variant_ids):
+    """Stamps for `variant_ids`, issuing new ones for any the cache lost"""
+    keys = {_stamp_key(variant_id): variant_id for variant_id in variant_ids}
+    found = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: stamp for key, stamp in found.items()}
+
+
+def invalidate_summary(cart):
+    cache.delete(_summary_key(cart.pk))
+
+
+def get_cart(user=None, token=None, create=False):
+    """
+    Find the cart for a signed-in user or a guest token
+
+    A guest cart presented by a signed-in user is merged into their cart.
+
+    Returns:
+        Cart or None when there is no cart and `create` is False
+    """
+    if user is not None and user.is_authenticated:
+        if token:
+            merge_guest_cart(token, user)
+        if create:
+            cart, _ = Cart.objects.get_or_create(user=user)
+            return cart
+        return Cart.objects.filter(user=user).first()
+
+    if token:
+        cart = Cart.objects.filter(token=token, user__isnull=True).first()
+        if cart is not None or not create:
+            return cart
+    if not create:
+        return None
+    return Cart.objects.create(token=secrets.token_urlsafe(32))
+
+
+def merge_guest_cart(token, user):
+    """
+    Move a guest cart's lines into the user's cart and delete the guest cart
+
+    Quantities for sizes in both carts are added together.
+
+    Returns:
+        bool: True if there was a guest cart to merge
+    """
+    with transaction.atomic():
+        guest = Cart.objects.select_for_update().filter(token=token, user__isnull=True).first()
+        if guest is None:
+            return False
+        cart, _ = Cart.objects.get_or_create(user=user)
+        existing = {item.variant_id: item for item in cart.items.all()}
+
+        new_items = []
+        updated_items = []
+        for item in guest.items.all():
+            if item.variant_id in existing:
+                line = existing[item.variant_id]
+                line.quantity += item.quantity
+                updated_items.append(line)
+            else:
+                new_items.append(CartItem(
+                    cart=cart, variant_id=item.variant_id,
+                    quantity=item.quantity, added_price=item.added_price,
+                ))
+        CartItem.objects.bulk_update(updated_items, ['quantity'])
+        CartItem.objects.bulk_create(new_items)
+        guest_id = guest.pk
+        guest.delete()
+        cart.save(update_fields=['updated_at'])
+
+    cache.delete_many([_summary_key(guest_id), _summary_key(cart.pk)])
+    return True
+
+
+def set_quantity(cart, variant, quantity, add=False):
+    """
+    Set (or with `add`, increase) a line's quantity; zero or less removes it
+    """
+    with transaction.atomic():
+        item = CartItem.objects.select_for_update().filter(cart=cart, variant=variant).first()
+        created = False
+        if item is None and quantity > 0:
+            try:
+                with transaction.atomic():
+                    CartItem.objects.create(
+                        cart=cart, variant=variant, quantity=quantity, added_price=unit_price(variant),
+                    )
+                created = True
+            except IntegrityError:
+                # A concurrent request added this size first; update its line instead
+                item = CartItem.objects.select_for_update().get(cart=cart, variant=variant)
+        if not created:
+            if add and item is not None:
+                quantity += item.quantity
+            if quantity <= 0:
+                if item is not None:
+                    item.delete()
+            else:
+                item.quantity = quantity
+                item.save(update_fields=['quantity'])
+        cart.save(update_fields=['updated_at'])
+    invalidate_summary(cart)
+
+
+def clear_cart(cart):
+    cart.items.all().delete()
+    cart.save(update_fields=['updated_at'])
+    invalidate_summary(cart)
+
+
+def empty_summary():
+    return {"items": [], "item_count": 0, "subtotal": '0.00', "valid": True}
+
+
+def _build_summary(cart):
+    """Reprice and stock-check every line in one query"""
+    items = list(
+        CartItem.objects.filter(cart=cart)
+        .select_related('variant__product')
+        .annotate(shard_stock=Sum('variant__stock_shards__stock'))
+    )
+    lines = []
+    subtotal = Decimal('0.00')
+    for item in items:
+        variant = item.variant
+        price = unit_price(variant)
+        available = (item.shard_stock or 0) if variant.sharded else variant.stock
+        line_total = price * item.quantity
+        subtotal += line_total
+        lines.append({
+            "variant_id": variant.id,
+            "product_id": variant.product_id,
+            "product_name": variant.product.name,
+            "size": variant.size,
+            "image": variant.product.image,
+            "quantity": item.quantity,
+            "unit_price": str(price),
+            "added_price": str(item.added_price),
+            "price_changed": price != item.added_price,
+            "available_stock": available,
+            "in_stock": available >= item.quantity,
+            "subtotal": str(line_total),
+        })
+    return {
+        "items": lines,
+        "item_count": sum(line["quantity"] for line in lines),
+        "subtotal": str(subtotal),
+        "valid": all(line["in_stock"] for line in lines),
+    }
+
+
+def cart_summary(cart):
+    """
+    Current prices and stock for every line in the cart
+
+    Served from the cache unless a variant in the cart changed since the
+    summary was built.
+    """
+    key = _summary_key(cart.pk)
+    cached = cache.get(key)
+    if cached is not None:
+        expected = {_stamp_key(variant_id): stamp for variant_id, stamp in cached['stamps'].items()}
+        if cache.get_many(list(expected)) == expected:
+            return cached['summary']
+
+    # Read stamps before the rows so a change made mid-build is not missed
+    variant_ids = list(cart.items.values_list('variant_id', flat=True))
+    stamps = _current_stamps(variant_ids)
+    summary = _build_summary(cart)
+    cache.set(key, {'stamps': stamps, 'summary': summary}, timeout=SUMMARY_TIMEOUT)
+    return summary
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def _variant_changed(sender, instance, **kwargs):
+    touch_variants_on_commit([instance.pk])
+
+
+@receiver(catalog_bulk_changed)
+def _variants_bulk_changed(sender, variant_ids=(), **kwargs):
+    touch_variants_on_commit(variant_ids)
+
+
+@receiver(post_save, sender=VariantStockShard)
+def _shard_changed(sender, instance, **kwargs):
+    touch_variants_on_commit([instance.variant_id])
+
+
+@receiver(post_save, sender=Product)
+def _product_changed(sender, instance, created, **kwargs):
+    if not created:
+        touch_variants_on_commit(instance.variants.values_list('id', flat=True))
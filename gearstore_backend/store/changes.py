@@ -0,0 +1,192 @@
+"""
+Incremental catalog change feed
+
+Every product and variant write appends a CatalogChange row in the same
+transaction: saves and deletes through model signals, bulk writes through
+catalog_bulk_changed, and stock sold through store/stock.py explicitly.
+Deletes are kept as tombstones. The row id only grows, so a client syncs by
+asking for everything after the last id it saw and pays for what changed,
+not for the size of the catalog. Pages return each object's current state
+once, however many times it changed.
+
+On databases where transactions commit concurrently, a lower id can become
+visible after a higher one, so readers hold entries back until every write
+transaction that could still add a lower id has ended. On PostgreSQL the
+cutoff is the start of the oldest write transaction still open, however
+long it runs; CHANGE_FEED_SETTLE_SECONDS is subtracted on top to cover
+clock skew between app servers and the database. SQLite commits one write
+transaction at a time, so only the settle window applies there; on other
+backends the window must exceed the longest catalog write transaction.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import CatalogChange, Product, ProductVariant
+from .product_rows import render_products
+from .signals import catalog_bulk_changed
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 2000
+
+# Product fields in the feed; stock is carried by the variants
+PRODUCT_FIELDS = {'fields': 'id,name,base_price,image,image_thumb,image_medium,team,description,category', 'expand': ''}
+
+_batch = threading.local()
+
+
+def record_changes(kind, object_ids, deleted=False):
+    entries = [CatalogChange(kind=kind, object_id=object_id, deleted=deleted) for object_id in object_ids]
+    buffer = getattr(_batch, 'entries', None)
+    if buffer is not None:
+        buffer.extend(entries)
+    else:
+        CatalogChange.objects.bulk_create(entries)
+
+
+@contextmanager
+def batched_changes():
+    """
+    Record every change made in the block with one INSERT at the end
+
+    Deletes send post_delete per row, so without this a bulk write that
+    removes N rows would add N tombstone INSERTs. Use inside the write's
+    transaction so the entries commit or roll back with it.
+    """
+    if getattr(_batch, 'entries', None) is not None:
+        yield
+        return
+    _batch.entries = []
+    try:
+        yield
+        entries = _batch.entries
+    finally:
+        _batch.entries = None
+    CatalogChange.objects.bulk_create(entries)
+
+
+def _variant_rows(variant_ids):
+    rows = (
+        ProductVariant.objects.filter(id__in=variant_ids)
+        .values('id', 'product_id', 'size', 'stock', 'price_override', 'sharded')
+        .annotate(shard_stock=Sum('stock_shards__stock'))
+        .order_by('id')
+    )
+    return [
+        {
+            'id': row['id'],
+            'product': row['product_id'],
+            'size': row['size'],
+            'stock': (row['shard_stock'] or 0) if row['sharded'] else row['stock'],
+            'price_override': None if row['price_override'] is None else f"{row['price_override']:.2f}",
+        }
+        for row in rows
+    ]
+
+
+def _oldest_open_write():
+    """Start of the oldest write transaction open in another session, where the backend reports it"""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        # backend_xid is only assigned once a transaction writes
+        cursor.execute(
+            "SELECT min(xact_start) FROM pg_stat_activity"
+            " WHERE datname = current_database() AND backend_xid IS NOT NULL AND pid <> pg_backend_pid()"
+        )
+        return cursor.fetchone()[0]
+
+
+def settled(entries):
+    """Leave out entries a still-open transaction could yet commit a lower id before"""
+    settle = settings.CHANGE_FEED_SETTLE_SECONDS
+    oldest = _oldest_open_write()
+    if not settle and oldest is None:
+        return entries
+    cutoff = timezone.now() if oldest is None else min(timezone.now(), oldest)
+    return entries.filter(recorded_at__lte=cutoff - timedelta(seconds=settle))
+
+
+def changes_since(token, limit=DEFAULT_PAGE_SIZE, request=None):
+    """
+    One page of the change feed
+
+    Args:
+        token: Last change id the client has applied (0 for a full sync)
+        limit: Log entries to read; objects changed several times count once
+
+    Returns:
+        dict: {"next", "has_more", "products", "variants",
+        "deleted": {"products", "variants"}}; pass "next" as the next token
+    """
+    entries = settled(CatalogChange.objects.filter(id__gt=token)).order_by('id')
+    entries = list(entries.values_list('id', 'kind', 'object_id')[:limit])
+
+    changed = {CatalogChange.PRODUCT: set(), CatalogChange.VARIANT: set()}
+    for _, kind, object_id in entries:
+        changed[kind].add(object_id)
+
+    # Send current state; anything no longer there is reported deleted
+    products = render_products(
+        Product.objects.filter(id__in=changed[CatalogChange.PRODUCT]).order_by('id'), PRODUCT_FIELDS, request,
+    ) if changed[CatalogChange.PRODUCT] else []
+    variants = _variant_rows(changed[CatalogChange.VARIANT]) if changed[CatalogChange.VARIANT] else []
+
+    return {
+        "next": entries[-1][0] if entries else token,
+        "has_more": len(entries) == limit,
+        "products": products,
+        "variants": variants,
+        "deleted": {
+            "products": sorted(changed[CatalogChange.PRODUCT] - {product['id'] for product in products}),
+            "variants": sorted(changed[CatalogChange.VARIANT] - {variant['id'] for variant in variants}),
+        },
+    }
+
+
+def compact_changes():
+    """
+    Drop entries superseded by a later entry for the same object
+
+    Every token still leads to the latest state of every object, so clients
+    are unaffected; the log shrinks to one entry per object ever written.
+
+    Returns:
+        int: Entries deleted
+    """
+    latest = CatalogChange.objects.values('kind', 'object_id').annotate(last=Max('id')).values('last')
+    deleted, _ = CatalogChange.objects.exclude(id__in=latest).delete()
+    return deleted
+
+
+@receiver(post_save, sender=Product)
+def _product_saved(sender, instance, **kwargs):
+    record_changes(CatalogChange.PRODUCT, [instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def _product_deleted(sender, instance, **kwargs):
+    record_changes(CatalogChange.PRODUCT, [instance.pk], deleted=True)
+
+
+@receiver(post_save, sender=ProductVariant)
+def _variant_saved(sender, instance, **kwargs):
+    record_changes(CatalogChange.VARIANT, [instance.pk])
+
+
+@receiver(post_delete, sender=ProductVariant)
+def _variant_deleted(sender, instance, **kwargs):
+    record_changes(CatalogChange.VARIANT, [instance.pk], deleted=True)
+
+
+@receiver(catalog_bulk_changed)
+def _bulk_changed(sender, product_ids=(), variant_ids=(), **kwargs):
+    record_changes(CatalogChange.PRODUCT, product_ids)
+    record_changes(CatalogChange.VARIANT, variant_ids)
@@ -0,0 +1,114 @@
+"""
+Facet counts for the catalog filter sidebar
+
+Counts products per team, per in-stock size and per price band for the
+current filter and search state. The three GROUP BYs are combined with
+UNION ALL so the database answers them in one round trip, and the result is
+cached per normalized filter key and catalog version. Stock sold through
+checkout does not change the catalog version, so size counts can lag by up
+to FACET_CACHE_TTL seconds.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from .models import ProductVariant
+from .versions import catalog_version
+
+# (label, min inclusive, max exclusive) in USD
+PRICE_BANDS = [
+    ('under-25', None, 25),
+    ('25-50', 25, 50),
+    ('50-100', 50, 100),
+    ('100-plus', 100, None),
+]
+
+# Query parameters that change the product set
+FILTER_PARAMS = ('team', 'search', 'price_min', 'price_max', 'size_available')
+
+
+def filter_key(query_params):
+    """Cache key for the filter state, ignoring order, blanks and search case"""
+    params = {}
+    for name in FILTER_PARAMS:
+        value = (query_params.get(name) or '').strip()
+        if name == 'search':
+            value = ' '.join(value.lower().split())
+        if value:
+            params[name] = value
+    digest = hashlib.sha256(urlencode(sorted(params.items())).encode()).hexdigest()[:32]
+    return f"facets:{catalog_version()}:{digest}"
+
+
+def _price_band():
+    whens = []
+    for label, low, high in PRICE_BANDS:
+        condition = Q()
+        if low is not None:
+            condition &= Q(base_price__gte=low)
+        if high is not None:
+            condition &= Q(base_price__lt=high)
+        whens.append(When(condition, then=Value(label)))
+    return Case(*whens, output_field=CharField())
+
+
+def count_facets(products):
+    """
+    Facet counts for a filtered Product queryset, in one query
+
+    Returns:
+        dict: {"total", "teams", "sizes", "price_bands"}
+    """
+    products = products.order_by()
+    by_team = (
+        products.values('team')
+        .annotate(facet=Value('team'), count=Count('id', distinct=True))
+        .values_list('facet', 'team', 'count')
+    )
+    by_band = (
+        products.annotate(band=_price_band()).values('band')
+        .annotate(facet=Value('price'), count=Count('id', distinct=True))
+        .values_list('facet', 'band', 'count')
+    )
+    by_size = (
+        ProductVariant.objects.order_by()
+        .filter(product__in=products.values('id'))
+        .filter(Q(sharded=False, stock__gt=0) | Q(sharded=True, stock_shards__stock__gt=0))
+        .values('size')
+        .annotate(facet=Value('size'), count=Count('product_id', distinct=True))
+        .values_list('facet', 'size', 'count')
+    )
+
+    counts = {'team': {}, 'price': {}, 'size': {}}
+    for facet, value, count in by_team.union(by_band, by_size, all=True):
+        counts[facet][value] = count
+
+    def ranked(values):
+        return [
+            {"value": value, "count": count}
+            for value, count in sorted(values.items(), key=lambda item: (-item[1], item[0]))
+            if value
+        ]
+
+    return {
+        "total": sum(counts['team'].values()),
+        "teams": ranked(counts['team']),
+        "sizes": ranked(counts['size']),
+        "price_bands": [
+            {"value": label, "min": low, "max": high, "count": counts['price'].get(label, 0)}
+            for label, low, high in PRICE_BANDS
+        ],
+    }
+
+
+def product_facets(products, query_params):
+    """count_facets, cached per filter state"""
+    key = filter_key(query_params)
+    facets = cache.get(key)
+    if facets is None:
+        facets = count_facets(products)
+        cache.set(key, facets, timeout=settings.FACET_CACHE_TTL)
+    return facets
@@ -0,0 +1,121 @@
+"""
+Local image renditions for product cards and detail pages
+"""
+import hashlib
+import io
+import logging
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Rendition name -> longest edge in pixels
+RENDITIONS = {
+    'thumb': 200,
+    'medium': 400,
+}
+
+# Renditions are WebP only; the API exposes no other format
+RENDITION_EXT = 'webp'
+RENDITION_OPTIONS = {'quality': 80, 'method': 4}
+
+RENDITION_DIR = 'products'
+
+
+def rendition_path(image_hash, name):
+    """Relative path of a rendition under MEDIA_ROOT"""
+    return f"{RENDITION_DIR}/{image_hash}/{name}.{RENDITION_EXT}"
+
+
+def has_current_renditions(product):
+    """Renditions exist and were built from the product's current image URL"""
+    return bool(product.image_hash) and product.image_source == product.image
+
+
+def rendition_url(product, name, request=None):
+    """
+    URL of a product image rendition
+
+    Falls back to the original image URL until renditions have been built
+    for the current source.
+    """
+    return image_rendition_url(product.image, product.image_hash, product.image_source, name, request)
+
+
+def image_rendition_url(image, image_hash, image_source, name, request=None):
+    """rendition_url for raw column values, e.g. rows from .values()"""
+    if not (image_hash and image_source == image):
+        return image
+
+    url = f"{settings.MEDIA_URL}{rendition_path(image_hash, name)}"
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def fetch_image(url, timeout=10):
+    """Download the source image bytes"""
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content
+
+
+def build_renditions(content):
+    """
+    Write every rendition of an image to MEDIA_ROOT
+
+    Args:
+        content: Source image bytes
+
+    Returns:
+        str: Content hash the renditions are stored under
+    """
+    image_hash = hashlib.sha256(content).hexdigest()[:16]
+    root = Path(settings.MEDIA_ROOT)
+    target_dir = root / RENDITION_DIR / image_hash
+
+    expected = [root / rendition_path(image_hash, name) for name in RENDITIONS]
+    if all(path.exists() for path in expected):
+        # Same bytes already rendered (e.g. two products sharing a photo)
+        return image_hash
+
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    with Image.open(io.BytesIO(content)) as source:
+        source = source.convert('RGB')
+        for name, size in RENDITIONS.items():
+            resized = source.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            resized.save(root / rendition_path(image_hash, name), 'WEBP', **RENDITION_OPTIONS)
+
+    return image_hash
+
+
+def refresh_product_image(product, force=False):
+    """
+    Build renditions for a product if its image URL changed
+
+    Args:
+        product: Product instance
+        force: Rebuild even if renditions are current
+
+    Returns:
+        bool: True if renditions were (re)built
+    """
+    if not force and has_current_renditions(product):
+        return False
+
+    content = fetch_image(product.image)
+    product.image_hash = build_renditions(content)
+    product.image_source = product.image
+
+    # Avoid save() so unrelated fields and signals are left alone
+    type(product).objects.filter(pk=product.pk).update(
+        image_hash=product.image_hash,
+        image_source=product.image_source,
+    )
+    logger.info(f"Built image renditions for product {product.pk} ({product.image_hash})")
+    return True
@@ -0,0 +1,173 @@
+"""
+Live variant stock for product pages, pushed as server-sent events
+
+One StockBroker per process tails the catalog change feed
+(store/changes.py) every LIVE_STOCK_WINDOW seconds while anyone is
+watching. Each tick is one query for the variants changed since the last
+tick and one for their current stock, whatever the number of watchers, and
+every change inside a window reaches a watcher as one event with the
+latest stock per variant. Because the feed records writes from every
+process, sales made by other workers are pushed too. Like the change feed's
+readers, the broker only reads entries older than
+CHANGE_FEED_SETTLE_SECONDS, so it cannot step past one that commits late;
+updates arrive that much later. A failed poll (say, the database
+restarting) is logged and retried with growing pauses, up to
+MAX_POLL_BACKOFF seconds, while watchers keep their streams open.
+
+Events carry absolute stock rather than differences, so a slow client that
+skips events (its pending updates are merged) still ends up correct.
+
+Needs an ASGI server. Under WSGI, Django consumes an async streaming body
+to the end before sending it, which for this endless stream means a worker
+that never returns and a response that grows without bound, so the view
+answers 501 there instead.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max, Sum
+
+from .changes import settled
+from .models import CatalogChange, ProductVariant
+
+logger = logging.getLogger(__name__)
+
+# Longest pause between polls while the feed keeps failing
+MAX_POLL_BACKOFF = 30
+
+
+def variant_stock(**filters):
+    """{product_id: {variant_id: {"id", "size", "stock"}}} with shard stock summed"""
+    rows = (
+        ProductVariant.objects.filter(**filters)
+        .values('id', 'product_id', 'size', 'stock', 'sharded')
+        .annotate(shard_stock=Sum('stock_shards__stock'))
+        .order_by('id')
+    )
+    stock = defaultdict(dict)
+    for row in rows:
+        stock[row['product_id']][row['id']] = {
+            'id': row['id'],
+            'size': row['size'],
+            'stock': (row['shard_stock'] or 0) if row['sharded'] else row['stock'],
+        }
+    return stock
+
+
+class Subscription:
+    """One watcher's pending updates, merged until the watcher reads them"""
+
+    def __init__(self, product_id):
+        self.product_id = product_id
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+    def offer(self, variants):
+        self.pending.update(variants)
+        self.ready.set()
+
+    async def next(self, timeout):
+        """Updates since the last call, or {} after `timeout` seconds without any"""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self.ready.clear()
+        variants, self.pending = self.pending, {}
+        return variants
+
+
+class StockBroker:
+    """Fans stock changes out to the subscriptions of each product"""
+
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.last_change = None
+        self._task = None
+
+    def subscribe(self, product_id):
+        subscription = Subscription(product_id)
+        self.subscriptions[product_id].add(subscription)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        watchers = self.subscriptions.get(subscription.product_id)
+        if watchers is not None:
+            watchers.discard(subscription)
+            if not watchers:
+                del self.subscriptions[subscription.product_id]
+
+    def poll(self, product_ids):
+        """
+        Current stock of watched variants changed since the previous poll
+
+        The first poll only records where the feed ends.
+        """
+        if self.last_change is None:
+            self.last_change = settled(CatalogChange.objects).aggregate(last=Max('id'))['last'] or 0
+            return {}
+        changes = list(
+            settled(CatalogChange.objects.filter(id__gt=self.last_change, kind=CatalogChange.VARIANT))
+            .order_by('id')
+            .values_list('id', 'object_id')
+        )
+        if not changes:
+            return {}
+        self.last_change = changes[-1][0]
+        return variant_stock(id__in={object_id for _, object_id in changes}, product_id__in=product_ids)
+
+    def publish(self, updates):
+        for product_id, variants in updates.items():
+            for subscription in self.subscriptions.get(product_id, ()):
+                subscription.offer(variants)
+
+    async def _run(self):
+        failures = 0
+        try:
+            while self.subscriptions:
+                delay = settings.LIVE_STOCK_WINDOW
+                try:
+                    updates = await sync_to_async(self.poll)(set(self.subscriptions))
+                except Exception:
+                    failures += 1
+                    delay = min(delay * 2 ** failures, MAX_POLL_BACKOFF)
+                    logger.exception(f"Live stock poll failed ({failures} in a row); retrying in {delay:.1f}s")
+                else:
+                    failures = 0
+                    self.publish(updates)
+                await asyncio.sleep(delay)
+        finally:
+            # Start from the feed's end again when the next watcher arrives
+            self.last_change = None
+
+
+broker = StockBroker()
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def stock_events(product_id):
+    """
+    Server-sent events for one product page
+
+    A "stock" event with every variant first, then one "stock" event per
+    window with the variants that changed, and comments as keepalives.
+    """
+    subscription = broker.subscribe(product_id)
+    try:
+        snapshot = await sync_to_async(variant_stock)(product_id=product_id)
+        yield sse_event('stock', list(snapshot.get(product_id, {}).values()))
+        while True:
+            variants = await subscription.next(settings.LIVE_STOCK_KEEPALIVE)
+            yield sse_event('stock', list(variants.values())) if variants else ': keepalive\n\n'
+    finally:
+        broker.unsubscribe(subscription)
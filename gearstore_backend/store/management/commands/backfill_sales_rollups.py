@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from store.models import Order, OrderItem, DailyProductSales, DailyTeamSales
+from store.rollups import PAID_STATUSES, apply_sales, lock_rollups
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the daily sales rollups from order history in chunks
+
+    The whole rebuild is one transaction: reports keep reading the old
+    totals until it commits, and orders marked paid meanwhile wait for it
+    rather than being counted both live and by the rebuild.
+    """
+
+    help = "Rebuild the daily sales rollups from order history in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Orders per chunk')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        with transaction.atomic():
+            lock_rollups()
+            DailyProductSales.objects.all().delete()
+            DailyTeamSales.objects.all().delete()
+
+            paid_orders = Order.objects.filter(status__in=PAID_STATUSES).order_by('id')
+            last_id = 0
+            orders_done = 0
+
+            while True:
+                order_ids = list(paid_orders.filter(id__gt=last_id).values_list('id', flat=True)[:chunk_size])
+                if not order_ids:
+                    break
+
+                # Aggregate the chunk in the database, then merge into the rollups
+                lines = (
+                    OrderItem.objects.filter(order_id__in=order_ids)
+                    .values('product_name', 'variant_size', date=TruncDate('order__created_at'))
+                    .annotate(units=Sum('quantity'), revenue=Sum(F('price') * F('quantity')))
+                    .order_by()
+                )
+                apply_sales(
+                    (line['date'], line['product_name'], line['variant_size'], line['units'], line['revenue'])
+                    for line in lines
+                )
+
+                last_id = order_ids[-1]
+                orders_done += len(order_ids)
+                self.stdout.write(f'Rolled up {orders_done} orders')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Backfill complete: {DailyProductSales.objects.count()} product rows, '
+                f'{DailyTeamSales.objects.count()} team rows from {orders_done} orders'
+            )
+        )
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from store import benchmarks
+from store.models import Category
+
+
+class Command(BaseCommand):
+    """Compare the ProductSerializer and .values() product list paths at several catalog sizes"""
+
+    help = "Compare the ProductSerializer and .values() product list paths at several catalog sizes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='Products per run')
+        parser.add_argument('--variants', type=int, default=5, help='Sizes per product')
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--query', default='', help='Query string, e.g. "fields=id,name,stock&expand="')
+
+    # Clearing the catalog between sizes must not rebuild the real snapshot
+    @override_settings(CATALOG_SNAPSHOT_AUTO_BUILD=False)
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f"{'products':>9}{'path':>12}{'p50 ms':>10}{'mean ms':>10}{'queries':>9}")
+            for size in options['sizes']:
+                Category.objects.all().delete()
+                benchmarks.generate_catalog(products=size, variants=options['variants'])
+                results = benchmarks.run_product_list_benchmark(options['iterations'], options['query'])
+                for path in ('serializer', 'rows'):
+                    row = results[path]
+                    self.stdout.write(
+                        f"{size:>9}{path:>12}{row['p50']:>10.1f}{row['mean']:>10.1f}{row['queries']:>9}"
+                    )
+                line = f"{size} products: rows path is {results['speedup']:.1f}x faster"
+                if results['identical']:
+                    self.stdout.write(self.style.SUCCESS(line))
+                else:
+                    self.stdout.write(self.style.ERROR(f"{line}, but the output differs"))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
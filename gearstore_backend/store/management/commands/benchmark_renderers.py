@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from store import benchmarks
+
+
+class Command(BaseCommand):
+    """Compare JSONRenderer and ORJSONRenderer on the product list in a throwaway test database"""
+
+    help = "Compare JSONRenderer and ORJSONRenderer on the product list in a throwaway test database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--variants', type=int, default=5, help='Sizes per product')
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            benchmarks.generate_catalog(products=options['products'], variants=options['variants'])
+            results = benchmarks.run_rendering_benchmark(iterations=options['iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"Product list: {options['products']} products x {options['variants']} variants")
+        self.stdout.write(f"{'renderer':<12}{'p50 ms':>10}{'mean ms':>10}{'bytes':>12}")
+        for name, row in results['renderers'].items():
+            self.stdout.write(f"{name:<12}{row['p50']:>10.2f}{row['mean']:>10.2f}{row['bytes']:>12}")
+        for encoding, row in results['compression'].items():
+            self.stdout.write(f"{encoding:<12}{'':>10}{row['mean']:>10.2f}{row['bytes']:>12}")
+
+        if not results['identical']:
+            self.stdout.write(self.style.WARNING('Renderers produced different bytes'))
+        self.stdout.write(self.style.SUCCESS(
+            f"orjson saves {results['saved_ms']:.2f} ms of rendering per product list request"
+        ))
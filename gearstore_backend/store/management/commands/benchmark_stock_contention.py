@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from concurrent.futures import ThreadPoolExecutor
+import time
+from store.models import Category, Product, ProductVariant
+from store.stock import DEFAULT_SHARDS, decrement_stock, enable_sharding
+
+
+class Command(BaseCommand):
+    """Compare concurrent single-row and sharded stock decrements on one hot variant in a throwaway test database"""
+
+    help = "Compare concurrent single-row and sharded stock decrements on one hot variant in a throwaway test database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--decrements', type=int, default=2000, help='Total decrements per mode')
+        parser.add_argument('--shards', type=int, default=DEFAULT_SHARDS)
+
+    # Creating the benchmark products must not rebuild the real snapshot
+    @override_settings(CATALOG_SNAPSHOT_AUTO_BUILD=False)
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite locks the whole database on write, so sharding cannot help here; '
+                'run against PostgreSQL/MySQL for meaningful numbers'
+            ))
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            category = Category.objects.create(name='Contention benchmark', slug='contention')
+            for mode in ('single-row', 'sharded'):
+                product = Product.objects.create(
+                    category=category, name=f'Contention {mode}', base_price=1,
+                    image='https://example.com/benchmark.jpg', description='Benchmark',
+                )
+                variant = ProductVariant.objects.create(product=product, size='M', stock=options['decrements'])
+                if mode == 'sharded':
+                    variant = enable_sharding(variant, shards=options['shards'])
+                self.report(mode, *self.run(variant, options['threads'], options['decrements']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, variant, threads, decrements):
+        def worker(count):
+            taken = errors = 0
+            try:
+                for _ in range(count):
+                    try:
+                        taken += decrement_stock(variant, 1)
+                    except OperationalError:
+                        errors += 1
+            finally:
+                connections.close_all()
+            return taken, errors
+
+        per_thread = [decrements // threads + (1 if i < decrements % threads else 0) for i in range(threads)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(worker, per_thread))
+        elapsed = time.perf_counter() - start
+
+        variant.refresh_from_db()
+        return (
+            elapsed,
+            sum(taken for taken, _ in results),
+            sum(errors for _, errors in results),
+            variant.available_stock,
+        )
+
+    def report(self, mode, elapsed, taken, errors, remaining):
+        self.stdout.write(
+            f'{mode:<12} {taken / elapsed:>10.0f} decrements/s  '
+            f'({taken} taken in {elapsed:.2f}s, {errors} lock errors, {remaining} left)'
+        )
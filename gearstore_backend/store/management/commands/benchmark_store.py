@@ -0,0 +1,88 @@
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from store import benchmarks
+
+
+class Command(BaseCommand):
+    """Benchmark store endpoints against a synthetic catalog in a throwaway test database"""
+
+    help = "Benchmark store endpoints against a synthetic catalog in a throwaway test database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--variants', type=int, default=5, help='Sizes per product')
+        parser.add_argument('--categories', type=int, default=5)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--baseline',
+            default=str(settings.BASE_DIR / 'benchmarks' / 'store_baseline.json'),
+            help='Baseline JSON file to compare against or save to',
+        )
+        parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.25,
+            help='Allowed p95 regression as a fraction (0.25 = 25%%)',
+        )
+
+    def handle(self, *args, **options):
+        # The per-request profile log would drown out the results table
+        logging.getLogger('gearstore_backend.middleware').setLevel(logging.ERROR)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            catalog = benchmarks.generate_catalog(
+                products=options['products'],
+                variants=options['variants'],
+                categories=options['categories'],
+                seed=options['seed'],
+            )
+            results = benchmarks.run_benchmarks(
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"Catalog: {catalog['products']} products x {catalog['variants']} variants, "
+            f"{catalog['categories']} categories"
+        )
+        self.stdout.write(
+            f"{'scenario':<24}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'status':>8}{'bytes':>10}"
+        )
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<24}{row['p50']:>9.2f}{row['p95']:>9.2f}{row['p99']:>9.2f}"
+                f"{row['queries']:>9}{row['status']:>8}{row['bytes']:>10}"
+            )
+
+        if options['save_baseline']:
+            benchmarks.save_baseline(options['baseline'], catalog, results)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}"))
+            return
+
+        baseline = benchmarks.load_baseline(options['baseline'])
+        if baseline is None:
+            self.stdout.write(self.style.WARNING('No baseline found; run with --save-baseline to create one'))
+            return
+
+        if baseline['catalog'] != catalog:
+            raise CommandError(
+                f"Baseline was recorded with catalog {baseline['catalog']}; rerun with the same sizes"
+            )
+
+        regressions = benchmarks.compare_to_baseline(results, baseline, threshold=options['threshold'])
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            raise CommandError(f"{len(regressions)} benchmark regression(s) against baseline")
+
+        self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
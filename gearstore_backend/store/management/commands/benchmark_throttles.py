@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import ScopedRateThrottle
+import time
+from gearstore_backend.throttling import GCRAEmailThrottle, GCRAIPThrottle
+
+
+class _View:
+    throttle_scope = 'benchmark'
+
+
+class Command(BaseCommand):
+    """Time one throttle check against the configured cache, GCRA vs DRF's sliding log"""
+
+    help = "Time one throttle check against the configured cache, GCRA vs DRF's sliding log"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=20000)
+        parser.add_argument('--clients', type=int, default=1000, help='Distinct IPs/emails cycled through')
+        parser.add_argument('--rate', default='1000/min', help='Rate limit applied during the run')
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        requests = []
+        for i in range(options['clients']):
+            request = Request(
+                factory.post('/', {'email': f'fan{i}@example.com'}, format='json', REMOTE_ADDR=f'10.0.{i // 256}.{i % 256}'),
+                parsers=[JSONParser()],
+            )
+            request.data  # parse once so only the throttle is timed
+            requests.append(request)
+
+        rates = {'benchmark': options['rate'], 'benchmark_email': options['rate']}
+        # DRF reads its rates once at import time
+        drf_throttle = type('BenchmarkScopedRateThrottle', (ScopedRateThrottle,), {'THROTTLE_RATES': rates})
+
+        with override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': rates}):
+            for name, throttle_class in (
+                ('gcra-ip', GCRAIPThrottle),
+                ('gcra-email', GCRAEmailThrottle),
+                ('drf-scoped', drf_throttle),
+            ):
+                self.report(name, self.time_checks(throttle_class, requests, options['checks']))
+
+    def time_checks(self, throttle_class, requests, checks):
+        view = _View()
+        start = time.perf_counter()
+        for i in range(checks):
+            throttle_class().allow_request(requests[i % len(requests)], view)
+        return (time.perf_counter() - start) / checks
+
+    def report(self, name, seconds):
+        self.stdout.write(f'{name:<12} {seconds * 1e6:>8.1f} µs per check')
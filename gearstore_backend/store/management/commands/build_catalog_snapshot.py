@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from store.snapshots import brotli, build_snapshot
+
+
+class Command(BaseCommand):
+    """Write the catalog snapshot served at /api/store/catalog/ (JSON, gzip, brotli)"""
+
+    help = "Write the catalog snapshot served at /api/store/catalog/ (JSON, gzip, brotli)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=5,
+            help='Number of snapshot versions to keep on disk',
+        )
+
+    def handle(self, *args, **options):
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('brotli is not installed; writing JSON and gzip only'))
+
+        manifest = build_snapshot(keep=options['keep'])
+        sizes = ', '.join(f'{encoding} {size} bytes' for encoding, size in manifest['sizes'].items())
+
+        if manifest['built']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Built catalog snapshot {manifest['version']}: {manifest['products']} products ({sizes})"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Catalog unchanged, snapshot {manifest['version']} is current"))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+import requests
+from store.models import Product
+from store.images import refresh_product_image
+
+
+class Command(BaseCommand):
+    """Fetch product images once and write thumb/medium renditions to MEDIA_ROOT"""
+
+    help = "Fetch product images once and write thumb/medium renditions to MEDIA_ROOT"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild renditions even if the image URL has not changed',
+        )
+
+    def handle(self, *args, **options):
+        built_count = 0
+        skipped_count = 0
+        failed_count = 0
+
+        for product in Product.objects.only('id', 'name', 'image', 'image_hash', 'image_source'):
+            try:
+                built = refresh_product_image(product, force=options['force'])
+            except (requests.exceptions.RequestException, OSError) as e:
+                failed_count += 1
+                self.stdout.write(self.style.WARNING(f'Failed for {product.name}: {e}'))
+                continue
+
+            if built:
+                built_count += 1
+                self.stdout.write(f'Built renditions for: {product.name} ({product.image_hash})')
+            else:
+                skipped_count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Renditions complete: {built_count} built, {skipped_count} up to date, {failed_count} failed'
+            )
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from store.recommendations import build_related_products
+
+
+class Command(BaseCommand):
+    """Rebuild "fans also bought" neighbours from paid order history"""
+
+    help = 'Rebuild "fans also bought" neighbours from paid order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int, default=10, help='Neighbours stored per product')
+        parser.add_argument(
+            '--min-co-orders',
+            type=int,
+            default=1,
+            help='Orders two products must share to count as related',
+        )
+
+    def handle(self, *args, **options):
+        stats = build_related_products(top_n=options['top_n'], min_co_orders=options['min_co_orders'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stats['rows']} related products for {stats['products']} products "
+            f"from {stats['baskets']} paid orders"
+        ))
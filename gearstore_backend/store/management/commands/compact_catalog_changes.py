@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from store.changes import compact_changes
+from store.models import CatalogChange
+
+
+class Command(BaseCommand):
+    """Drop change feed entries superseded by a later change to the same object"""
+
+    help = "Drop change feed entries superseded by a later change to the same object"
+
+    def handle(self, *args, **options):
+        deleted = compact_changes()
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {deleted} superseded changes, {CatalogChange.objects.count()} remain"
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+import time
+from store.outbox import drain
+
+
+class Command(BaseCommand):
+    """Send queued outbox emails in batches; run with --interval as a background worker"""
+
+    help = "Send queued outbox emails in batches; run with --interval as a background worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails per batch')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Seconds between passes; 0 runs a single pass',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            totals = drain(batch_size=options['batch_size'])
+            if any(totals.values()) or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Sent {totals['sent']} emails, {totals['retried']} to retry, {totals['failed']} failed"
+                ))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
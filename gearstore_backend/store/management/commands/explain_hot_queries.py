@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from store.query_plans import EXPECTED_SCANS, explain_hot_queries
+
+
+class Command(BaseCommand):
+    """EXPLAIN the catalog filter and order lookup queries and flag full table scans"""
+
+    help = "EXPLAIN the catalog filter and order lookup queries and flag full table scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sql', action='store_true', help='Print the SQL of each query')
+        parser.add_argument(
+            '--fail-on-scan',
+            action='store_true',
+            help='Exit with an error if an unexpected full table scan is found',
+        )
+
+    def handle(self, *args, **options):
+        unexpected = []
+
+        for name, sql, plan, scans in explain_hot_queries():
+            if scans and name not in EXPECTED_SCANS:
+                unexpected.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}: full scan of {", ".join(scans)}'))
+            elif scans:
+                self.stdout.write(self.style.WARNING(f'{name}: full scan of {", ".join(scans)} (expected)'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: indexed'))
+
+            if options['sql']:
+                self.stdout.write(f'  {sql}')
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}')
+
+        if unexpected and options['fail_on_scan']:
+            raise CommandError(f'Unexpected full table scans: {", ".join(unexpected)}')
@@ -0,0 +1,107 @@
+from django.core.management.base import BaseCommand
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import time
+
+
+class PaystackStubHandler(BaseHTTPRequestHandler):
+    """Answer the Paystack endpoints PaystackAPI calls with canned success responses"""
+
+    latency = 0.0
+    jitter = 0.0
+    failure_rate = 0.0
+
+    def _respond(self, status_code, body):
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        payload = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _failed(self):
+        if random.random() < self.failure_rate:
+            self._respond(400, {"status": False, "message": "Stubbed gateway failure"})
+            return True
+        return False
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/transaction/initialize':
+            self._respond(404, {"status": False, "message": "Not found"})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if self._failed():
+            return
+
+        reference = request.get('reference', 'stub')
+        self._respond(200, {
+            "status": True,
+            "message": "Authorization URL created",
+            "data": {
+                "authorization_url": f"https://checkout.paystack.com/{reference}",
+                "access_code": reference.lower(),
+                "reference": reference,
+            },
+        })
+
+    def do_GET(self):
+        prefix = '/transaction/verify/'
+        if not self.path.startswith(prefix):
+            self._respond(404, {"status": False, "message": "Not found"})
+            return
+        if self._failed():
+            return
+
+        reference = self.path[len(prefix):]
+        self._respond(200, {
+            "status": True,
+            "message": "Verification successful",
+            "data": {
+                "reference": reference,
+                "status": "success",
+                "amount": 100000,
+                "paid_at": "2024-01-01T00:00:00.000Z",
+                "customer": {"email": "stub@example.com"},
+                "metadata": {},
+            },
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    """Run a local Paystack stand-in for load tests; point PAYSTACK_BASE_URL at it"""
+
+    help = "Run a local Paystack stand-in for load tests; point PAYSTACK_BASE_URL at it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8099)
+        parser.add_argument('--latency-ms', type=float, default=150, help='Simulated gateway latency')
+        parser.add_argument('--jitter-ms', type=float, default=100, help='Random extra latency, 0..jitter')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of calls that fail')
+
+    def handle(self, *args, **options):
+        handler = type('ConfiguredStubHandler', (PaystackStubHandler,), {
+            'latency': options['latency_ms'] / 1000,
+            'jitter': options['jitter_ms'] / 1000,
+            'failure_rate': options['failure_rate'],
+        })
+        server = ThreadingHTTPServer((options['host'], options['port']), handler)
+        self.stdout.write(self.style.SUCCESS(
+            f"Paystack stub listening on http://{options['host']}:{options['port']}\n"
+            f"Start the backend with PAYSTACK_BASE_URL=http://{options['host']}:{options['port']}"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+import time
+from store.models import ProductVariant
+from store.stock import rebalance
+
+
+class Command(BaseCommand):
+    """Even out sharded variant stock counters; run with --interval as a background worker"""
+
+    help = "Even out sharded variant stock counters; run with --interval as a background worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Seconds between passes; 0 runs a single pass',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            for variant in ProductVariant.objects.filter(sharded=True).only('id'):
+                total = rebalance(variant)
+                self.stdout.write(f'Rebalanced variant {variant.id}: {total} in stock')
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
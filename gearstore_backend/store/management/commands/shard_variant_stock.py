@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from store.models import ProductVariant
+from store.stock import DEFAULT_SHARDS, disable_sharding, enable_sharding
+
+
+class Command(BaseCommand):
+    """Move hot variants' stock into shard counters, or fold it back with --disable"""
+
+    help = "Move hot variants' stock into shard counters, or fold it back with --disable"
+
+    def add_arguments(self, parser):
+        parser.add_argument('variant_ids', nargs='+', type=int, help='ProductVariant ids')
+        parser.add_argument('--shards', type=int, default=DEFAULT_SHARDS)
+        parser.add_argument('--disable', action='store_true', help='Fold shards back into ProductVariant.stock')
+
+    def handle(self, *args, **options):
+        if options['shards'] < 1:
+            raise CommandError('--shards must be at least 1')
+        variants = ProductVariant.objects.in_bulk(options['variant_ids'])
+        missing = sorted(set(options['variant_ids']) - set(variants))
+        if missing:
+            raise CommandError(f"Unknown variants: {', '.join(map(str, missing))}")
+
+        for variant in variants.values():
+            if options['disable']:
+                variant = disable_sharding(variant)
+                self.stdout.write(f'Variant {variant.id} unsharded: {variant.stock} in stock')
+            else:
+                variant = enable_sharding(variant, shards=options['shards'])
+                self.stdout.write(
+                    f'Variant {variant.id} sharded over {variant.stock_shards.count()} counters: '
+                    f'{variant.available_stock} in stock'
+                )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_rename_price_product_base_price_remove_product_stock_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_source',
+            field=models.URLField(blank=True),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:39
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_order_user_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('product_name', models.CharField(max_length=200)),
+                ('variant_size', models.CharField(max_length=50)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+            options={
+                'ordering': ['-date', 'product_name', 'variant_size'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'product_name', 'variant_size'), name='daily_product_sales_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyTeamSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('team', models.CharField(blank=True, max_length=50)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+            options={
+                'ordering': ['-date', 'team'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'team'), name='daily_team_sales_uniq')],
+            },
+        ),
+    ]
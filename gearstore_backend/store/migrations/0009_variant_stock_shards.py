@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:40
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariant',
+            name='sharded',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='VariantStockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('stock', models.IntegerField(validators=[django.core.validators.MinValueValidator(0)])),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='store.productvariant')),
+            ],
+            options={
+                'ordering': ['variant', 'shard'],
+                'unique_together': {('variant', 'shard')},
+            },
+        ),
+    ]
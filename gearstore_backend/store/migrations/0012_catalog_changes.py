@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:04
+
+from django.db import migrations, models
+
+
+def record_existing_catalog(apps, schema_editor):
+    """Log every existing product and variant so ?since=0 is a full sync"""
+    CatalogChange = apps.get_model('store', 'CatalogChange')
+    for kind, model in (('product', 'Product'), ('variant', 'ProductVariant')):
+        ids = apps.get_model('store', model).objects.order_by('id').values_list('id', flat=True)
+        CatalogChange.objects.bulk_create(
+            [CatalogChange(kind=kind, object_id=object_id) for object_id in ids.iterator()],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_related_products'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('variant', 'Variant')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['kind', 'object_id', 'id'], name='catalog_change_object_idx')],
+            },
+        ),
+        migrations.RunPython(record_existing_catalog, migrations.RunPython.noop),
+    ]
@@ -23,12 +23,21 @@ class Product(models.Model):
     image = models.URLField()
     team = models.CharField(max_length=50, blank=True)
     description = models.TextField()
+    # Local renditions, see store/images.py
+    image_hash = models.CharField(max_length=64, blank=True)
+    image_source = models.URLField(blank=True)
 
     def __str__(self):
         return self.name
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            # ?team= alone or with a price range
+            models.Index(fields=['team', 'base_price'], name='product_team_price_idx'),
+            # ?price_min= / ?price_max= without a team
+            models.Index(fields=['base_price'], name='product_price_idx'),
+        ]
 
 
 class ProductVariant(models.Model):
@@ -44,10 +53,47 @@ class ProductVariant(models.Model):
         null=True,
         blank=True
     )
+    # Flash-sale mode: stock lives in VariantStockShard rows, see store/stock.py
+    sharded = models.BooleanField(default=False)
 
     def __str__(self):
         return f"{self.product.name} - {self.size}"
 
+    @property
+    def available_stock(self):
+        """Current stock, summing shards for sharded variants"""
+        if not self.sharded:
+            return self.stock
+        return sum(shard.stock for shard in self.stock_shards.all())
+
     class Meta:
         ordering = ['size']
         unique_together = ['product', 'size']
+        indexes = [
+            # ?size_available= (size match with stock > 0)
+            models.Index(fields=['size', 'stock'], name='variant_size_stock_idx'),
+        ]
+
+
+class VariantStockShard(models.Model):
+    """One of K counter rows holding a sharded variant's stock"""
+
+    variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    stock = models.IntegerField(validators=[MinValueValidator(0)])
+
+    def __str__(self):
+        return f"{self.variant} [shard {self.shard}]: {self.stock}"
+
+    class Meta:
+        ordering = ['variant', 'shard']
+        unique_together = ['variant', 'shard']
+
+
+# Register payment, reporting, cart, recommendation, change feed and outbox models with the store app
+from .models_payment import Order, OrderItem, PaymentTransaction  # noqa: E402,F401
+from .models_reports import DailyProductSales, DailyTeamSales  # noqa: E402,F401
+from .models_cart import Cart, CartItem  # noqa: E402,F401
+from .models_recommendations import RelatedProduct  # noqa: E402,F401
+from .models_changes import CatalogChange  # noqa: E402,F401
+from .models_outbox import OutboxEmail  # noqa: E402,F401
@@ -0,0 +1,38 @@
+"""
+Server-side carts for guests and signed-in fans
+"""
+from django.db import models
+from django.contrib.auth.models import User
+from django.core.validators import MinValueValidator
+from decimal import Decimal
+
+
+class Cart(models.Model):
+    """A fan's cart; guests are identified by `token`, signed-in fans by `user`"""
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True, related_name='cart')
+    token = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        owner = self.user.username if self.user_id else f"guest {self.token[:8]}"
+        return f"Cart {self.pk} ({owner})"
+
+
+class CartItem(models.Model):
+    """One size of one product in a cart"""
+
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    variant = models.ForeignKey('store.ProductVariant', on_delete=models.CASCADE, related_name='cart_items')
+    quantity = models.IntegerField(validators=[MinValueValidator(1)])
+    # Price when the line was added, so reads can flag price changes
+    added_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['added_at', 'id']
+        unique_together = ['cart', 'variant']
+
+    def __str__(self):
+        return f"{self.variant} x{self.quantity}"
@@ -0,0 +1,32 @@
+"""
+Append-only log of catalog writes behind the change feed, see store/changes.py
+"""
+from django.db import models
+
+
+class CatalogChange(models.Model):
+    """A product or variant was written or deleted; the id is the sync token"""
+
+    PRODUCT = 'product'
+    VARIANT = 'variant'
+    KIND_CHOICES = [
+        (PRODUCT, 'Product'),
+        (VARIANT, 'Variant'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # Tombstone: the object was deleted
+    deleted = models.BooleanField(default=False)
+    recorded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Compaction keeps the latest entry per object
+            models.Index(fields=['kind', 'object_id', 'id'], name='catalog_change_object_idx'),
+        ]
+
+    def __str__(self):
+        action = 'deleted' if self.deleted else 'changed'
+        return f"#{self.pk} {self.kind} {self.object_id} {action}"
@@ -0,0 +1,49 @@
+"""
+Transactional email outbox, drained by manage.py dispatch_outbox
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEmail(models.Model):
+    """An email written with the change that caused it, sent later"""
+
+    ORDER_CONFIRMATION = 'order_confirmation'
+    KIND_CHOICES = [
+        (ORDER_CONFIRMATION, 'Order confirmation'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    order = models.ForeignKey('store.Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='emails')
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    # Pending emails are sent once this has passed; pushed back after each failure
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # While sending: when the dispatcher's claim lapses and another may take the email
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # The dispatcher's "due" scan
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'kind'], name='outbox_order_kind_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.to_email} ({self.status})"
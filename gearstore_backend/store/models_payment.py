@@ -31,6 +31,14 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Order history for a signed-in customer, newest first
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # Guest order lookup by email, newest first
+            models.Index(fields=['email', '-created_at'], name='order_email_created_idx'),
+            # Admin/fulfilment queues by status, newest first
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+        ]
     
     def __str__(self):
         return f"Order {self.order_id} - {self.email}"
@@ -66,6 +74,9 @@ class PaymentTransaction(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-created_at'], name='paytxn_status_created_idx'),
+        ]
     
     def __str__(self):
         return f"Transaction {self.reference} - {self.status}"
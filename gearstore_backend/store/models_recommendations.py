@@ -0,0 +1,26 @@
+"""
+Precomputed "fans also bought" neighbours, see store/recommendations.py
+"""
+from django.db import models
+
+
+class RelatedProduct(models.Model):
+    """One of a product's top-N co-purchased products"""
+
+    product = models.ForeignKey('store.Product', on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey('store.Product', on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    # Paid orders containing both products
+    co_orders = models.IntegerField()
+    # co_orders / sqrt(orders(product) * orders(related))
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            # Also the index /products/{id}/related/ reads through
+            models.UniqueConstraint(fields=['product', 'rank'], name='related_product_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} (#{self.rank}, {self.score:.3f})"
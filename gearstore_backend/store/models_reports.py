@@ -0,0 +1,42 @@
+"""
+Precomputed sales rollups for reporting
+"""
+from django.db import models
+from decimal import Decimal
+
+
+class DailyProductSales(models.Model):
+    """Units and revenue per product and size per day"""
+
+    date = models.DateField()
+    product_name = models.CharField(max_length=200)
+    variant_size = models.CharField(max_length=50)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        ordering = ['-date', 'product_name', 'variant_size']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product_name', 'variant_size'], name='daily_product_sales_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_name} ({self.variant_size}) x{self.quantity}"
+
+
+class DailyTeamSales(models.Model):
+    """Units and revenue per team per day"""
+
+    date = models.DateField()
+    team = models.CharField(max_length=50, blank=True)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        ordering = ['-date', 'team']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'team'], name='daily_team_sales_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.team or 'No team'} x{self.quantity}"
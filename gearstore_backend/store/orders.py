@@ -0,0 +1,32 @@
+"""
+Order state changes shared by payment verification and webhooks
+"""
+from django.db import transaction
+
+from .models import Order
+from .outbox import queue_order_confirmation
+from .rollups import PAID_STATUSES, record_order_sales
+
+
+def mark_order_paid(order):
+    """
+    Mark an order paid, record it in the sales rollups and queue its
+    confirmation email, atomically
+
+    Safe to call more than once (verify and webhook can both fire).
+
+    Returns:
+        bool: True if the order was newly marked paid
+    """
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(pk=order.pk)
+        if order.status in PAID_STATUSES:
+            return False
+
+        order.status = 'paid'
+        order.payment_verified = True
+        order.save(update_fields=['status', 'payment_verified', 'updated_at'])
+        record_order_sales(order)
+        queue_order_confirmation(order)
+
+    return True
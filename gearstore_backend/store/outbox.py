@@ -0,0 +1,170 @@
+"""
+Transactional email outbox
+
+Emails are written as OutboxEmail rows in the same transaction as the
+change they announce (an order confirmation commits with the order being
+marked paid), so none are lost and none go out for a rolled-back change,
+and the request that caused them never waits on SMTP. manage.py
+dispatch_outbox sends due rows in batches over one mail connection. A
+failed send is retried with exponential backoff up to OUTBOX_MAX_ATTEMPTS
+times, then marked failed.
+
+A dispatcher claims its batch first, marking the rows sending with a lease
+(claimed_until) in one short transaction, and only then talks to SMTP, so
+no database transaction is held open across sends and concurrent
+dispatchers never send the same email. Delivery is still at least once: if
+a dispatcher dies after sending but before saving results, its lease lapses
+after OUTBOX_LEASE_SECONDS and those emails are claimed and sent again.
+An email whose lease lapses on its last attempt is marked failed instead,
+so one that crashes every dispatcher is not retried forever.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between two attempts at one email
+MAX_BACKOFF = timedelta(hours=6)
+
+
+def queue_order_confirmation(order):
+    """Write the confirmation for a newly paid order; call inside its transaction"""
+    lines = [
+        f"{item.quantity} x {item.product_name} ({item.variant_size}) - {item.price * item.quantity}"
+        for item in order.items.all()
+    ]
+    body = "\n".join([
+        f"Thanks for your order {order.order_id}! Your payment was received.",
+        "",
+        *lines,
+        "",
+        f"Total paid: {order.total_amount}",
+    ])
+    return OutboxEmail.objects.create(
+        kind=OutboxEmail.ORDER_CONFIRMATION,
+        order=order,
+        to_email=order.email,
+        subject=f"Order {order.order_id} confirmed",
+        body=body,
+    )
+
+
+def retry_delay(attempts):
+    """Wait after the `attempts`-th failed attempt: base, 2x base, 4x base... capped"""
+    delay = timedelta(seconds=settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return min(delay, MAX_BACKOFF)
+
+
+def _claim(batch_size):
+    """
+    Take up to `batch_size` due emails for this dispatcher
+
+    Due means pending and past next_attempt_at, or sending under a lease that
+    has lapsed. Each row is claimed with an UPDATE that only matches while it
+    is still due, so of two dispatchers racing for a row exactly one wins;
+    this needs no SELECT ... SKIP LOCKED, which SQLite lacks. The claim counts
+    as an attempt, so an email that kills its dispatcher still runs out of
+    attempts (see _fail_abandoned).
+
+    Returns:
+        tuple: (claimed OutboxEmails, the lease they were claimed until)
+    """
+    now = timezone.now()
+    due = Q(status='pending', next_attempt_at__lte=now) | Q(
+        status='sending', claimed_until__lt=now, attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+    )
+    candidates = list(OutboxEmail.objects.filter(due).order_by('id').values_list('id', flat=True)[:batch_size])
+    lease = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    claimed = []
+    with transaction.atomic():
+        for pk in candidates:
+            if OutboxEmail.objects.filter(due, pk=pk).update(
+                status='sending', claimed_until=lease, attempts=F('attempts') + 1,
+            ):
+                claimed.append(pk)
+    return list(OutboxEmail.objects.filter(pk__in=claimed).order_by('id')), lease
+
+
+def _fail_abandoned():
+    """
+    Mark failed the emails whose lease lapsed on their last attempt
+
+    Returns:
+        int: Emails marked failed
+    """
+    return OutboxEmail.objects.filter(
+        status='sending', claimed_until__lt=timezone.now(), attempts__gte=settings.OUTBOX_MAX_ATTEMPTS,
+    ).update(status='failed', claimed_until=None, last_error='Dispatcher stopped before saving the result')
+
+
+def send_batch(mail_connection, batch_size):
+    """
+    Send up to `batch_size` due emails over an open mail connection
+
+    Emails are claimed in a short transaction, sent outside any transaction,
+    then their results saved. A result is only saved while this dispatcher
+    still holds the claim.
+
+    Returns:
+        dict: {"sent", "retried", "failed"}; all zero when nothing was due
+    """
+    counts = {"sent": 0, "retried": 0, "failed": _fail_abandoned()}
+    emails, lease = _claim(batch_size)
+    results = []
+    for email in emails:
+        message = EmailMessage(
+            email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.to_email],
+            connection=mail_connection,
+        )
+        try:
+            message.send()
+        except Exception as exc:
+            logger.warning("Outbox email %s failed (attempt %s): %s", email.pk, email.attempts, exc)
+            results.append((email, str(exc)[:1000]))
+        else:
+            results.append((email, None))
+
+    now = timezone.now()
+    with transaction.atomic():
+        for email, error in results:
+            claim = OutboxEmail.objects.filter(pk=email.pk, status='sending', claimed_until=lease)
+            if error is None:
+                claim.update(status='sent', sent_at=now, claimed_until=None)
+                counts["sent"] += 1
+            elif email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                claim.update(status='failed', last_error=error, claimed_until=None)
+                counts["failed"] += 1
+            else:
+                claim.update(
+                    status='pending', last_error=error, claimed_until=None,
+                    next_attempt_at=now + retry_delay(email.attempts),
+                )
+                counts["retried"] += 1
+    return counts
+
+
+def drain(batch_size=100):
+    """
+    Send every due email, batch by batch, over one reused mail connection
+
+    Returns:
+        dict: Totals of send_batch's counts
+    """
+    totals = {"sent": 0, "retried": 0, "failed": 0}
+    with get_connection() as mail_connection:
+        while True:
+            counts = send_batch(mail_connection, batch_size)
+            for key, value in counts.items():
+                totals[key] += value
+            # Retried emails are not due again yet, so a short batch is the last
+            if sum(counts.values()) < batch_size:
+                break
+    return totals
@@ -5,16 +5,25 @@ import requests
 from django.conf import settings
 from decimal import Decimal
 import logging
+import time
+
+from gearstore_backend.metrics import PAYSTACK_LATENCY
 
 logger = logging.getLogger(__name__)
 
 
+def _outcome(result):
+    """Classify a Paystack response for the latency histogram"""
+    return 'success' if result.get('status') else 'declined'
+
+
 class PaystackAPI:
     """Wrapper for Paystack API calls"""
     
     BASE_URL = "https://api.paystack.co"
     
     def __init__(self):
+        self.base_url = getattr(settings, 'PAYSTACK_BASE_URL', self.BASE_URL)
         self.secret_key = settings.PAYSTACK_SECRET_KEY
         self.headers = {
             "Authorization": f"Bearer {self.secret_key}",
@@ -34,7 +43,7 @@ class PaystackAPI:
         Returns:
             dict: Response from Paystack API
         """
-        url = f"{self.BASE_URL}/transaction/initialize"
+        url = f"{self.base_url}/transaction/initialize"
         
         payload = {
             "email": email,
@@ -51,11 +60,15 @@ class PaystackAPI:
         logger.info(f"Paystack Payload: email={email}, amount={int(amount * 100)} kobo, reference={reference}")
         logger.info(f"Secret Key being used: {self.secret_key[:20]}...")
         
+        start = time.perf_counter()
         try:
             response = requests.post(url, json=payload, headers=self.headers)
             response.raise_for_status()
-            return response.json()
+            result = response.json()
+            PAYSTACK_LATENCY.observe(time.perf_counter() - start, operation='initialize', outcome=_outcome(result))
+            return result
         except requests.exceptions.HTTPError as e:
+            PAYSTACK_LATENCY.observe(time.perf_counter() - start, operation='initialize', outcome='http_error')
             # Log the full error response from Paystack
             logger.error(f"Paystack HTTP Error: {e}")
             logger.error(f"Response Status: {response.status_code}")
@@ -68,6 +81,7 @@ class PaystackAPI:
             }
             return error_detail
         except requests.exceptions.RequestException as e:
+            PAYSTACK_LATENCY.observe(time.perf_counter() - start, operation='initialize', outcome='network_error')
             return {
                 "status": False,
                 "message": f"Payment initialization failed: {str(e)}"
@@ -83,13 +97,23 @@ class PaystackAPI:
         Returns:
             dict: Response from Paystack API
         """
-        url = f"{self.BASE_URL}/transaction/verify/{reference}"
+        url = f"{self.base_url}/transaction/verify/{reference}"
         
+        start = time.perf_counter()
         try:
             response = requests.get(url, headers=self.headers)
             response.raise_for_status()
-            return response.json()
+            result = response.json()
+            PAYSTACK_LATENCY.observe(time.perf_counter() - start, operation='verify', outcome=_outcome(result))
+            return result
+        except requests.exceptions.HTTPError as e:
+            PAYSTACK_LATENCY.observe(time.perf_counter() - start, operation='verify', outcome='http_error')
+            return {
+                "status": False,
+                "message": f"Transaction verification failed: {str(e)}"
+            }
         except requests.exceptions.RequestException as e:
+            PAYSTACK_LATENCY.observe(time.perf_counter() - start, operation='verify', outcome='network_error')
             return {
                 "status": False,
                 "message": f"Transaction verification failed: {str(e)}"
@@ -106,7 +130,7 @@ class PaystackAPI:
         Returns:
             dict: Response from Paystack API
         """
-        url = f"{self.BASE_URL}/transaction"
+        url = f"{self.base_url}/transaction"
         params = {"perPage": per_page, "page": page}
         
         try:
@@ -0,0 +1,127 @@
+"""
+Serializer-free rendering of product lists
+
+ProductSerializer builds a field tree and calls to_representation per field
+per product, which dominates list requests once the catalog has thousands
+of products. render_products produces the same dicts from .values() rows:
+one query for the products (with their category) and one grouped query for
+all of their variants, with sharded stock summed in the database.
+
+Any change to ProductSerializer's output must be mirrored here; the parity
+test in store/tests.py compares the two on every field combination.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from .images import image_rendition_url
+from .models import ProductVariant
+from .serializers import ProductSerializer
+
+_CENTS = Decimal('0.01')
+
+_ROW_COLUMNS = {
+    'id': ('id',),
+    'name': ('name',),
+    'base_price': ('base_price',),
+    'image': ('image',),
+    'image_thumb': ('image', 'image_hash', 'image_source'),
+    'image_medium': ('image', 'image_hash', 'image_source'),
+    'team': ('team',),
+    'description': ('description',),
+    'variants': (),
+    'stock': (),
+}
+
+
+def _decimal(value):
+    """DecimalField(decimal_places=2) representation"""
+    if value is None:
+        return None
+    return f"{value.quantize(_CENTS):f}"
+
+
+def _variants_by_product(product_ids_query):
+    """Variant dicts per product id, in ProductVariant's default order"""
+    rows = (
+        ProductVariant.objects.filter(product_id__in=product_ids_query)
+        .values('id', 'product_id', 'size', 'stock', 'price_override', 'sharded')
+        .annotate(shard_stock=Sum('stock_shards__stock'))
+        .order_by(*ProductVariant._meta.ordering, 'id')
+    )
+    grouped = defaultdict(list)
+    for row in rows:
+        stock = (row['shard_stock'] or 0) if row['sharded'] else row['stock']
+        grouped[row['product_id']].append({
+            'id': row['id'],
+            'size': row['size'],
+            'stock': stock,
+            'price_override': _decimal(row['price_override']),
+        })
+    return grouped
+
+
+def render_products(queryset, query_params, request=None):
+    """
+    ProductSerializer(queryset, many=True).data without the serializer
+
+    Args:
+        queryset: Filtered, ordered Product queryset
+        query_params: Request query parameters (?fields= / ?expand=)
+        request: Used for absolute rendition URLs, as in the serializer
+
+    Returns:
+        list: One dict per product, identical to the serializer's output
+    """
+    fields, expanded = ProductSerializer.field_selection(query_params)
+    order = [name for name in ProductSerializer.Meta.fields if name in fields]
+
+    columns = {'id'}
+    for name in fields:
+        columns.update(_ROW_COLUMNS.get(name, ()))
+    if 'category' in fields:
+        columns.add('category_id')
+        if 'category' in expanded:
+            columns.update({'category__name', 'category__slug'})
+    annotations = {}
+    if 'stock' in fields and 'variants' not in fields:
+        annotations['total_stock'] = ProductSerializer.total_stock_expression()
+
+    # The rows replace model instances, so drop anything that loads related objects
+    base = queryset.prefetch_related(None).select_related(None)
+    rows = list(base.annotate(**annotations).values(*columns, *annotations))
+
+    variants = {}
+    if 'variants' in fields or 'stock' in fields and not annotations:
+        variants = _variants_by_product(base.values('id'))
+
+    products = []
+    for row in rows:
+        product_variants = variants.get(row['id'], [])
+        values = {
+            'id': row['id'],
+            'name': row.get('name'),
+            'base_price': _decimal(row.get('base_price')),
+            'image': row.get('image'),
+            'team': row.get('team'),
+            'description': row.get('description'),
+        }
+        if 'image_thumb' in fields or 'image_medium' in fields:
+            image = (row['image'], row['image_hash'], row['image_source'])
+            values['image_thumb'] = image_rendition_url(*image, 'thumb', request)
+            values['image_medium'] = image_rendition_url(*image, 'medium', request)
+        if 'category' in fields:
+            values['category'] = (
+                {'id': row['category_id'], 'name': row['category__name'], 'slug': row['category__slug']}
+                if 'category' in expanded else row['category_id']
+            )
+        if 'variants' in fields:
+            values['variants'] = product_variants
+        if 'stock' in fields:
+            values['stock'] = (
+                row['total_stock'] if annotations
+                else sum(variant['stock'] for variant in product_variants)
+            )
+        products.append({name: values[name] for name in order})
+    return products
@@ -0,0 +1,84 @@
+"""
+Query plans for the hot catalog filters and order lookups
+
+Used by the explain_hot_queries command and store/tests.py to catch queries
+that fall back to a full table scan.
+"""
+import re
+
+from django.db import connection
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .models import Order, OrderItem, PaymentTransaction, ProductVariant
+from .views import ProductViewSet
+
+# Filter combinations the shop page sends to /api/store/products/
+PRODUCT_LIST_PARAMS = {
+    'product_list': {},
+    'product_team': {'team': 'Arsenal'},
+    'product_price_min': {'price_min': '20'},
+    'product_price_max': {'price_max': '100'},
+    'product_price_range': {'price_min': '20', 'price_max': '100'},
+    'product_team_price_range': {'team': 'Arsenal', 'price_min': '20', 'price_max': '100'},
+    'product_size_available': {'size_available': 'M'},
+    'product_search': {'search': 'Jersey'},
+}
+
+# Queries that must read the whole table: the unfiltered catalog, and
+# icontains search, which no B-tree index can serve
+EXPECTED_SCANS = {'product_list', 'product_search'}
+
+_SQLITE_SCAN_RE = re.compile(r'\bSCAN (\w+)\b(?! USING (?:COVERING )?INDEX)')
+_POSTGRES_SCAN_RE = re.compile(r'\bSeq Scan on (\w+)')
+
+
+def product_list_queryset(params):
+    """The exact queryset ProductViewSet.list builds for these query params"""
+    request = Request(APIRequestFactory().get('/api/store/products/', params))
+    view = ProductViewSet(action='list', request=request, format_kwarg=None, kwargs={}, args=())
+    return view.filter_queryset(view.get_queryset())
+
+
+def hot_querysets():
+    """Name -> queryset for every hot query shape"""
+    querysets = {name: product_list_queryset(params) for name, params in PRODUCT_LIST_PARAMS.items()}
+    now = timezone.now()
+    querysets.update({
+        'product_variants': ProductVariant.objects.filter(product_id=1),
+        'order_by_order_id': Order.objects.filter(order_id='AGS-00000000'),
+        'order_by_reference': Order.objects.filter(payment_reference='AGS-REF'),
+        'orders_by_email': Order.objects.filter(email='fan@example.com'),
+        'orders_by_status': Order.objects.filter(status='pending', created_at__lt=now),
+        'orders_by_user': Order.objects.filter(user_id=1),
+        'order_history_page': Order.objects.filter(user_id=1, created_at__lt=now).order_by('-created_at')[:21],
+        'order_items': OrderItem.objects.filter(order_id=1),
+        'transactions_by_status': PaymentTransaction.objects.filter(status='success'),
+        'transaction_by_reference': PaymentTransaction.objects.filter(reference='AGS-REF'),
+    })
+    return querysets
+
+
+def full_table_scans(plan, vendor=None):
+    """Tables a query plan reads in full"""
+    vendor = vendor or connection.vendor
+    if vendor == 'sqlite':
+        return _SQLITE_SCAN_RE.findall(plan)
+    if vendor == 'postgresql':
+        return _POSTGRES_SCAN_RE.findall(plan)
+    return []
+
+
+def explain_hot_queries():
+    """
+    EXPLAIN every hot query
+
+    Returns:
+        list: (name, sql, plan, scanned_tables) tuples
+    """
+    results = []
+    for name, queryset in hot_querysets().items():
+        plan = queryset.explain()
+        results.append((name, str(queryset.query), plan, full_table_scans(plan)))
+    return results
@@ -0,0 +1,176 @@
+"""
+Memoized checkout quotes
+
+A quote prices a cart once: subtotal, loyalty points, delivery and the
+Naira amount sent to Paystack. It is cached under a content hash of the
+cart's (variant_id, quantity) lines, the delivery fee and the catalog price
+version, so previewing the same cart again is a cache read and the payment
+step can take the quote id instead of repricing and re-checking stock.
+
+Saving any product or variant bumps the price version, which retires every
+outstanding quote.
+"""
+import hashlib
+import json
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .carts import unit_price
+from .models import Product, ProductVariant
+from .signals import catalog_bulk_changed
+
+# Prices are stored in USD; Paystack charges in Naira
+NAIRA_PER_USD = 1600
+
+_PRICE_VERSION_KEY = 'checkout:price_version'
+
+# Error body for a quote id that is unknown, expired or priced before a change
+QUOTE_EXPIRED = {"error": "Quote expired or prices changed, please request a new quote", "code": "quote_expired"}
+
+
+class QuoteError(Exception):
+    """The cart cannot be quoted, e.g. a size is out of stock"""
+
+    def __init__(self, message, out_of_stock=False):
+        super().__init__(message)
+        self.out_of_stock = out_of_stock
+
+
+def price_version():
+    """Current catalog price version, issuing one if the cache lost it"""
+    version = cache.get(_PRICE_VERSION_KEY)
+    if version is None:
+        cache.add(_PRICE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(_PRICE_VERSION_KEY)
+    return version
+
+
+def bump_price_version():
+    cache.set(_PRICE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def normalize_lines(lines):
+    """Sorted ((variant_id, quantity), ...) with repeated sizes combined"""
+    totals = Counter()
+    for variant_id, quantity in lines:
+        totals[int(variant_id)] += int(quantity)
+    return tuple(sorted(totals.items()))
+
+
+def fingerprint(lines, delivery_fee, version):
+    payload = json.dumps([lines, f"{delivery_fee:.2f}", version])
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _quote_key(quote_id):
+    return f"checkout:quote:{quote_id}"
+
+
+def _build_quote(quote_id, lines, delivery_fee, version):
+    """Price and stock-check every line with one query"""
+    variants = {
+        variant.id: variant
+        for variant in ProductVariant.objects.filter(id__in=[variant_id for variant_id, _ in lines])
+        .select_related('product')
+        .annotate(shard_stock=Sum('stock_shards__stock'))
+    }
+    missing = [variant_id for variant_id, _ in lines if variant_id not in variants]
+    if missing:
+        raise QuoteError(f"Unknown variant ids: {', '.join(map(str, missing))}")
+
+    items = []
+    subtotal = Decimal('0.00')
+    subtotal_naira = 0
+    for variant_id, quantity in lines:
+        variant = variants[variant_id]
+        available = (variant.shard_stock or 0) if variant.sharded else variant.stock
+        if available < quantity:
+            raise QuoteError(
+                f"Insufficient stock for {variant.product.name} - {variant.size}. Available: {available}",
+                out_of_stock=True,
+            )
+        price = unit_price(variant)
+        price_naira = float(price) * NAIRA_PER_USD
+        subtotal += price * quantity
+        subtotal_naira += price_naira * quantity
+        items.append({
+            "variant_id": variant_id,
+            "product_name": variant.product.name,
+            "size": variant.size,
+            "quantity": quantity,
+            "price": price_naira,
+            "subtotal": price_naira * quantity,
+        })
+
+    ttl = settings.CHECKOUT_QUOTE_TTL
+    return {
+        "quote_id": quote_id,
+        "items": items,
+        "subtotal_usd": str(subtotal),
+        # 1 point per $10
+        "points": int(subtotal // 10),
+        "subtotal": subtotal_naira,
+        "delivery_fee": delivery_fee,
+        "total": subtotal_naira + delivery_fee,
+        "price_version": version,
+        "expires_at": time.time() + ttl,
+    }
+
+
+def get_or_create_quote(lines, delivery_fee=0):
+    """
+    Quote a cart, reusing a live quote for the same lines and prices
+
+    Args:
+        lines: iterable of (variant_id, quantity)
+        delivery_fee: Delivery fee in Naira
+
+    Raises:
+        QuoteError: Unknown variant or not enough stock
+    """
+    lines = normalize_lines(lines)
+    if not lines:
+        raise QuoteError("Cart is empty")
+    delivery_fee = float(delivery_fee)
+    version = price_version()
+    quote_id = fingerprint(lines, delivery_fee, version)
+
+    quote = cache.get(_quote_key(quote_id))
+    if quote is None:
+        quote = _build_quote(quote_id, lines, delivery_fee, version)
+        cache.set(_quote_key(quote_id), quote, timeout=settings.CHECKOUT_QUOTE_TTL)
+    return quote
+
+
+def get_quote(quote_id):
+    """A live quote, or None if it expired or prices changed since"""
+    if not quote_id or not isinstance(quote_id, str):
+        return None
+    quote = cache.get(_quote_key(quote_id))
+    if quote is None or quote['price_version'] != price_version():
+        return None
+    return quote
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def _prices_changed(sender, **kwargs):
+    # Only once the new prices are visible, or a quote built in between
+    # would carry old prices under the new version
+    transaction.on_commit(bump_price_version)
+
+
+@receiver(catalog_bulk_changed)
+def _prices_bulk_changed(sender, **kwargs):
+    transaction.on_commit(bump_price_version)
@@ -0,0 +1,157 @@
+"""
+Offline "fans also bought" build from paid order history
+
+OrderItem keeps product names and sizes rather than foreign keys, so lines
+are mapped back to products once, in memory, from a (name, size) lookup.
+Each paid order becomes a basket of product ids; the item-item
+co-occurrence matrix is kept sparse (a dict of dicts holding only pairs
+that were actually bought together) and scored by cosine similarity, and
+the top-N neighbours per product replace the RelatedProduct table in one
+transaction. Reads are then a single indexed query on (product, rank).
+"""
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import transaction
+
+from .images import image_rendition_url
+from .models import OrderItem, ProductVariant, RelatedProduct
+from .rollups import PAID_STATUSES
+
+# Baskets larger than this (bulk or staff orders) say little about taste and
+# cost O(n^2) pairs, so they are skipped
+MAX_BASKET_SIZE = 50
+
+
+def product_resolver():
+    """
+    Map OrderItem (product_name, variant_size) strings to product ids
+
+    Prefers an exact name and size match, which tells apart products that
+    share a name; falls back to the name alone when only one product has it.
+    Products renamed since the order was placed cannot be resolved.
+    """
+    by_line = {}
+    by_name = defaultdict(set)
+    for product_id, name, size in ProductVariant.objects.values_list('product_id', 'product__name', 'size'):
+        by_line.setdefault((name, size), product_id)
+        by_name[name].add(product_id)
+    unique_names = {name: ids.pop() for name, ids in by_name.items() if len(ids) == 1}
+
+    def resolve(product_name, variant_size):
+        return by_line.get((product_name, variant_size)) or unique_names.get(product_name)
+
+    return resolve
+
+
+def paid_baskets(resolve, chunk_size=2000):
+    """Yield the set of product ids in each paid order, streaming order lines"""
+    lines = (
+        OrderItem.objects.filter(order__status__in=PAID_STATUSES)
+        .order_by('order_id')
+        .values_list('order_id', 'product_name', 'variant_size')
+    )
+    current, basket = None, set()
+    for order_id, product_name, variant_size in lines.iterator(chunk_size=chunk_size):
+        if order_id != current:
+            if basket:
+                yield basket
+            current, basket = order_id, set()
+        product_id = resolve(product_name, variant_size)
+        if product_id is not None:
+            basket.add(product_id)
+    if basket:
+        yield basket
+
+
+def co_occurrence(baskets):
+    """
+    Sparse item-item co-occurrence counts
+
+    Returns:
+        tuple: ({product_id: orders}, {product_id: {other_id: orders with both}})
+    """
+    orders = defaultdict(int)
+    pairs = defaultdict(lambda: defaultdict(int))
+    for basket in baskets:
+        if len(basket) > MAX_BASKET_SIZE:
+            continue
+        items = sorted(basket)
+        for index, product_id in enumerate(items):
+            orders[product_id] += 1
+            row = pairs[product_id]
+            for other_id in items[index + 1:]:
+                row[other_id] += 1
+                pairs[other_id][product_id] += 1
+    return orders, pairs
+
+
+def top_neighbours(orders, pairs, top_n, min_co_orders=1):
+    """Top-N (related_id, co_orders, score) per product by cosine similarity"""
+    neighbours = {}
+    for product_id, row in pairs.items():
+        scored = (
+            (count / math.sqrt(orders[product_id] * orders[other_id]), count, other_id)
+            for other_id, count in row.items()
+            if count >= min_co_orders
+        )
+        # Ties go to the more often co-bought, then the older product
+        best = heapq.nsmallest(top_n, scored, key=lambda item: (-item[0], -item[1], item[2]))
+        if best:
+            neighbours[product_id] = [(other_id, count, score) for score, count, other_id in best]
+    return neighbours
+
+
+def build_related_products(top_n=10, min_co_orders=1):
+    """
+    Rebuild the RelatedProduct table from paid orders
+
+    Returns:
+        dict: {"baskets", "products", "rows"}
+    """
+    baskets = 0
+
+    def counted(source):
+        nonlocal baskets
+        for basket in source:
+            baskets += 1
+            yield basket
+
+    orders, pairs = co_occurrence(counted(paid_baskets(product_resolver())))
+    neighbours = top_neighbours(orders, pairs, top_n, min_co_orders)
+    rows = [
+        RelatedProduct(product_id=product_id, related_id=other_id, rank=rank, co_orders=count, score=score)
+        for product_id, ranked in neighbours.items()
+        for rank, (other_id, count, score) in enumerate(ranked, start=1)
+    ]
+    with transaction.atomic():
+        RelatedProduct.objects.all().delete()
+        RelatedProduct.objects.bulk_create(rows, batch_size=1000)
+    return {"baskets": baskets, "products": len(neighbours), "rows": len(rows)}
+
+
+def related_products(product_id, request=None):
+    """A product's stored neighbours as product cards, in one query"""
+    rows = (
+        RelatedProduct.objects.filter(product_id=product_id)
+        .order_by('rank')
+        .values(
+            'score', 'related_id', 'related__name', 'related__base_price', 'related__team',
+            'related__image', 'related__image_hash', 'related__image_source',
+        )
+    )
+    return [
+        {
+            'id': row['related_id'],
+            'name': row['related__name'],
+            'base_price': f"{row['related__base_price']:.2f}",
+            'team': row['related__team'],
+            'image': row['related__image'],
+            'image_thumb': image_rendition_url(
+                row['related__image'], row['related__image_hash'], row['related__image_source'], 'thumb', request,
+            ),
+            'score': round(row['score'], 4),
+        }
+        for row in rows
+    ]
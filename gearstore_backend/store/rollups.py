@@ -0,0 +1,94 @@
+"""
+Incremental maintenance of the daily sales rollup tables
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Product, DailyProductSales, DailyTeamSales
+
+# Order statuses that count as a sale
+PAID_STATUSES = ('paid', 'processing', 'shipped', 'delivered')
+
+
+def _increment(model, key, quantity, revenue):
+    """Add to one rollup row, creating it on first sale of the day"""
+    updated = model.objects.filter(**key).update(
+        quantity=F('quantity') + quantity,
+        revenue=F('revenue') + revenue,
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, quantity=quantity, revenue=revenue)
+    except IntegrityError:
+        # Another transaction created the row first
+        model.objects.filter(**key).update(
+            quantity=F('quantity') + quantity,
+            revenue=F('revenue') + revenue,
+        )
+
+
+def lock_rollups():
+    """
+    Hold off live increments until the current transaction ends
+
+    Reports can still read the committed totals meanwhile. On PostgreSQL the
+    tables are locked explicitly; SQLite allows one writer at a time, and on
+    MySQL the DELETE that starts a rebuild locks every row and gap.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'LOCK TABLE {DailyProductSales._meta.db_table}, {DailyTeamSales._meta.db_table} IN EXCLUSIVE MODE'
+            )
+
+
+def apply_sales(lines):
+    """
+    Add sold lines to the rollups
+
+    Args:
+        lines: iterable of (date, product_name, variant_size, quantity, revenue)
+    """
+    by_product = defaultdict(lambda: [0, Decimal('0.00')])
+    for date, product_name, variant_size, quantity, revenue in lines:
+        totals = by_product[(date, product_name, variant_size)]
+        totals[0] += quantity
+        totals[1] += revenue
+
+    names = {product_name for _, product_name, _ in by_product}
+    teams = dict(Product.objects.filter(name__in=names).values_list('name', 'team'))
+
+    by_team = defaultdict(lambda: [0, Decimal('0.00')])
+    for (date, product_name, variant_size), (quantity, revenue) in by_product.items():
+        _increment(
+            DailyProductSales,
+            {'date': date, 'product_name': product_name, 'variant_size': variant_size},
+            quantity,
+            revenue,
+        )
+        totals = by_team[(date, teams.get(product_name, '') or '')]
+        totals[0] += quantity
+        totals[1] += revenue
+
+    for (date, team), (quantity, revenue) in by_team.items():
+        _increment(DailyTeamSales, {'date': date, 'team': team}, quantity, revenue)
+
+
+def record_order_sales(order):
+    """
+    Add a newly paid order to the rollups
+
+    Call inside the transaction that marks the order paid so the rollups
+    never disagree with order history.
+    """
+    date = timezone.localdate(order.created_at)
+    apply_sales(
+        (date, item.product_name, item.variant_size, item.quantity, item.price * item.quantity)
+        for item in order.items.all()
+    )
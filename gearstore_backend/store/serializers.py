@@ -1,5 +1,17 @@
+from decimal import Decimal
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
-from .models import Category, Product, ProductVariant
+from .models import Category, Product, ProductVariant, Order, OrderItem, VariantStockShard
+from .images import rendition_url
+
+
+def _csv_param(query_params, name):
+    """?name=a,b -> {'a', 'b'}; None when the parameter is absent"""
+    value = query_params.get(name)
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(',') if item.strip()}
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -24,7 +36,12 @@ class ProductVariantSerializer(serializers.ModelSerializer):
         return value
 
     def validate(self, data):
-        """Ensure size is unique per product"""
+        """Ensure size is unique per product and sharded stock is not overwritten"""
+        if 'stock' in data and self.instance is not None and self.instance.sharded:
+            # The column is ignored while sharded and overwritten by rebalance
+            raise serializers.ValidationError({
+                'stock': 'Stock for this size is sharded; disable sharding before replacing it'
+            })
         product = self.context.get('product') or getattr(self.instance, 'product', None)
         size = data.get('size', getattr(self.instance, 'size', None))
 
@@ -39,23 +56,184 @@ class ProductVariantSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError({
                     'size': f'Size "{size}" already exists for this product'
                 })
+        return data
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.sharded:
+            # ProductVariant.stock is stale while stock lives in shards
+            data['stock'] = instance.available_stock
+        return data
+
+
+class VariantGridRowSerializer(serializers.Serializer):
+    """One size of a full size grid; checked in memory, see store/bulk.py"""
+
+    size = serializers.CharField(max_length=50)
+    stock = serializers.IntegerField(min_value=0)
+    price_override = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal('0.01'), allow_null=True, default=None,
+    )
+
+
+class ProductBatchItemSerializer(serializers.Serializer):
+    """One product of a batch write; with `id` it replaces that product's fields"""
+
+    id = serializers.IntegerField(required=False)
+    name = serializers.CharField(max_length=100)
+    category = serializers.SlugField()
+    base_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    image = serializers.URLField()
+    team = serializers.CharField(max_length=50, allow_blank=True, default='')
+    description = serializers.CharField(allow_blank=True, default='')
+    # Upserted by size; sizes not listed are kept
+    variants = VariantGridRowSerializer(many=True, default=list)
+
 
 class ProductSerializer(serializers.ModelSerializer):
-    """Serialize soccer jerseys with sizes S-XL, cleats 7-13 for fan shopping"""
+    """
+    Serialize soccer jerseys with sizes S-XL, cleats 7-13 for fan shopping
+
+    GET requests may trim the output:
+    - ?fields=id,name,base_price,image_thumb,stock keeps only those fields
+    - ?expand=variants,category embeds only the listed relations; an
+      unexpanded category is its id and unexpanded variants are left out
+
+    ProductViewSet passes the same parameters to prepare_queryset so only
+    the columns and relations being rendered are loaded.
+    """
 
     category = CategorySerializer(read_only=True)
     variants = ProductVariantSerializer(many=True, read_only=True)
     stock = serializers.SerializerMethodField()
+    image_thumb = serializers.SerializerMethodField()
+    image_medium = serializers.SerializerMethodField()
+
+    EXPANDABLE = ('category', 'variants')
+
+    # Product columns each output field reads
+    FIELD_COLUMNS = {
+        'id': ('id',),
+        'name': ('name',),
+        'base_price': ('base_price',),
+        'image': ('image',),
+        'image_thumb': ('image', 'image_hash', 'image_source'),
+        'image_medium': ('image', 'image_hash', 'image_source'),
+        'team': ('team',),
+        'description': ('description',),
+        'category': ('category',),
+        'variants': (),
+        'stock': (),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+
+        fields, expanded = self.field_selection(request.query_params)
+        for name in list(self.fields):
+            if name not in fields:
+                self.fields.pop(name)
+        if 'category' in self.fields and 'category' not in expanded:
+            self.fields['category'] = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    @classmethod
+    def field_selection(cls, query_params):
+        """
+        Fields to render and relations to embed for ?fields= and ?expand=
+
+        Returns:
+            (fields, expanded) sets; everything when neither is given
+        """
+        requested = _csv_param(query_params, 'fields')
+        expand = _csv_param(query_params, 'expand')
+        fields = set(cls.Meta.fields) if requested is None else requested & set(cls.Meta.fields)
+        expanded = set(cls.EXPANDABLE) if expand is None else expand & set(cls.EXPANDABLE)
+        if 'variants' not in expanded:
+            fields.discard('variants')
+        return fields, expanded
+
+    @classmethod
+    def prepare_queryset(cls, queryset, query_params):
+        """Load only what the requested representation needs"""
+        fields, expanded = cls.field_selection(query_params)
+
+        if 'category' in fields and 'category' in expanded:
+            queryset = queryset.select_related('category')
+        if 'variants' in fields:
+            queryset = queryset.prefetch_related('variants__stock_shards')
+        elif 'stock' in fields:
+            queryset = queryset.annotate(total_stock=cls.total_stock_expression())
+
+        if _csv_param(query_params, 'fields') is not None:
+            columns = {'id'}
+            for name in fields:
+                columns.update(cls.FIELD_COLUMNS[name])
+            if 'category' in fields and 'category' in expanded:
+                columns.update({'category__id', 'category__name', 'category__slug'})
+            queryset = queryset.only(*columns)
+        return queryset
+
+    @staticmethod
+    def total_stock_expression():
+        """Stock across a product's variants and their shards, without loading variants"""
+        plain = (
+            ProductVariant.objects.filter(product=OuterRef('pk'), sharded=False)
+            .values('product').annotate(total=Sum('stock')).values('total')
+        )
+        sharded = (
+            VariantStockShard.objects.filter(variant__product=OuterRef('pk'), variant__sharded=True)
+            .values('variant__product').annotate(total=Sum('stock')).values('total')
+        )
+        return Coalesce(Subquery(plain), Value(0)) + Coalesce(Subquery(sharded), Value(0))
 
     def get_stock(self, obj):
         """Calculate total stock across all variants"""
-        return sum(variant.stock for variant in obj.variants.all())
+        if hasattr(obj, 'total_stock'):
+            return obj.total_stock
+        return sum(variant.available_stock for variant in obj.variants.all())
+
+    def get_image_thumb(self, obj):
+        """Small local rendition for grid cards"""
+        return rendition_url(obj, 'thumb', self.context.get('request'))
+
+    def get_image_medium(self, obj):
+        """Larger local rendition for the product page"""
+        return rendition_url(obj, 'medium', self.context.get('request'))
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'base_price', 'image', 'team', 'description', 'category', 'variants', 'stock']
+        fields = [
+            'id', 'name', 'base_price', 'image', 'image_thumb', 'image_medium',
+            'team', 'description', 'category', 'variants', 'stock',
+        ]
 
 
 class CartItemSerializer(serializers.Serializer):
     variant_id = serializers.PrimaryKeyRelatedField(queryset=ProductVariant.objects.all(), source='variant')
     quantity = serializers.IntegerField(min_value=1)
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    """Serialize a purchased line, e.g. 2x Barcelona Jersey (XL)"""
+
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'product_name', 'variant_size', 'quantity', 'price', 'subtotal']
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    """Serialize a fan's order with its items for order history"""
+
+    items = OrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'order_id', 'email', 'total_amount', 'status', 'payment_reference',
+            'payment_verified', 'created_at', 'updated_at', 'items',
+        ]
@@ -0,0 +1,16 @@
+"""
+Signals for catalog writes that bypass Model.save()
+
+bulk_create, bulk_update and QuerySet.update() send no post_save, so code
+that writes products or variants in bulk sends catalog_bulk_changed once
+afterwards, inside the write's transaction. The change feed records the
+write in that transaction; everything that keeps a cache in step with
+model signals (cart stamps, quote prices, the snapshot, the catalog
+version) listens to it as well and defers its work with
+transaction.on_commit, so no reader can refill a cache from rows that are
+not committed yet.
+"""
+from django.dispatch import Signal
+
+# sender: the model written; kwargs: product_ids, variant_ids
+catalog_bulk_changed = Signal()
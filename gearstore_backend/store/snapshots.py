@@ -0,0 +1,244 @@
+"""
+Pre-built catalog snapshot for the frontend
+
+The whole catalog (categories, products and their variants, serialized
+exactly as the products API does) is written to CATALOG_SNAPSHOT_ROOT as
+<version>.json plus gzip and, when the brotli package is installed, brotli
+copies. The version is a hash of the content, so an unchanged catalog
+produces the same files and the same ETag. current.json names the latest
+version.
+
+Saving a product, variant or category rebuilds the snapshot shortly after
+the transaction commits; several saves in a row share one rebuild. Stock
+sold through checkout does not trigger a rebuild, so snapshot stock is as of
+the last build and product pages should keep reading live stock.
+
+Each web worker runs its own debounce timer, so the workers coordinate
+through the cache: only the timer holding the latest change builds, and a
+lock keeps two builds from racing to write current.json.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Category, Product, ProductVariant
+from .serializers import CategorySerializer, ProductSerializer
+from .signals import catalog_bulk_changed
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always written
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'current.json'
+VERSION_RE = re.compile(r'^[0-9a-f]{16}$')
+
+# Accept-Encoding token -> file suffix
+ENCODINGS = {'br': '.json.br', 'gzip': '.json.gz'}
+
+# Cache keys shared by every worker's debouncer
+PENDING_KEY = 'catalog_snapshot:pending'
+BUILD_LOCK_KEY = 'catalog_snapshot:building'
+# Longest a build may hold the lock before another worker can take over
+BUILD_LOCK_TIMEOUT = 300
+
+
+def snapshot_root():
+    return Path(settings.CATALOG_SNAPSHOT_ROOT)
+
+
+def serialize_catalog():
+    """Catalog as a dict, serialized exactly like the products API"""
+    products = (
+        Product.objects.select_related('category')
+        .prefetch_related('variants__stock_shards')
+        .order_by('id')
+    )
+    data = {
+        "categories": CategorySerializer(Category.objects.order_by('id'), many=True).data,
+        "products": ProductSerializer(products, many=True).data,
+    }
+    # Renditions are served by the API host, not the frontend
+    for product in data["products"]:
+        for field in ('image_thumb', 'image_medium'):
+            if product[field].startswith(settings.MEDIA_URL):
+                product[field] = urljoin(settings.PUBLIC_API_URL, product[field])
+    return data
+
+
+def _write(path, content):
+    """Write via a temporary file so readers never see a partial file"""
+    # Unique per build, so concurrent builds never write into each other's file
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", delete=False) as tmp:
+        tmp.write(content)
+    try:
+        os.replace(tmp.name, path)
+    except OSError:
+        os.unlink(tmp.name)
+        raise
+
+
+def build_snapshot(keep=5):
+    """
+    Write a snapshot of the current catalog
+
+    Args:
+        keep: Number of past versions to keep on disk
+
+    Returns:
+        dict: The manifest, with "built" False if the catalog was unchanged
+    """
+    data = serialize_catalog()
+    # Compact and key-sorted so an unchanged catalog hashes the same
+    body = json.dumps(data, separators=(',', ':'), sort_keys=True, default=str).encode()
+    digest = hashlib.sha256(body).hexdigest()
+    version = digest[:16]
+    root = snapshot_root()
+    root.mkdir(parents=True, exist_ok=True)
+
+    current = read_manifest()
+    if current and current['version'] == version and (root / f"{version}.json").exists():
+        return {**current, "built": False}
+
+    files = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        files['br'] = brotli.compress(body, quality=11)
+    for encoding, content in files.items():
+        _write(root / f"{version}{ENCODINGS.get(encoding, '.json')}", content)
+
+    manifest = {
+        "version": version,
+        "sha256": digest,
+        "built_at": timezone.now().isoformat(),
+        "products": len(data["products"]),
+        "sizes": {encoding: len(content) for encoding, content in files.items()},
+    }
+    _write(root / MANIFEST, json.dumps(manifest, indent=2).encode())
+    _prune(root, keep)
+    logger.info(f"Built catalog snapshot {version} ({len(body)} bytes)")
+    return {**manifest, "built": True}
+
+
+def _prune(root, keep):
+    """Delete all but the `keep` newest versions"""
+    snapshots = sorted(
+        (path for path in root.glob('*.json') if VERSION_RE.match(path.stem)),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True,
+    )
+    for path in snapshots[keep:]:
+        for suffix in ('.json', *ENCODINGS.values()):
+            (root / f"{path.stem}{suffix}").unlink(missing_ok=True)
+
+
+def read_manifest():
+    try:
+        return json.loads((snapshot_root() / MANIFEST).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def snapshot_file(version, accept_encoding=''):
+    """
+    Best stored encoding of a snapshot version for the client
+
+    Returns:
+        (path, encoding) with encoding None for plain JSON, or (None, None)
+    """
+    if not VERSION_RE.match(version or ''):
+        return None, None
+    root = snapshot_root()
+    accepted = {token.split(';')[0].strip() for token in accept_encoding.split(',')}
+    for encoding, suffix in ENCODINGS.items():
+        path = root / f"{version}{suffix}"
+        if encoding in accepted and path.exists():
+            return path, encoding
+    path = root / f"{version}.json"
+    return (path, None) if path.exists() else (None, None)
+
+
+class _Debouncer:
+    """
+    Run one rebuild after changes stop arriving for `delay` seconds
+
+    Every change stores a fresh token under PENDING_KEY. When a timer fires
+    in any worker, it builds only if its token is still the latest, since a
+    later change in another worker will build the newer catalog anyway.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def schedule(self, delay):
+        if delay <= 0:
+            _rebuild()
+            return
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            token = uuid.uuid4().hex
+            cache.set(PENDING_KEY, token, timeout=delay + BUILD_LOCK_TIMEOUT)
+            self._timer = threading.Timer(delay, self._run, args=(token, delay))
+            self._timer.start()
+
+    def _run(self, token, delay):
+        with self._lock:
+            self._timer = None
+        if cache.get(PENDING_KEY) != token:
+            return
+        if not cache.add(BUILD_LOCK_KEY, token, timeout=BUILD_LOCK_TIMEOUT):
+            # Another worker is still building from an older catalog; try again
+            # once it is likely done
+            self.schedule(delay)
+            return
+        try:
+            _rebuild()
+        finally:
+            cache.delete(BUILD_LOCK_KEY)
+            connections.close_all()
+
+
+def _rebuild():
+    try:
+        build_snapshot()
+    except Exception:
+        logger.exception("Catalog snapshot rebuild failed")
+
+
+_debouncer = _Debouncer()
+
+
+def schedule_rebuild():
+    """Rebuild the snapshot once the current transaction commits"""
+    if not settings.CATALOG_SNAPSHOT_AUTO_BUILD:
+        return
+    transaction.on_commit(lambda: _debouncer.schedule(settings.CATALOG_SNAPSHOT_DELAY))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(catalog_bulk_changed)
+def _catalog_changed(sender, **kwargs):
+    schedule_rebuild()
@@ -0,0 +1,15 @@
+"""
+Summary statistics shared by the benchmarks and the load generator
+
+Imports nothing from Django, so load_checkout.py can use it without a
+configured project.
+"""
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
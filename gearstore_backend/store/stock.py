@@ -0,0 +1,147 @@
+"""
+Stock decrements, with an opt-in sharded mode for flash-sale variants
+
+A sharded variant keeps its stock in K VariantStockShard rows instead of
+ProductVariant.stock. Buyers decrement a random shard, so concurrent
+checkouts for the same size contend on K row locks instead of one.
+ProductVariant.stock is only refreshed to the shard total when shards are
+rebalanced, and must not be trusted while a variant is sharded.
+
+Queryset updates skip model signals, so changes made here invalidate cart
+summaries (store/carts.py) and record stock sales in the change feed
+(store/changes.py) explicitly. Each decrement and its feed entry share one
+transaction, so a sale is never committed without its entry.
+"""
+import random
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .carts import touch_variants, touch_variants_on_commit
+from .changes import record_changes
+from .models import CatalogChange, ProductVariant, VariantStockShard
+
+DEFAULT_SHARDS = 8
+
+
+def _stock_sold(variant_id):
+    """Call inside the transaction that took the stock"""
+    touch_variants_on_commit([variant_id])
+    record_changes(CatalogChange.VARIANT, [variant_id])
+
+
+def _split(total, shards):
+    """Spread `total` as evenly as possible over `shards` counters"""
+    base, extra = divmod(total, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def enable_sharding(variant, shards=DEFAULT_SHARDS):
+    """Move a variant's stock into `shards` counter rows"""
+    with transaction.atomic():
+        variant = ProductVariant.objects.select_for_update().get(pk=variant.pk)
+        if variant.sharded:
+            return variant
+        VariantStockShard.objects.bulk_create([
+            VariantStockShard(variant=variant, shard=i, stock=stock)
+            for i, stock in enumerate(_split(variant.stock, shards))
+        ])
+        variant.sharded = True
+        variant.save(update_fields=['sharded'])
+    return variant
+
+
+def disable_sharding(variant):
+    """Fold a variant's shards back into ProductVariant.stock"""
+    with transaction.atomic():
+        variant = ProductVariant.objects.select_for_update().get(pk=variant.pk)
+        if not variant.sharded:
+            return variant
+        shards = VariantStockShard.objects.select_for_update().filter(variant=variant)
+        variant.stock = shards.aggregate(total=Sum('stock'))['total'] or 0
+        variant.sharded = False
+        variant.save(update_fields=['stock', 'sharded'])
+        shards.delete()
+    return variant
+
+
+def decrement_stock(variant, quantity):
+    """
+    Take `quantity` units if available
+
+    Plain variants use one conditional UPDATE on their row. Sharded variants
+    try shards in random order with the same conditional UPDATE, and only
+    lock every shard when no single shard can cover the quantity.
+
+    Returns:
+        bool: True if the stock was taken
+    """
+    if not variant.sharded:
+        with transaction.atomic():
+            taken = bool(
+                ProductVariant.objects.filter(pk=variant.pk, stock__gte=quantity)
+                .update(stock=F('stock') - quantity)
+            )
+            if taken:
+                _stock_sold(variant.pk)
+        return taken
+
+    shard_ids = list(
+        VariantStockShard.objects.filter(variant_id=variant.pk, stock__gte=quantity)
+        .values_list('id', flat=True)
+    )
+    random.shuffle(shard_ids)
+    for shard_id in shard_ids:
+        with transaction.atomic():
+            taken = VariantStockShard.objects.filter(pk=shard_id, stock__gte=quantity).update(
+                stock=F('stock') - quantity
+            )
+            if taken:
+                _stock_sold(variant.pk)
+                return True
+
+    return _decrement_across_shards(variant, quantity)
+
+
+def _decrement_across_shards(variant, quantity):
+    """Slow path: take stock from several shards under lock"""
+    with transaction.atomic():
+        shards = list(
+            VariantStockShard.objects.select_for_update()
+            .filter(variant_id=variant.pk, stock__gt=0)
+            .order_by('shard')
+        )
+        if sum(shard.stock for shard in shards) < quantity:
+            return False
+        remaining = quantity
+        for shard in shards:
+            take = min(shard.stock, remaining)
+            shard.stock -= take
+            remaining -= take
+            if not remaining:
+                break
+        VariantStockShard.objects.bulk_update(shards, ['stock'])
+        _stock_sold(variant.pk)
+    return True
+
+
+def rebalance(variant):
+    """
+    Even out a sharded variant's counters and refresh ProductVariant.stock
+
+    Returns:
+        int: Total stock across shards
+    """
+    with transaction.atomic():
+        shards = list(
+            VariantStockShard.objects.select_for_update()
+            .filter(variant_id=variant.pk)
+            .order_by('shard')
+        )
+        total = sum(shard.stock for shard in shards)
+        for shard, stock in zip(shards, _split(total, len(shards))):
+            shard.stock = stock
+        VariantStockShard.objects.bulk_update(shards, ['stock'])
+        ProductVariant.objects.filter(pk=variant.pk).update(stock=total)
+    touch_variants([variant.pk])
+    return total
@@ -0,0 +1,128 @@
+"""
+Search-as-you-type suggestions from an in-process prefix index
+
+Every product name, team and category name is indexed under each of its
+word suffixes ("arsenal home kit", "home kit", "kit") in one sorted list,
+so a prefix lookup is two bisects and a scan of the matching slice; no
+database query and no icontains scan per keystroke. The index lives in
+process memory, is built when the server starts (see wsgi.py / asgi.py)
+and is rebuilt on the first lookup after the catalog version changes, or
+once it is SUGGEST_INDEX_MAX_AGE seconds old in case this process cannot
+see the change (see store/versions.py).
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .models import Category, Product
+from .versions import catalog_version
+
+logger = logging.getLogger(__name__)
+
+# Ties between equally good matches go to teams, then categories, then products
+KIND_ORDER = {'team': 0, 'category': 1, 'product': 2}
+MAX_LIMIT = 20
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+class SuggestIndex:
+    """Sorted (term, entry) pairs over the catalog's searchable names"""
+
+    def __init__(self, entries):
+        # entries: dicts with "type", "label" and type-specific keys (id, slug)
+        self.entries = entries
+        pairs = []
+        for position, entry in enumerate(entries):
+            words = normalize(entry['label']).split(' ')
+            for start in range(len(words)):
+                pairs.append((' '.join(words[start:]), position, start))
+        pairs.sort()
+        self.terms = [pair[0] for pair in pairs]
+        self.pairs = pairs
+
+    @classmethod
+    def build(cls):
+        """Index the current catalog (two queries)"""
+        entries = []
+        teams = set()
+        for product in Product.objects.order_by('id').values('id', 'name', 'team'):
+            entries.append({'type': 'product', 'id': product['id'], 'label': product['name']})
+            if product['team']:
+                teams.add(product['team'])
+        entries.extend({'type': 'team', 'label': team} for team in sorted(teams))
+        entries.extend(
+            {'type': 'category', 'slug': category['slug'], 'label': category['name']}
+            for category in Category.objects.order_by('name').values('name', 'slug')
+        )
+        return cls(entries)
+
+    def search(self, query, limit=8):
+        """
+        Top matches for a prefix of any word in a name
+
+        Matches at the start of a name rank before matches on a later word,
+        then teams before categories before products, then shorter labels.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        low = bisect_left(self.terms, query)
+        high = bisect_left(self.terms, query + '\U0010ffff', low)
+
+        best = {}
+        for _, position, start in self.pairs[low:high]:
+            if best.get(position, 1) > 0:
+                best[position] = min(start, 1)
+
+        def rank(position):
+            entry = self.entries[position]
+            return (best[position], KIND_ORDER[entry['type']], len(entry['label']), entry['label'])
+
+        return [self.entries[position] for position in heapq.nsmallest(limit, best, key=rank)]
+
+
+_index = None
+_index_version = None
+_index_built_at = None
+_lock = threading.Lock()
+
+
+def _is_current(version, now):
+    return (
+        _index is not None
+        and _index_version == version
+        and now - _index_built_at < settings.SUGGEST_INDEX_MAX_AGE
+    )
+
+
+def get_index():
+    """This process's index, rebuilt if the catalog version moved on or it is too old"""
+    global _index, _index_version, _index_built_at
+    version = catalog_version()
+    now = time.monotonic()
+    if _is_current(version, now):
+        return _index
+    with _lock:
+        if not _is_current(version, now):
+            _index, _index_version, _index_built_at = SuggestIndex.build(), version, now
+        return _index
+
+
+def suggest(query, limit=8):
+    return get_index().search(query, max(1, min(limit, MAX_LIMIT)))
+
+
+def warm_index():
+    """Build the index at server start; skipped if the database is not ready"""
+    try:
+        get_index()
+    except DatabaseError:
+        logger.warning("Suggest index not built at startup; building on first lookup", exc_info=True)
@@ -1,3 +1,1694 @@
-from django.test import TestCase
+import asyncio
+import gc
+import gzip
+import hashlib
+import hmac
+import json
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+
+from gearstore_backend.metrics import Registry
+from gearstore_backend.renderers import ORJSONRenderer
+from gearstore_backend.throttling import GCRAEmailThrottle, GCRAIPThrottle
+from gearstore_backend.middleware import QueryInstrumentationMiddleware, fingerprint
+from . import benchmarks, images, live_stock, outbox, query_plans, quotes, snapshots, stock, suggest, versions
+from .admission import WaitingRoom, WaitingRoomFull
+from .models import (
+    CatalogChange, Cart, CartItem, Category, DailyProductSales, DailyTeamSales, Order, OrderItem, OutboxEmail, Product,
+    ProductVariant,
+)
+from .carts import set_quantity
+from .orders import mark_order_paid
+from .product_rows import render_products
+from .serializers import ProductSerializer
+from .views import ProductViewSet
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0)
+class StoreBenchmarkTests(TestCase):
+    """Smoke-run the synthetic-catalog benchmarks on a small catalog"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.catalog = benchmarks.generate_catalog(products=12, variants=3, categories=2)
+
+    def test_every_scenario_succeeds(self):
+        results = benchmarks.run_benchmarks(iterations=2, warmup=0)
+
+        self.assertEqual(
+            set(results),
+            {name for name, *_ in benchmarks.build_scenarios()},
+        )
+        for name, row in results.items():
+            self.assertIn(row['status'], (200, 201), name)
+            self.assertLessEqual(row['p50'], row['p99'])
+
+    def test_compare_to_baseline_flags_regressions(self):
+        baseline = {'results': {
+            'product_list': {'p95': 10.0, 'queries': 3},
+            'product_detail': {'p95': 2.0, 'queries': 2},
+        }}
+        results = {
+            'product_list': {'p95': 20.0, 'queries': 3},
+            'product_detail': {'p95': 2.5, 'queries': 4},
+        }
+
+        regressions = benchmarks.compare_to_baseline(results, baseline, threshold=0.25)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('product_list: p95'))
+        self.assertTrue(regressions[1].startswith('product_detail: 4 queries'))
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=1.0, QUERY_INSTRUMENTATION_REPEAT_THRESHOLD=5)
+class QueryInstrumentationMiddlewareTests(TestCase):
+    """Server-Timing header and N+1 reporting"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmarks.generate_catalog(products=10, variants=2, categories=1)
+
+    def test_server_timing_header(self):
+        with self.assertLogs('gearstore_backend.middleware', 'INFO'):
+            response = self.client.get(f'{benchmarks.API_URL}/categories/')
+
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=')
+
+    def test_repeated_queries_logged_as_warning(self):
+        def n_plus_one_view(request):
+            for product in Product.objects.all():
+                product.category.name
+            return HttpResponse()
+
+        middleware = QueryInstrumentationMiddleware(n_plus_one_view)
+        with self.assertLogs('gearstore_backend.middleware', 'WARNING') as logs:
+            middleware(RequestFactory().get('/'))
+
+        self.assertIn('"queries": 11', logs.output[0])
+        self.assertIn('"repeated_queries": [{"count": 10', logs.output[0])
+
+    @override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_unsampled_requests_untouched(self):
+        response = self.client.get(f'{benchmarks.API_URL}/categories/')
+
+        self.assertNotIn('Server-Timing', response)
+
+    def test_fingerprint_ignores_literals(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 21'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s) LIMIT 5'),
+        )
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0)
+class MetricsTests(TestCase):
+    """Metrics registry and /metrics exposition"""
+
+    def test_histogram_merges_thread_shards(self):
+        registry = Registry()
+        histogram = registry.histogram('test_seconds', 'Test', ('op',), buckets=(0.1, 1.0))
+
+        def record():
+            for _ in range(1000):
+                histogram.observe(0.05, op='a')
+                histogram.observe(5, op='a')
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        text = registry.render()
+        self.assertIn('test_seconds_bucket{op="a",le="0.1"} 4000', text)
+        self.assertIn('test_seconds_bucket{op="a",le="1"} 4000', text)
+        self.assertIn('test_seconds_bucket{op="a",le="+Inf"} 8000', text)
+        self.assertIn('test_seconds_count{op="a"} 8000', text)
+
+    def test_exited_thread_shards_are_folded(self):
+        registry = Registry()
+        counter = registry.counter('test_total', 'Test', ('op',))
+        for _ in range(20):
+            thread = threading.Thread(target=counter.inc, kwargs={'op': 'a'})
+            thread.start()
+            thread.join()
+        gc.collect()
+
+        self.assertEqual(counter._shards, [])
+        self.assertIn('test_total{op="a"} 20', registry.render())
+
+    def test_metrics_endpoint_reports_checkout_rejections(self):
+        benchmarks.generate_catalog(products=1, variants=1, categories=1)
+        variant = ProductVariant.objects.get()
+        cart = [{"variant_id": variant.id, "quantity": variant.stock + 1}]
+        self.client.post(f'{benchmarks.API_URL}/guest-checkout/', {"cart_items": cart}, content_type='application/json')
+
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertRegex(text, r'checkout_stock_rejections_total\{endpoint="guest_checkout"\} [1-9]')
+        self.assertIn('http_request_duration_seconds_count{view="store:guest_checkout",method="POST",status="400"}', text)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+
+class QueryPlanTests(TestCase):
+    """Hot filters and order lookups must be served by an index"""
+
+    def test_no_unexpected_full_table_scans(self):
+        for name, sql, plan, scans in query_plans.explain_hot_queries():
+            with self.subTest(name):
+                if name in query_plans.EXPECTED_SCANS:
+                    continue
+                self.assertEqual(scans, [], f"{name} scans {scans}:\n{plan}")
+
+    def test_full_table_scan_detection(self):
+        self.assertEqual(query_plans.full_table_scans('3 0 0 SCAN store_product', 'sqlite'), ['store_product'])
+        self.assertEqual(
+            query_plans.full_table_scans('4 0 0 SCAN store_product USING INDEX product_price_idx', 'sqlite'),
+            [],
+        )
+        self.assertEqual(
+            query_plans.full_table_scans('Seq Scan on store_order  (cost=0.00..1.01 rows=1)', 'postgresql'),
+            ['store_order'],
+        )
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0)
+class OrderHistoryTests(APITestCase):
+    """Paginated order history for signed-in fans"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('fan', 'fan@example.com', 'pass12345')
+        cls.other = User.objects.create_user('rival', 'rival@example.com', 'pass12345')
+        orders = Order.objects.bulk_create([
+            Order(user=cls.user, order_id=f'AGS-{i:04d}', email='fan@example.com', total_amount=Decimal('100.00'))
+            for i in range(45)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_name='Barcelona Jersey', variant_size=size, quantity=1, price=Decimal('50.00'))
+            for order in orders
+            for size in ('M', 'L')
+        ])
+        Order.objects.create(user=cls.other, order_id='AGS-RIVAL', email='rival@example.com', total_amount=Decimal('10.00'))
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_first_page_is_two_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f'{benchmarks.API_URL}/orders/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(len(response.data['results'][0]['items']), 2)
+        self.assertEqual(response.data['results'][0]['items'][0]['subtotal'], '50.00')
+
+    def test_cursor_walks_every_order_once(self):
+        seen = []
+        url = f'{benchmarks.API_URL}/orders/'
+        while url:
+            response = self.client.get(url)
+            seen += [order['order_id'] for order in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(len(seen), 45)
+        self.assertEqual(len(set(seen)), 45)
+        self.assertNotIn('AGS-RIVAL', seen)
+
+    def test_detail_by_order_id(self):
+        response = self.client.get(f'{benchmarks.API_URL}/orders/AGS-0007/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['order_id'], 'AGS-0007')
+
+        response = self.client.get(f'{benchmarks.API_URL}/orders/AGS-RIVAL/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.get(f'{benchmarks.API_URL}/orders/')
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0)
+class SalesRollupTests(APITestCase):
+    """Rollups maintained when orders are paid, rebuilt by the backfill"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Soccer', slug='soccer')
+        Product.objects.create(category=category, name='Barcelona Jersey', base_price=Decimal('50.00'),
+                               image='https://example.com/a.jpg', team='Barcelona', description='Home')
+        cls.orders = []
+        for i in range(3):
+            order = Order.objects.create(order_id=f'AGS-{i}', email='fan@example.com',
+                                         total_amount=Decimal('150.00'), payment_reference=f'REF-{i}')
+            OrderItem.objects.create(order=order, product_name='Barcelona Jersey', variant_size='M',
+                                     quantity=2, price=Decimal('50.00'))
+            OrderItem.objects.create(order=order, product_name='Mystery Scarf', variant_size='One Size',
+                                     quantity=1, price=Decimal('50.00'))
+            cls.orders.append(order)
+
+    def rollup_snapshot(self):
+        return (
+            sorted(DailyProductSales.objects.values_list('product_name', 'variant_size', 'quantity', 'revenue')),
+            sorted(DailyTeamSales.objects.values_list('team', 'quantity', 'revenue')),
+        )
+
+    def test_mark_paid_increments_rollups_once(self):
+        self.assertTrue(mark_order_paid(self.orders[0]))
+        self.assertTrue(mark_order_paid(self.orders[1]))
+        self.assertFalse(mark_order_paid(self.orders[1]))
+
+        products, teams = self.rollup_snapshot()
+        self.assertEqual(products, [
+            ('Barcelona Jersey', 'M', 4, Decimal('200.00')),
+            ('Mystery Scarf', 'One Size', 2, Decimal('100.00')),
+        ])
+        self.assertEqual(teams, [('', 2, Decimal('100.00')), ('Barcelona', 4, Decimal('200.00'))])
+
+    def test_backfill_matches_incremental(self):
+        for order in self.orders:
+            mark_order_paid(order)
+        incremental = self.rollup_snapshot()
+
+        call_command('backfill_sales_rollups', chunk_size=2, stdout=StringIO())
+
+        self.assertEqual(self.rollup_snapshot(), incremental)
+
+    def test_failed_backfill_keeps_old_rollups(self):
+        for order in self.orders:
+            mark_order_paid(order)
+        before = self.rollup_snapshot()
+
+        with mock.patch('store.management.commands.backfill_sales_rollups.apply_sales',
+                        side_effect=[None, RuntimeError('interrupted')]):
+            with self.assertRaises(RuntimeError):
+                call_command('backfill_sales_rollups', chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(self.rollup_snapshot(), before)
+
+    def test_report_reads_rollups(self):
+        for order in self.orders:
+            mark_order_paid(order)
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass12345')
+        self.client.force_authenticate(admin)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'{benchmarks.API_URL}/reports/sales/teams/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['team'], 'Barcelona')
+        self.assertEqual(response.data['results'][0]['quantity'], 6)
+
+    def test_report_requires_admin(self):
+        self.client.force_authenticate(User.objects.create_user('fan', 'fan@example.com', 'pass12345'))
+        response = self.client.get(f'{benchmarks.API_URL}/reports/sales/products/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_report_rejects_invalid_dates(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'pass12345'))
+        for value in ('yesterday', '2026-02-30'):
+            with self.subTest(value):
+                response = self.client.get(f'{benchmarks.API_URL}/reports/sales/teams/', {'start': value})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['error'], 'Invalid start date, expected YYYY-MM-DD')
+
+    def test_signed_webhook_marks_order_paid(self):
+        body = json.dumps({"event": "charge.success", "data": {"reference": "REF-2"}}).encode()
+        signature = hmac.new(settings.PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+
+        response = self.client.post(f'{benchmarks.API_URL}/payment/webhook/', body,
+                                    content_type='application/json', HTTP_X_PAYSTACK_SIGNATURE='forged')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(f'{benchmarks.API_URL}/payment/webhook/', body,
+                                    content_type='application/json', HTTP_X_PAYSTACK_SIGNATURE=signature)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get(order_id='AGS-2').status, 'paid')
+        self.assertEqual(DailyTeamSales.objects.get(team='Barcelona').quantity, 2)
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0)
+class ShardedStockTests(TestCase):
+    """Opt-in sharded stock counters for hot variants"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmarks.generate_catalog(products=1, variants=1, categories=1)
+
+    def setUp(self):
+        self.variant = ProductVariant.objects.get()
+        self.variant.stock = 10
+        self.variant.save()
+
+    def test_enable_splits_stock_evenly(self):
+        variant = stock.enable_sharding(self.variant, shards=4)
+
+        self.assertEqual(sorted(variant.stock_shards.values_list('stock', flat=True)), [2, 2, 3, 3])
+        self.assertEqual(variant.available_stock, 10)
+
+    def test_decrements_never_oversell(self):
+        variant = stock.enable_sharding(self.variant, shards=4)
+
+        results = [stock.decrement_stock(variant, 1) for _ in range(12)]
+
+        self.assertEqual(results.count(True), 10)
+        self.assertEqual(variant.available_stock, 0)
+
+    def test_quantity_larger_than_any_shard(self):
+        variant = stock.enable_sharding(self.variant, shards=4)
+
+        self.assertTrue(stock.decrement_stock(variant, 7))
+        self.assertFalse(stock.decrement_stock(variant, 4))
+        self.assertEqual(variant.available_stock, 3)
+
+    def test_sale_rolls_back_without_its_feed_entry(self):
+        plain = ProductVariant.objects.get(pk=self.variant.pk)
+        sharded = stock.enable_sharding(ProductVariant.objects.create(product=plain.product, size='XL', stock=4),
+                                         shards=2)
+        with mock.patch('store.stock.record_changes', side_effect=RuntimeError):
+            for variant, quantity in ((plain, 1), (sharded, 1), (sharded, 3)):
+                with self.assertRaises(RuntimeError):
+                    stock.decrement_stock(variant, quantity)
+        plain.refresh_from_db()
+        self.assertEqual(plain.available_stock, 10)
+        self.assertEqual(sharded.available_stock, 4)
+
+    def test_rebalance_and_disable(self):
+        variant = stock.enable_sharding(self.variant, shards=4)
+        stock.decrement_stock(variant, 2)
+
+        self.assertEqual(stock.rebalance(variant), 8)
+        self.assertEqual(sorted(variant.stock_shards.values_list('stock', flat=True)), [2, 2, 2, 2])
+
+        variant = stock.disable_sharding(variant)
+        self.assertFalse(variant.sharded)
+        self.assertEqual(variant.stock, 8)
+        self.assertFalse(variant.stock_shards.exists())
+
+    def test_api_reports_shard_total(self):
+        variant = stock.enable_sharding(self.variant, shards=4)
+        stock.decrement_stock(variant, 3)
+
+        response = self.client.get(f'{benchmarks.API_URL}/products/{variant.product_id}/')
+
+        self.assertEqual(response.json()['variants'][0]['stock'], 7)
+        self.assertEqual(response.json()['stock'], 7)
+
+    def test_shard_command(self):
+        out = StringIO()
+        call_command('shard_variant_stock', str(self.variant.pk), '--shards', '3', stdout=out)
+        self.assertIn('sharded over 3 counters: 10 in stock', out.getvalue())
+        call_command('shard_variant_stock', str(self.variant.pk), '--disable', stdout=out)
+        self.variant.refresh_from_db()
+        self.assertEqual((self.variant.sharded, self.variant.stock), (False, 10))
+
+    def test_api_rejects_stock_writes_on_sharded_variant(self):
+        variant = stock.enable_sharding(self.variant, shards=2)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('merch', 'merch@example.com', 'pass12345'))
+        url = f'{benchmarks.API_URL}/products/{variant.product_id}/variants/{variant.pk}/'
+
+        response = client.patch(url, {'stock': 99}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('stock', response.json())
+        response = client.patch(url, {'price_override': '60.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stock'], 10)
+
+    def test_size_filter_counts_shard_stock(self):
+        variant = stock.enable_sharding(self.variant, shards=4)
+        url = f'{benchmarks.API_URL}/products/?size_available={variant.size}&fields=id&expand='
+
+        self.assertEqual(self.client.get(url).json(), [{'id': variant.product_id}])
+        stock.decrement_stock(variant, 10)
+        self.assertEqual(self.client.get(url).json(), [])
+
+
+class WaitingRoomTests(APITestCase):
+    """Admission control for checkout endpoints"""
+
+    def room(self, **config):
+        name = f'test-{time.time_ns()}'
+        rooms = {name: {'MAX_IN_FLIGHT': 1, 'CLUSTER_RATE': 1000, **config}}
+        self.enterContext(override_settings(WAITING_ROOM={**settings.WAITING_ROOM, 'ROOMS': rooms}))
+        return WaitingRoom(name)
+
+    def test_turns_away_beyond_in_flight_limit(self):
+        room = self.room()
+        slots = room.enter()
+
+        with self.assertRaises(WaitingRoomFull) as full:
+            room.enter()
+        self.assertGreaterEqual(full.exception.wait, 1)
+        token = full.exception.detail['queue_token']
+
+        room.leave(slots)
+        time.sleep(0.01)
+        room.leave(room.enter(token))
+
+    def test_fresh_arrivals_queue_behind_waiting_clients(self):
+        room = self.room(CLUSTER_RATE=1)
+        slots = room.enter()
+        with self.assertRaises(WaitingRoomFull):
+            room.enter()
+        room.leave(slots)
+
+        # A slot is free, but someone is already waiting
+        with self.assertRaises(WaitingRoomFull) as full:
+            room.enter()
+        self.assertEqual(full.exception.detail['queue_position'], 2)
+
+    def test_queue_tokens_are_single_use(self):
+        room = self.room(CLUSTER_RATE=1)
+        slots = room.enter()
+        with self.assertRaises(WaitingRoomFull) as full:
+            room.enter()
+        room.leave(slots)
+        token = full.exception.detail['queue_token']
+
+        # Back early: keeps its place, with a new token
+        with self.assertRaises(WaitingRoomFull) as early:
+            room.enter(token)
+        self.assertEqual(early.exception.detail['queue_position'], 1)
+        self.assertNotEqual(early.exception.detail['queue_token'], token)
+
+        # The spent token no longer holds a place
+        with self.assertRaises(WaitingRoomFull) as replay:
+            room.enter(token)
+        self.assertEqual(replay.exception.detail['queue_position'], 2)
+
+    def test_concurrent_rejections_get_distinct_slots(self):
+        room = self.room(CLUSTER_RATE=1)
+        now = time.time()
+        barrier = threading.Barrier(8)
+        slots = []
+
+        def queue():
+            barrier.wait()
+            slots.append(room._queue(now, 1))
+
+        threads = [threading.Thread(target=queue) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(slots), [now + i for i in range(1, 9)])
+
+    def test_cluster_rate(self):
+        room = self.room(MAX_IN_FLIGHT=10, CLUSTER_RATE=2)
+        room.leave(room.enter())
+        room.leave(room.enter())
+        with self.assertRaises(WaitingRoomFull):
+            room.enter()
+
+    def test_checkout_view_returns_retry_after(self):
+        rooms = {'checkout': {'MAX_IN_FLIGHT': 0}}
+        with override_settings(WAITING_ROOM={**settings.WAITING_ROOM, 'ROOMS': rooms}):
+            response = self.client.post(f'{benchmarks.API_URL}/payment/initialize/', {}, format='json')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertIn('queue_token', response.data)
+
+
+class GCRAThrottleTests(TestCase):
+    """Per-IP and per-email GCRA throttles"""
+
+    class View:
+        throttle_scope = 'test_scope'
+
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.0
+        rates = {'test_scope': '3/min', 'test_scope_email': '2/min'}
+        self.enterContext(override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}))
+
+    def request(self, email=None, ip='10.0.0.1'):
+        body = {'email': email} if email else {}
+        django_request = APIRequestFactory().post('/', body, format='json', REMOTE_ADDR=ip)
+        return Request(django_request, parsers=[JSONParser()])
+
+    def check(self, throttle_class, request):
+        throttle = throttle_class()
+        throttle.timer = lambda: self.now
+        return throttle.allow_request(request, self.View()), throttle.wait()
+
+    def test_burst_then_steady_rate(self):
+        results = [self.check(GCRAIPThrottle, self.request())[0] for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+        allowed, wait = self.check(GCRAIPThrottle, self.request())
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 20.0)
+
+        # One emission interval (60s / 3) later, one more request fits
+        self.now += 20
+        self.assertTrue(self.check(GCRAIPThrottle, self.request())[0])
+        self.assertFalse(self.check(GCRAIPThrottle, self.request())[0])
+
+    def test_clients_are_independent(self):
+        for _ in range(3):
+            self.check(GCRAIPThrottle, self.request(ip='10.0.0.1'))
+        self.assertTrue(self.check(GCRAIPThrottle, self.request(ip='10.0.0.2'))[0])
+
+    def test_concurrent_requests_cannot_exceed_burst(self):
+        barrier = threading.Barrier(12)
+        results = []
+
+        def hit():
+            request = self.request()
+            barrier.wait()
+            results.append(self.check(GCRAIPThrottle, request)[0])
+
+        threads = [threading.Thread(target=hit) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 3)
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        for ip in ('1.1.1.1', '2.2.2.2', '3.3.3.3', '4.4.4.4'):
+            request = self.request()
+            request._request.META['HTTP_X_FORWARDED_FOR'] = ip
+            allowed = self.check(GCRAIPThrottle, request)[0]
+        self.assertFalse(allowed)
+
+    def test_email_scope_normalizes_and_skips_missing(self):
+        self.assertTrue(self.check(GCRAEmailThrottle, self.request('Fan@Example.com'))[0])
+        self.assertTrue(self.check(GCRAEmailThrottle, self.request('fan@example.com '))[0])
+        self.assertFalse(self.check(GCRAEmailThrottle, self.request('FAN@example.com'))[0])
+        self.assertTrue(self.check(GCRAEmailThrottle, self.request())[0])
+
+    def test_register_view_returns_429(self):
+        cache.clear()
+        rates = {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'register_email': '1/hour'}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            payload = {'username': 'fan1', 'email': 'fan@example.com', 'password': 'x'}
+            self.client.post('/api/users/register/', payload)
+            response = self.client.post('/api/users/register/', {**payload, 'username': 'fan2'})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0)
+class CartTests(APITestCase):
+    """Server-side carts with cached, batch-revalidated summaries"""
+
+    url = f'{benchmarks.API_URL}/cart/'
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Jerseys', slug='jerseys')
+        self.product = Product.objects.create(
+            category=category, name='Barcelona Jersey', base_price=Decimal('50.00'),
+            image='https://images.example.com/barca.jpeg', team='Barcelona', description='Home',
+        )
+        self.medium = ProductVariant.objects.create(product=self.product, size='M', stock=5)
+        self.large = ProductVariant.objects.create(product=self.product, size='L', stock=1)
+        other = Product.objects.create(
+            category=category, name='Arsenal Jersey', base_price=Decimal('45.00'),
+            image='https://images.example.com/arsenal.jpeg', team='Arsenal', description='Home',
+        )
+        self.unrelated = ProductVariant.objects.create(product=other, size='M', stock=3)
+
+    def add(self, variant, quantity, token=None):
+        headers = {'X-Cart-Token': token} if token else {}
+        return self.client.post(
+            f'{self.url}items/', {'variant_id': variant.id, 'quantity': quantity}, format='json', headers=headers,
+        )
+
+    def test_guest_cart_round_trip(self):
+        response = self.add(self.medium, 2)
+        self.assertEqual(response.status_code, 201)
+        token = response.data['cart_token']
+        self.add(self.medium, 1, token)
+
+        response = self.client.get(self.url, headers={'X-Cart-Token': token})
+        self.assertEqual(response.data['item_count'], 3)
+        self.assertEqual(response.data['subtotal'], '150.00')
+        self.assertTrue(response.data['valid'])
+
+        response = self.client.delete(f'{self.url}items/{self.medium.id}/', headers={'X-Cart-Token': token})
+        self.assertEqual(response.data['items'], [])
+
+    def test_cached_read_skips_revalidation(self):
+        token = self.add(self.medium, 2).data['cart_token']
+        self.add(self.large, 1, token)
+        self.client.get(self.url, headers={'X-Cart-Token': token})
+
+        # Only the cart lookup; lines come from the cache
+        with self.assertNumQueries(1):
+            self.client.get(self.url, headers={'X-Cart-Token': token})
+
+        # A change to a variant outside the cart keeps the cache
+        self.unrelated.stock = 0
+        self.unrelated.save()
+        with self.assertNumQueries(1):
+            self.client.get(self.url, headers={'X-Cart-Token': token})
+
+    def test_variant_changes_revalidate_in_one_query(self):
+        token = self.add(self.medium, 2).data['cart_token']
+        self.add(self.large, 1, token)
+        self.client.get(self.url, headers={'X-Cart-Token': token})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.base_price = Decimal('60.00')
+            self.product.save()
+            stock.decrement_stock(self.large, 1)
+
+        # Cart lookup, line ids, then every line repriced in one query
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, headers={'X-Cart-Token': token})
+
+        medium, large = response.data['items']
+        self.assertEqual(medium['unit_price'], '60.00')
+        self.assertTrue(medium['price_changed'])
+        self.assertEqual(large['available_stock'], 0)
+        self.assertFalse(large['in_stock'])
+        self.assertFalse(response.data['valid'])
+
+    def test_variant_change_invalidates_after_commit(self):
+        token = self.add(self.medium, 2).data['cart_token']
+        self.client.get(self.url, headers={'X-Cart-Token': token})
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.product.base_price = Decimal('60.00')
+            self.product.save()
+            # Not committed yet: the cached summary still stands
+            with self.assertNumQueries(1):
+                self.client.get(self.url, headers={'X-Cart-Token': token})
+        for callback in callbacks:
+            callback()
+        response = self.client.get(self.url, headers={'X-Cart-Token': token})
+        self.assertEqual(response.data['items'][0]['unit_price'], '60.00')
+
+    def test_concurrent_first_add_updates_the_line(self):
+        cart = Cart.objects.create(token='race')
+        CartItem.objects.create(cart=cart, variant=self.medium, quantity=2, added_price=Decimal('50.00'))
+        # The lookup misses the line another request has just created
+        with mock.patch('django.db.models.query.QuerySet.first', side_effect=[None]):
+            set_quantity(cart, self.medium, 1, add=True)
+        self.assertEqual(CartItem.objects.get(cart=cart, variant=self.medium).quantity, 3)
+
+    def test_guest_cart_merges_on_login(self):
+        user = User.objects.create_user('fan', 'fan@example.com', 'pass12345')
+        self.client.force_authenticate(user)
+        self.add(self.medium, 1)
+        self.client.force_authenticate(None)
+
+        token = self.add(self.medium, 2).data['cart_token']
+        self.add(self.large, 1, token)
+        response = self.client.post(
+            '/api/users/login/', {'username': 'fan', 'password': 'pass12345'}, format='json',
+            headers={'X-Cart-Token': token},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.client.force_authenticate(user)
+        response = self.client.get(self.url)
+        quantities = {line['size']: line['quantity'] for line in response.data['items']}
+        self.assertEqual(quantities, {'M': 3, 'L': 1})
+        self.assertIsNone(response.data['cart_token'])
+        self.assertFalse(Cart.objects.filter(token=token).exists())
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0)
+class CheckoutQuoteTests(APITestCase):
+    """Quotes priced once and reused by the payment step"""
+
+    url = f'{benchmarks.API_URL}/checkout/quote/'
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Jerseys', slug='jerseys')
+        self.product = Product.objects.create(
+            category=category, name='Barcelona Jersey', base_price=Decimal('50.00'),
+            image='https://images.example.com/barca.jpeg', team='Barcelona', description='Home',
+        )
+        self.medium = ProductVariant.objects.create(product=self.product, size='M', stock=5)
+        self.large = ProductVariant.objects.create(
+            product=self.product, size='L', stock=5, price_override=Decimal('55.00'),
+        )
+        self.cart = [
+            {'variant_id': self.large.id, 'quantity': 1},
+            {'variant_id': self.medium.id, 'quantity': 2},
+        ]
+
+    def quote(self, cart=None, delivery_fee=2000):
+        return self.client.post(self.url, {'cart_items': cart or self.cart, 'delivery_fee': delivery_fee}, format='json')
+
+    def test_quote_is_memoized_by_cart_contents(self):
+        with self.assertNumQueries(1):
+            first = self.quote()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data['subtotal_usd'], '155.00')
+        self.assertEqual(first.data['points'], 15)
+        self.assertEqual(first.data['total'], 155 * 1600 + 2000)
+
+        # Same lines in another order: no queries, same quote
+        with self.assertNumQueries(0):
+            second = self.quote(list(reversed(self.cart)))
+        self.assertEqual(second.data['quote_id'], first.data['quote_id'])
+
+        self.assertNotEqual(self.quote(delivery_fee=3500).data['quote_id'], first.data['quote_id'])
+
+    def test_out_of_stock_cart_is_not_quoted(self):
+        response = self.quote([{'variant_id': self.medium.id, 'quantity': 6}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Insufficient stock', response.data['error'])
+
+    def test_payment_accepts_quote_id(self):
+        quote_id = self.quote().data['quote_id']
+        payload = {'email': 'fan@example.com', 'quote_id': quote_id}
+
+        with mock.patch('store.views_payment.PaystackAPI', benchmarks.StubPaystackAPI), \
+                self.assertNumQueries(0):
+            response = self.client.post(f'{benchmarks.API_URL}/payment/initialize/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['amount'], 155 * 1600 + 2000)
+
+    def test_price_change_retires_quotes(self):
+        quote_id = self.quote().data['quote_id']
+        self.product.base_price = Decimal('40.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+        user = User.objects.create_user('fan', 'fan@example.com', 'pass12345')
+        self.client.force_authenticate(user)
+        response = self.client.post(f'{benchmarks.API_URL}/auth-checkout/', {'quote_id': quote_id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['code'], 'quote_expired')
+
+        quote_id = self.quote().data['quote_id']
+        response = self.client.post(f'{benchmarks.API_URL}/auth-checkout/', {'quote_id': quote_id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total'], Decimal('135.00'))
+        self.assertEqual(response.data['points_awarded'], 13)
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0, CATALOG_SNAPSHOT_DELAY=0)
+class CatalogSnapshotTests(APITestCase):
+    """Versioned, pre-compressed catalog snapshot"""
+
+    url = f'{benchmarks.API_URL}/catalog/'
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.settings_override = override_settings(CATALOG_SNAPSHOT_ROOT=self.root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        benchmarks.generate_catalog(products=5, variants=2, categories=2)
+
+    def test_build_is_content_addressed(self):
+        first = snapshots.build_snapshot()
+        self.assertTrue(first['built'])
+        self.assertEqual(first['products'], 5)
+        self.assertFalse(snapshots.build_snapshot()['built'])
+
+        body = (Path(self.root) / f"{first['version']}.json").read_bytes()
+        self.assertEqual(hashlib.sha256(body).hexdigest(), first['sha256'])
+        gz = (Path(self.root) / f"{first['version']}.json.gz").read_bytes()
+        self.assertEqual(gzip.decompress(gz), body)
+
+    def test_product_change_rebuilds_on_commit(self):
+        version = snapshots.build_snapshot()['version']
+        product = Product.objects.first()
+        product.base_price = Decimal('12.34')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+
+        manifest = snapshots.read_manifest()
+        self.assertNotEqual(manifest['version'], version)
+        data = json.loads((Path(self.root) / f"{manifest['version']}.json").read_bytes())
+        prices = {item['id']: item['base_price'] for item in data['products']}
+        self.assertEqual(prices[product.id], '12.34')
+
+    def test_only_latest_pending_change_builds(self):
+        cache.set(snapshots.PENDING_KEY, 'newer')
+        self.addCleanup(cache.delete, snapshots.PENDING_KEY)
+        snapshots._debouncer._run('older', 1)
+        self.assertIsNone(snapshots.read_manifest())
+
+        snapshots._debouncer._run('newer', 1)
+        self.assertIsNotNone(snapshots.read_manifest())
+        self.assertIsNone(cache.get(snapshots.BUILD_LOCK_KEY))
+        # Temporary files were all renamed into place
+        self.assertEqual([path for path in Path(self.root).iterdir() if path.name.startswith('.')], [])
+
+    def test_served_compressed_with_strong_etag(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data['products']), 5)
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        version = response['X-Catalog-Version']
+        response = self.client.get(f'{self.url}{version}/')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(len(json.loads(response.content)['products']), 5)
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0)
+class RenderingAndCompressionTests(APITestCase):
+    """orjson renderer parity and JSON response compression"""
+
+    url = f'{benchmarks.API_URL}/products/'
+
+    def test_orjson_matches_json_renderer(self):
+        data = {
+            'price': Decimal('19.99'),
+            'when': timezone.now(),
+            'day': timezone.localdate(),
+            'name': 'Atlético\u2028Madrid',
+            'nested': [{'id': 1, 'stock': None, 'ok': True}],
+            7: 'non-string key',
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_rendering_benchmark_reports_savings(self):
+        benchmarks.generate_catalog(products=20, variants=3)
+        results = benchmarks.run_rendering_benchmark(iterations=2)
+        self.assertTrue(results['identical'])
+        self.assertIn('saved_ms', results)
+        self.assertLess(results['compression']['gzip']['bytes'], results['renderers']['orjson']['bytes'])
+
+    def test_list_is_gzipped(self):
+        benchmarks.generate_catalog(products=20, variants=3)
+        plain = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    @override_settings(RESPONSE_COMPRESSION_STREAM_SIZE=2048)
+    def test_large_list_is_streamed(self):
+        benchmarks.generate_catalog(products=20, variants=3)
+        plain = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain.content)
+
+    def test_small_and_unsafe_responses_are_left_alone(self):
+        response = self.client.get(f'{benchmarks.API_URL}/categories/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.post(
+            f'{benchmarks.API_URL}/checkout/quote/', {'cart_items': []}, format='json', HTTP_ACCEPT_ENCODING='gzip',
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0)
+class SparseFieldsetTests(APITestCase):
+    """?fields= and ?expand= on the products API"""
+
+    url = f'{benchmarks.API_URL}/products/'
+
+    def setUp(self):
+        benchmarks.generate_catalog(products=10, variants=3, categories=2)
+        self.product = Product.objects.order_by('id').first()
+        stock.enable_sharding(self.product.variants.first(), shards=2)
+
+    def test_default_output_is_unchanged_and_batched(self):
+        # Products with categories, then every variant in one grouped query
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        item = response.data[0]
+        self.assertEqual(set(item), set(ProductSerializer.Meta.fields))
+        self.assertEqual(set(item['category']), {'id', 'name', 'slug'})
+        self.assertEqual(len(item['variants']), 3)
+
+    def test_grid_fields_skip_variants_and_description(self):
+        expected = {p['id']: p['stock'] for p in self.client.get(self.url).data}
+
+        with self.assertNumQueries(1) as queries:
+            response = self.client.get(f'{self.url}?{benchmarks.GRID_QUERY}')
+        self.assertNotIn('description', queries.captured_queries[0]['sql'])
+        item = response.data[0]
+        self.assertEqual(set(item), {'id', 'name', 'base_price', 'image', 'image_thumb', 'team', 'stock'})
+        # Stock from the subquery annotation matches the variant-by-variant sum
+        self.assertEqual({p['id']: p['stock'] for p in response.data}, expected)
+
+    def test_unexpanded_category_is_an_id(self):
+        response = self.client.get(f'{self.url}{self.product.id}/?fields=id,category,variants&expand=variants')
+        self.assertEqual(response.data['category'], self.product.category_id)
+        self.assertEqual(len(response.data['variants']), 3)
+        self.assertEqual(set(response.data), {'id', 'category', 'variants'})
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0)
+class ProductRowsParityTests(TestCase):
+    """render_products must match ProductSerializer exactly"""
+
+    QUERIES = [
+        '',
+        'fields=id,name,base_price,image,image_thumb,team,stock&expand=',
+        'fields=id,category,variants,stock&expand=variants',
+        'expand=category',
+        'fields=image_medium,description,category',
+        'team=Arsenal&price_min=20&size_available=M',
+        'search=Jersey&fields=name,stock',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmarks.generate_catalog(products=30, variants=4, categories=3)
+        product = Product.objects.order_by('id').first()
+        Product.objects.filter(pk=product.pk).update(image_hash='abc123', image_source=product.image)
+        stock.enable_sharding(product.variants.first(), shards=3)
+
+    def test_identical_output(self):
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                request = Request(APIRequestFactory().get(f'{benchmarks.API_URL}/products/?{query}'))
+                view = ProductViewSet(action='list', request=request, format_kwarg=None, kwargs={})
+                expected = ProductSerializer(
+                    view.filter_queryset(view.get_queryset()), many=True, context={'request': request},
+                ).data
+                actual = render_products(view.filter_queryset(view.get_filtered_queryset()), request.query_params, request)
+                self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0, CATALOG_SNAPSHOT_AUTO_BUILD=False)
+class FacetTests(APITestCase):
+    """Facet counts follow the filters, take one query and are cached"""
+
+    URL = f'{benchmarks.API_URL}/products/facets/'
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Kits', slug='kits')
+        cls.home = Product.objects.create(name='Arsenal Home', category=category, team='Arsenal', base_price=Decimal('20'))
+        cls.away = Product.objects.create(name='Arsenal Away', category=category, team='Arsenal', base_price=Decimal('60'))
+        cls.chelsea = Product.objects.create(name='Chelsea Home', category=category, team='Chelsea', base_price=Decimal('120'))
+        ProductVariant.objects.create(product=cls.home, size='M', stock=3)
+        ProductVariant.objects.create(product=cls.home, size='L', stock=0)
+        ProductVariant.objects.create(product=cls.away, size='M', stock=1)
+        sharded = ProductVariant.objects.create(product=cls.chelsea, size='L', stock=2)
+        stock.enable_sharding(sharded, shards=2)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['teams'], [{'value': 'Arsenal', 'count': 2}, {'value': 'Chelsea', 'count': 1}])
+        self.assertEqual(response.data['sizes'], [{'value': 'M', 'count': 2}, {'value': 'L', 'count': 1}])
+        self.assertEqual(
+            [(band['value'], band['count']) for band in response.data['price_bands']],
+            [('under-25', 1), ('25-50', 0), ('50-100', 1), ('100-plus', 1)],
+        )
+
+    def test_counts_follow_filters(self):
+        response = self.client.get(self.URL, {'team': 'Arsenal', 'price_max': '50'})
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(response.data['sizes'], [{'value': 'M', 'count': 1}])
+
+        response = self.client.get(self.URL, {'search': 'home'})
+        self.assertEqual(response.data['teams'], [{'value': 'Arsenal', 'count': 1}, {'value': 'Chelsea', 'count': 1}])
+
+    def test_cached_per_normalized_filter(self):
+        self.client.get(self.URL, {'search': 'Arsenal  Home'})
+        with self.assertNumQueries(0):
+            response = self.client.get(self.URL, {'search': ' arsenal home', 'team': ''})
+        self.assertEqual(response.data['total'], 1)
+
+    def test_product_change_invalidates(self):
+        self.client.get(self.URL)
+        self.chelsea.team = 'Arsenal'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chelsea.save()
+        response = self.client.get(self.URL)
+        self.assertEqual(response.data['teams'], [{'value': 'Arsenal', 'count': 3}])
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0, CATALOG_SNAPSHOT_AUTO_BUILD=False)
+class SuggestTests(APITestCase):
+    """Typeahead is answered from the in-process index"""
+
+    URL = f'{benchmarks.API_URL}/products/suggest/'
+
+    @classmethod
+    def setUpTestData(cls):
+        kits = Category.objects.create(name='Home Kits', slug='home-kits')
+        cls.home = Product.objects.create(name='Arsenal Home Jersey', category=kits, team='Arsenal', base_price=Decimal('50'))
+        Product.objects.create(name='Arsenal Away Jersey', category=kits, team='Arsenal', base_price=Decimal('50'))
+        Product.objects.create(name='Chelsea Home Jersey', category=kits, team='Chelsea', base_price=Decimal('50'))
+
+    def setUp(self):
+        cache.clear()
+
+    def labels(self, query, **params):
+        response = self.client.get(self.URL, {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(entry['type'], entry['label']) for entry in response.data]
+
+    def test_matches_and_ranking(self):
+        self.assertEqual(self.labels('ars'), [
+            ('team', 'Arsenal'),
+            ('product', 'Arsenal Away Jersey'),
+            ('product', 'Arsenal Home Jersey'),
+        ])
+        # Word prefixes match too, after matches at the start of a name
+        self.assertEqual(self.labels('HOME'), [
+            ('category', 'Home Kits'),
+            ('product', 'Arsenal Home Jersey'),
+            ('product', 'Chelsea Home Jersey'),
+        ])
+        self.assertEqual(self.labels('arsenal  home j'), [('product', 'Arsenal Home Jersey')])
+        self.assertEqual(self.labels('jersey', limit=1), [('product', 'Arsenal Away Jersey')])
+        self.assertEqual(self.labels('zzz'), [])
+        self.assertEqual(self.labels(''), [])
+
+    def test_no_queries_once_built(self):
+        suggest.get_index()
+        with self.assertNumQueries(0):
+            self.labels('che')
+
+    def test_rebuilt_when_catalog_changes(self):
+        self.assertEqual(self.labels('gunners'), [])
+        self.home.name = 'Gunners Home Jersey'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.home.save()
+        self.assertEqual(self.labels('gunners'), [('product', 'Gunners Home Jersey')])
+
+    def test_rebuilt_after_max_age(self):
+        self.assertEqual(self.labels('gunners'), [])
+        # As if another worker saved it: no version bump visible here
+        Product.objects.filter(pk=self.home.pk).update(name='Gunners Home Jersey')
+        self.assertEqual(self.labels('gunners'), [])
+
+        later = time.monotonic() + settings.SUGGEST_INDEX_MAX_AGE
+        with mock.patch('store.suggest.time.monotonic', return_value=later):
+            self.assertEqual(self.labels('gunners'), [('product', 'Gunners Home Jersey')])
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0, CATALOG_SNAPSHOT_AUTO_BUILD=False)
+class RelatedProductTests(APITestCase):
+    """Fans-also-bought neighbours built from paid orders, read in one query"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Soccer', slug='soccer')
+        cls.products = {}
+        for name, size in [('Home Jersey', 'M'), ('Away Jersey', 'M'), ('Scarf', 'One Size'),
+                           ('Cleats', '10'), ('Training Top', 'S'), ('Training Top', 'L')]:
+            product = Product.objects.create(category=category, name=name, base_price=Decimal('40.00'),
+                                             image='https://example.com/a.jpg', description='')
+            ProductVariant.objects.create(product=product, size=size, stock=5)
+            cls.products[(name, size)] = product
+
+        baskets = [
+            ('paid', [('Home Jersey', 'M'), ('Away Jersey', 'M')]),
+            ('shipped', [('Home Jersey', 'M'), ('Away Jersey', 'M'), ('Scarf', 'One Size')]),
+            ('paid', [('Home Jersey', 'M'), ('Scarf', 'One Size')]),
+            ('pending', [('Home Jersey', 'M'), ('Cleats', '10')]),
+            ('paid', [('Home Jersey', 'M'), ('Training Top', 'L'), ('Retired Kit', 'M')]),
+        ]
+        for i, (status, lines) in enumerate(baskets):
+            order = Order.objects.create(order_id=f'AGS-R{i}', email='fan@example.com',
+                                         total_amount=Decimal('80.00'), status=status)
+            for name, size in lines:
+                OrderItem.objects.create(order=order, product_name=name, variant_size=size,
+                                         quantity=1, price=Decimal('40.00'))
+
+    def related_url(self, key):
+        return f"{benchmarks.API_URL}/products/{self.products[key].pk}/related/"
+
+    def test_build_and_read(self):
+        out = StringIO()
+        call_command('build_related_products', '--top-n', '3', stdout=out)
+        self.assertIn('from 4 paid orders', out.getvalue())
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.related_url(('Home Jersey', 'M')))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item['id'], item['score']) for item in response.data],
+            [
+                (self.products[('Away Jersey', 'M')].pk, 0.7071),
+                (self.products[('Scarf', 'One Size')].pk, 0.7071),
+                # Resolved by size among products sharing the name
+                (self.products[('Training Top', 'L')].pk, 0.5),
+            ],
+        )
+        self.assertEqual(response.data[0]['base_price'], '40.00')
+
+        # Unpaid orders do not count
+        response = self.client.get(self.related_url(('Cleats', '10')))
+        self.assertEqual(response.data, [])
+
+    def test_rebuild_replaces_rows(self):
+        call_command('build_related_products', stdout=StringIO())
+        call_command('build_related_products', '--min-co-orders', '2', stdout=StringIO())
+        response = self.client.get(self.related_url(('Scarf', 'One Size')))
+        self.assertEqual([item['id'] for item in response.data], [self.products[('Home Jersey', 'M')].pk])
+
+    def test_unknown_product_is_404(self):
+        missing = Product.objects.order_by('-pk').first().pk + 1
+        for pk in (missing, '\u00b2', 'abc'):
+            with self.subTest(pk=pk):
+                response = self.client.get(f"{benchmarks.API_URL}/products/{pk}/related/")
+                self.assertEqual(response.status_code, 404)
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0, CATALOG_SNAPSHOT_AUTO_BUILD=False)
+class VariantGridTests(APITestCase):
+    """PUT variants/bulk/ replaces a product's sizes in a fixed number of queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('merch', 'merch@example.com', 'pass12345')
+        category = Category.objects.create(name='Soccer', slug='soccer')
+        cls.product = Product.objects.create(category=category, name='Home Jersey', base_price=Decimal('50.00'),
+                                             image='https://example.com/a.jpg', description='')
+        cls.small = ProductVariant.objects.create(product=cls.product, size='S', stock=1)
+        ProductVariant.objects.create(product=cls.product, size='M', stock=2)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        self.url = f"{benchmarks.API_URL}/products/{self.product.pk}/variants/bulk/"
+
+    def grid(self):
+        return list(self.product.variants.values_list('size', 'stock', 'price_override'))
+
+    def test_replaces_grid(self):
+        version = versions.catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(self.url, [
+                {'size': 'S', 'stock': 5},
+                {'size': 'L', 'stock': 3, 'price_override': '55.00'},
+            ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['size'] for row in response.data], ['L', 'S'])
+        self.assertEqual(self.grid(), [('L', 3, Decimal('55.00')), ('S', 5, None)])
+        # Existing sizes keep their ids, so cart lines survive
+        self.assertEqual(self.product.variants.get(size='S').pk, self.small.pk)
+        # Bulk writes send no post_save; caches are invalidated all the same
+        self.assertNotEqual(versions.catalog_version(), version)
+
+    def test_caches_invalidated_on_commit(self):
+        version = versions.catalog_version()
+        price_version = quotes.price_version()
+        recorded = CatalogChange.objects.count()
+        with self.captureOnCommitCallbacks() as callbacks:
+            # Dropping M deletes a variant, which sends post_delete mid-transaction
+            response = self.client.put(self.url, [{'size': 'S', 'stock': 5}], format='json')
+            self.assertEqual(response.status_code, 200)
+            # Nothing can be cached from the uncommitted grid under a new version
+            self.assertEqual(versions.catalog_version(), version)
+            self.assertEqual(quotes.price_version(), price_version)
+            # The change feed entries are part of the transaction itself
+            self.assertEqual(CatalogChange.objects.count(), recorded + 3)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(versions.catalog_version(), version)
+        self.assertNotEqual(quotes.price_version(), price_version)
+
+    def test_constant_query_count(self):
+        def put(sizes):
+            grid = [{'size': str(size), 'stock': size} for size in sizes]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.put(self.url, grid, format='json').status_code, 200)
+            return len(queries)
+
+        # Each replaces every existing size
+        self.assertEqual(put(range(3)), put(range(10, 50)))
+
+    def test_invalid_grid_changes_nothing(self):
+        response = self.client.put(self.url, [
+            {'size': 'S', 'stock': 5},
+            {'size': 'S', 'stock': 6},
+            {'size': 'XL', 'stock': -1},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('stock', response.data[2])
+
+        response = self.client.put(self.url, [{'size': 'S', 'stock': 5}, {'size': 'S', 'stock': 6}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('size', response.data[1])
+        self.assertEqual(self.grid(), [('M', 2, None), ('S', 1, None)])
+
+    def test_sharded_sizes_are_protected(self):
+        stock.enable_sharding(self.small, shards=2)
+        before = self.grid()
+        response = self.client.put(self.url, [{'size': 'S', 'stock': 4}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('stock', response.data[0])
+        response = self.client.put(self.url, [{'size': 'M', 'stock': 4}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.grid(), before)
+
+    def test_unknown_product(self):
+        response = self.client.put(f"{benchmarks.API_URL}/products/999999/variants/bulk/", [], format='json')
+        self.assertEqual(response.status_code, 404)
+        # Unicode digits pass str.isdigit() but not int()
+        response = self.client.put(f"{benchmarks.API_URL}/products/%C2%B2/variants/bulk/", [], format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_single_variant_create_still_validates(self):
+        url = f"{benchmarks.API_URL}/products/{self.product.pk}/variants/"
+        self.assertEqual(self.client.post(url, {'size': 'XL', 'stock': 1}, format='json').status_code, 201)
+        self.assertEqual(self.client.post(url, {'size': 'XL', 'stock': 1}, format='json').status_code, 400)
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0, CATALOG_SNAPSHOT_AUTO_BUILD=False)
+class ProductBatchTests(APITestCase):
+    """POST products/batch/ writes valid items in bulk and reports each one"""
+
+    URL = f'{benchmarks.API_URL}/products/batch/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('merch', 'merch@example.com', 'pass12345')
+        cls.category = Category.objects.create(name='Kits', slug='kits')
+        cls.existing = Product.objects.create(category=cls.category, name='Home Jersey', base_price=Decimal('50.00'),
+                                              image='https://example.com/a.jpg', description='')
+        ProductVariant.objects.create(product=cls.existing, size='M', stock=2)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def item(self, name, **fields):
+        return {'name': name, 'category': 'kits', 'base_price': '45.00', 'image': 'https://example.com/b.jpg',
+                'variants': [{'size': 'S', 'stock': 1}, {'size': 'M', 'stock': 2}], **fields}
+
+    def test_partial_failure_keeps_good_rows(self):
+        response = self.client.post(self.URL, {'products': [
+            self.item('Away Jersey', team='Arsenal'),
+            self.item('Third Kit', category='boots'),
+            self.item('Keeper Kit', base_price='0'),
+            self.item('Home Jersey', id=self.existing.pk, base_price='55.00',
+                      variants=[{'size': 'M', 'stock': 9}, {'size': 'L', 'stock': 4, 'price_override': '60.00'}]),
+            self.item('Home Jersey', id=self.existing.pk, base_price='65.00'),
+            # Products may share a name
+            self.item('home jersey'),
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['error']), (2, 1, 3))
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['created', 'error', 'error', 'updated', 'error', 'created'])
+        self.assertIn('category', results[1]['errors'])
+        self.assertIn('base_price', results[2]['errors'])
+        self.assertEqual(results[4]['errors'], {'id': ['An earlier item in this batch has this id']})
+
+        created = Product.objects.get(pk=results[0]['id'])
+        self.assertEqual(created.team, 'Arsenal')
+        self.assertEqual(list(created.variants.values_list('size', 'stock')), [('M', 2), ('S', 1)])
+
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.base_price, Decimal('55.00'))
+        self.assertEqual(list(self.existing.variants.values_list('size', 'stock', 'price_override')),
+                         [('L', 4, Decimal('60.00')), ('M', 9, None)])
+
+    def test_constant_query_count(self):
+        def post(prefix, count):
+            items = [self.item(f'{prefix} {i}') for i in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.post(self.URL, {'products': items}, format='json').data['created'], count)
+            return len(queries)
+
+        self.assertEqual(post('Scarf', 2), post('Cap', 60))
+        self.assertEqual(Product.objects.count(), 63)
+
+    def test_unknown_id_and_limits(self):
+        response = self.client.post(self.URL, {'products': [self.item('Ghost', id=999999)]}, format='json')
+        self.assertIn('id', response.data['results'][0]['errors'])
+
+        self.assertEqual(self.client.post(self.URL, {'products': []}, format='json').status_code, 400)
+        too_many = [self.item(f'P{i}') for i in range(501)]
+        self.assertEqual(self.client.post(self.URL, {'products': too_many}, format='json').status_code, 400)
+        self.assertEqual(Product.objects.count(), 1)
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0, CATALOG_SNAPSHOT_AUTO_BUILD=False,
+                   CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTests(APITestCase):
+    """/changes/?since= returns what changed after a token, deletes included"""
+
+    URL = f'{benchmarks.API_URL}/changes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('merch', 'merch@example.com', 'pass12345')
+        category = Category.objects.create(name='Kits', slug='kits')
+        cls.jersey = Product.objects.create(category=category, name='Home Jersey', base_price=Decimal('50.00'),
+                                            image='https://example.com/a.jpg', description='')
+        cls.medium = ProductVariant.objects.create(product=cls.jersey, size='M', stock=5)
+        cls.large = ProductVariant.objects.create(product=cls.jersey, size='L', stock=5)
+
+    def sync(self, since, **params):
+        response = self.client.get(self.URL, {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_full_then_incremental_sync(self):
+        full = self.sync(0)
+        self.assertEqual([product['id'] for product in full['products']], [self.jersey.pk])
+        self.assertEqual(full['products'][0]['base_price'], '50.00')
+        self.assertEqual(sorted(variant['size'] for variant in full['variants']), ['L', 'M'])
+        self.assertFalse(full['has_more'])
+        token = full['next']
+
+        self.assertEqual(self.sync(token)['variants'], [])
+
+        stock.decrement_stock(self.medium, 2)
+        large_id = self.large.pk
+        self.large.delete()
+        page = self.sync(token)
+        self.assertEqual(page['products'], [])
+        self.assertEqual([(variant['size'], variant['stock']) for variant in page['variants']], [('M', 3)])
+        self.assertEqual(page['deleted'], {'products': [], 'variants': [large_id]})
+
+    def test_paging_and_bulk_writes(self):
+        token = self.sync(0)['next']
+        self.client.force_authenticate(self.user)
+        self.client.put(f"{benchmarks.API_URL}/products/{self.jersey.pk}/variants/bulk/",
+                        [{'size': 'S', 'stock': 1}, {'size': 'M', 'stock': 7}], format='json')
+
+        seen, deleted, pages = {}, set(), 0
+        while True:
+            page = self.sync(token, limit=2)
+            seen.update((variant['size'], variant['stock']) for variant in page['variants'])
+            deleted.update(page['deleted']['variants'])
+            token, pages = page['next'], pages + 1
+            if not page['has_more']:
+                break
+        self.assertGreater(pages, 1)
+        self.assertEqual(seen, {'S': 1, 'M': 7})
+        self.assertEqual(deleted, {self.large.pk})
+
+    def test_compaction_keeps_latest_state(self):
+        for stock_level in (4, 3, 2):
+            self.medium.stock = stock_level
+            self.medium.save()
+        call_command('compact_catalog_changes', stdout=StringIO())
+        self.assertEqual(CatalogChange.objects.filter(object_id=self.medium.pk, kind='variant').count(), 1)
+        variants = {variant['size']: variant['stock'] for variant in self.sync(0)['variants']}
+        self.assertEqual(variants, {'M': 2, 'L': 5})
+
+    def test_held_back_behind_open_write_transactions(self):
+        token = self.sync(0)['next']
+        self.medium.save()
+        # A transaction open since before the entry may still commit a lower id
+        started = CatalogChange.objects.latest('id').recorded_at - timedelta(seconds=1)
+        with mock.patch('store.changes._oldest_open_write', return_value=started):
+            self.assertEqual(self.sync(token)['next'], token)
+        self.assertGreater(self.sync(token)['next'], token)
+
+    def test_invalid_token(self):
+        self.assertEqual(self.client.get(self.URL, {'since': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(self.URL, {'since': -1}).status_code, 400)
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0, CATALOG_SNAPSHOT_AUTO_BUILD=False,
+                   LIVE_STOCK_WINDOW=0.01, LIVE_STOCK_KEEPALIVE=5, CHANGE_FEED_SETTLE_SECONDS=0)
+class LiveStockTests(TestCase):
+    """Stock changes reach watchers coalesced, from one poll per window"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Kits', slug='kits')
+        cls.jersey = Product.objects.create(category=category, name='Home Jersey', base_price=Decimal('50.00'),
+                                            image='https://example.com/a.jpg', description='')
+        cls.scarf = Product.objects.create(category=category, name='Scarf', base_price=Decimal('15.00'),
+                                           image='https://example.com/b.jpg', description='')
+        cls.medium = ProductVariant.objects.create(product=cls.jersey, size='M', stock=5)
+        cls.large = ProductVariant.objects.create(product=cls.jersey, size='L', stock=5)
+        cls.scarf_variant = ProductVariant.objects.create(product=cls.scarf, size='One Size', stock=9)
+
+    def test_poll_coalesces_changes_for_watched_products(self):
+        broker = live_stock.StockBroker()
+        self.assertEqual(broker.poll({self.jersey.pk}), {})
+
+        stock.decrement_stock(self.medium, 1)
+        stock.decrement_stock(self.medium, 2)
+        stock.decrement_stock(self.scarf_variant, 1)
+        with self.assertNumQueries(2):
+            updates = broker.poll({self.jersey.pk})
+        self.assertEqual(updates, {self.jersey.pk: {self.medium.pk: {'id': self.medium.pk, 'size': 'M', 'stock': 2}}})
+        self.assertEqual(broker.poll({self.jersey.pk}), {})
+
+    def test_poll_waits_for_entries_to_settle(self):
+        broker = live_stock.StockBroker()
+        broker.poll({self.jersey.pk})
+        stock.decrement_stock(self.medium, 1)
+
+        with self.settings(CHANGE_FEED_SETTLE_SECONDS=60):
+            self.assertEqual(broker.poll({self.jersey.pk}), {})
+        self.assertEqual(broker.poll({self.jersey.pk}),
+                         {self.jersey.pk: {self.medium.pk: {'id': self.medium.pk, 'size': 'M', 'stock': 4}}})
+
+    def test_wsgi_is_refused(self):
+        response = self.client.get(f'{benchmarks.API_URL}/products/{self.jersey.pk}/stock/stream/')
+        self.assertEqual(response.status_code, 501)
+
+    async def test_stream(self):
+        response = await self.async_client.get(f'{benchmarks.API_URL}/products/{self.jersey.pk}/stock/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        try:
+            first = await anext(events)
+            self.assertEqual(first.splitlines()[0], b'event: stock')
+            self.assertEqual(
+                json.loads(first.splitlines()[1].removeprefix(b'data: ')),
+                [{'id': self.medium.pk, 'size': 'M', 'stock': 5}, {'id': self.large.pk, 'size': 'L', 'stock': 5}],
+            )
+            # Let the broker record where the feed ends before selling
+            await asyncio.sleep(0.05)
+            await sync_to_async(stock.decrement_stock)(self.large, 3)
+            update = await asyncio.wait_for(anext(events), timeout=2)
+            self.assertEqual(json.loads(update.splitlines()[1].removeprefix(b'data: ')),
+                             [{'id': self.large.pk, 'size': 'L', 'stock': 2}])
+        finally:
+            await events.aclose()
+
+    async def test_broker_survives_failed_polls(self):
+        broker = live_stock.StockBroker()
+        update = {self.jersey.pk: {self.medium.pk: {'id': self.medium.pk, 'size': 'M', 'stock': 4}}}
+        with self.settings(LIVE_STOCK_WINDOW=0.01), \
+                mock.patch.object(broker, 'poll', side_effect=[RuntimeError('database restarting'), update, {}]), \
+                self.assertLogs('store.live_stock', 'ERROR'):
+            subscription = broker.subscribe(self.jersey.pk)
+            self.assertEqual(await subscription.next(timeout=2), update[self.jersey.pk])
+            broker.unsubscribe(subscription)
+            await asyncio.wait_for(broker._task, timeout=2)
+
+    async def test_closing_stream_unsubscribes(self):
+        events = live_stock.stock_events(self.scarf.pk)
+        await anext(events)
+        self.assertIn(self.scarf.pk, live_stock.broker.subscriptions)
+        await events.aclose()
+        self.assertNotIn(self.scarf.pk, live_stock.broker.subscriptions)
+
+    async def test_unknown_product(self):
+        response = await self.async_client.get(f'{benchmarks.API_URL}/products/999999/stock/stream/')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0, OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_BASE_SECONDS=30)
+class EmailOutboxTests(TestCase):
+    """Confirmations are queued with the paid order and sent by the dispatcher"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.orders = []
+        for i in range(3):
+            order = Order.objects.create(order_id=f'AGS-E{i}', email=f'fan{i}@example.com',
+                                         total_amount=Decimal('100.00'), payment_reference=f'REF-E{i}')
+            OrderItem.objects.create(order=order, product_name='Barcelona Jersey', variant_size='M',
+                                     quantity=2, price=Decimal('50.00'))
+            cls.orders.append(order)
+
+    def dispatch(self, *args):
+        out = StringIO()
+        call_command('dispatch_outbox', *args, stdout=out)
+        return out.getvalue()
+
+    def test_queued_with_paid_order_and_sent_in_batches(self):
+        for order in self.orders:
+            mark_order_paid(order)
+        mark_order_paid(self.orders[0])
+        self.assertEqual(OutboxEmail.objects.filter(status='pending').count(), 3)
+        self.assertEqual(mail.outbox, [])
+
+        with mock.patch('store.outbox.get_connection', wraps=get_connection) as connect:
+            self.assertIn('Sent 3 emails', self.dispatch('--batch-size', '2'))
+        connect.assert_called_once()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         ['fan0@example.com', 'fan1@example.com', 'fan2@example.com'])
+        self.assertEqual(mail.outbox[0].subject, 'Order AGS-E0 confirmed')
+        self.assertIn('2 x Barcelona Jersey (M) - 100.00', mail.outbox[0].body)
+
+        self.assertIn('Sent 0 emails', self.dispatch())
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_rolled_back_payment_queues_nothing(self):
+        with mock.patch('store.orders.record_order_sales', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                mark_order_paid(self.orders[0])
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_retry_with_backoff_then_fail(self):
+        mark_order_paid(self.orders[0])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=ConnectionError('SMTP down')):
+            self.assertIn('1 to retry', self.dispatch())
+            email = OutboxEmail.objects.get()
+            self.assertEqual((email.status, email.attempts, email.last_error), ('pending', 1, 'SMTP down'))
+            self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=25))
+
+            # Not due yet
+            self.assertIn('Sent 0 emails, 0 to retry', self.dispatch())
+
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertIn('1 failed', self.dispatch())
+        self.assertEqual(OutboxEmail.objects.get().status, 'failed')
+        self.assertEqual(mail.outbox, [])
+
+    def test_claims_are_exclusive_and_lapsed_leases_reclaimed(self):
+        for order in self.orders:
+            mark_order_paid(order)
+        first, _ = outbox._claim(2)
+        second, _ = outbox._claim(10)
+        self.assertEqual(len(first) + len(second), 3)
+        self.assertFalse({email.pk for email in first} & {email.pk for email in second})
+        self.assertEqual(outbox._claim(10), ([], mock.ANY))
+
+        # The dispatchers died mid-batch; once their leases lapse the emails go out
+        self.assertIn('Sent 0 emails', self.dispatch())
+        OutboxEmail.objects.update(claimed_until=timezone.now() - timedelta(seconds=1))
+        self.assertIn('Sent 3 emails', self.dispatch())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(set(OutboxEmail.objects.values_list('status', 'attempts')), {('sent', 2)})
+
+    def test_email_that_crashes_every_dispatcher_fails(self):
+        mark_order_paid(self.orders[0])
+        for _ in range(2):
+            # A dispatcher claims it, then dies before saving a result
+            self.assertEqual(len(outbox._claim(10)[0]), 1)
+            OutboxEmail.objects.update(claimed_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(outbox._claim(10), ([], mock.ANY))
+        self.assertIn('Sent 0 emails, 0 to retry, 1 failed', self.dispatch())
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts, email.claimed_until), ('failed', 2, None))
+        self.assertIn('Sent 0 emails, 0 to retry, 0 failed', self.dispatch())
+        self.assertEqual(mail.outbox, [])
+
+    def test_result_not_saved_after_losing_the_claim(self):
+        mark_order_paid(self.orders[0])
+
+        def reclaimed(messages):
+            # Another dispatcher takes the email while this one is sending it
+            OutboxEmail.objects.update(claimed_until=timezone.now() + timedelta(hours=1))
+            return len(messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=reclaimed):
+            self.dispatch()
+        self.assertEqual(OutboxEmail.objects.get().status, 'sending')
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0, CATALOG_SNAPSHOT_AUTO_BUILD=False)
+class ImageRenditionTests(TestCase):
+    """Renditions are built once per image and served from MEDIA_URL"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Kits', slug='kits')
+        cls.product = Product.objects.create(category=category, name='Home Jersey', base_price=Decimal('50.00'),
+                                             image='https://example.com/jersey.png', description='')
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.settings_override = override_settings(MEDIA_ROOT=self.root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def image_bytes(self, size=(800, 600), color='red'):
+        buffer = BytesIO()
+        Image.new('RGBA', size, color).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_build_renditions(self):
+        image_hash = images.build_renditions(self.image_bytes())
+        for name, edge in images.RENDITIONS.items():
+            path = Path(self.root) / images.rendition_path(image_hash, name)
+            with Image.open(path) as rendition:
+                self.assertEqual(rendition.format, 'WEBP')
+                self.assertEqual(max(rendition.size), edge)
+        self.assertEqual(sorted(p.name for p in (Path(self.root) / 'products' / image_hash).iterdir()),
+                         ['medium.webp', 'thumb.webp'])
+        self.assertEqual(images.build_renditions(self.image_bytes()), image_hash)
+
+    def test_refresh_product_image_and_urls(self):
+        product = Product.objects.get(pk=self.product.pk)
+        # Original image until renditions exist for the current URL
+        self.assertEqual(images.rendition_url(product, 'thumb'), product.image)
+
+        with mock.patch('store.images.fetch_image', return_value=self.image_bytes()) as fetch:
+            self.assertTrue(images.refresh_product_image(product))
+            self.assertFalse(images.refresh_product_image(product))
+        fetch.assert_called_once_with(product.image)
+
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.image_source, product.image)
+        self.assertEqual(images.rendition_url(product, 'thumb'), f'/media/products/{product.image_hash}/thumb.webp')
+        request = RequestFactory().get('/')
+        self.assertEqual(images.rendition_url(product, 'medium', request),
+                         f'http://testserver/media/products/{product.image_hash}/medium.webp')
+
+        # A new image URL falls back to the original until rebuilt
+        product.image = 'https://example.com/other.png'
+        self.assertEqual(images.rendition_url(product, 'thumb'), product.image)
@@ -3,14 +3,24 @@
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested.routers import NestedDefaultRouter
 from django.urls import path
-from .views import CategoryViewSet, ProductViewSet, ProductVariantViewSet, GuestCheckoutView, AuthenticatedCheckoutView
+from .views import (
+    CategoryViewSet, ProductViewSet, ProductVariantViewSet, GuestCheckoutView, AuthenticatedCheckoutView,
+    CheckoutQuoteView,
+)
 from .views_payment import InitializePaymentView, VerifyPaymentView, PaymentWebhookView
+from .views_order import OrderViewSet
+from .views_cart import CartView, CartItemsView, CartItemView
+from .views_catalog import CatalogSnapshotView
+from .views_changes import CatalogChangesView
+from .views_live import product_stock_stream
+from .views_reports import ProductSalesReportView, TeamSalesReportView
 
 app_name = 'store'
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
 router.register(r'products', ProductViewSet)
+router.register(r'orders', OrderViewSet, basename='order')
 
 # Nested router for product variants
 products_router = NestedDefaultRouter(router, r'products', lookup='product')
@@ -19,9 +29,29 @@ products_router.register(r'variants', ProductVariantViewSet, basename='product-v
 urlpatterns = router.urls + products_router.urls + [
     path('guest-checkout/', GuestCheckoutView.as_view(), name='guest_checkout'),
     path('auth-checkout/', AuthenticatedCheckoutView.as_view(), name='auth_checkout'),
+    path('checkout/quote/', CheckoutQuoteView.as_view(), name='checkout_quote'),
     
     # Payment endpoints
     path('payment/initialize/', InitializePaymentView.as_view(), name='initialize_payment'),
     path('payment/verify/<str:reference>/', VerifyPaymentView.as_view(), name='verify_payment'),
     path('payment/webhook/', PaymentWebhookView.as_view(), name='payment_webhook'),
+
+    # Pre-built catalog snapshot
+    path('catalog/', CatalogSnapshotView.as_view(), name='catalog_snapshot'),
+    path('catalog/<str:version>/', CatalogSnapshotView.as_view(), name='catalog_snapshot_version'),
+
+    # Incremental catalog sync
+    path('changes/', CatalogChangesView.as_view(), name='catalog_changes'),
+
+    # Live variant stock (server-sent events, needs ASGI)
+    path('products/<int:product_id>/stock/stream/', product_stock_stream, name='product_stock_stream'),
+
+    # Server-side cart
+    path('cart/', CartView.as_view(), name='cart'),
+    path('cart/items/', CartItemsView.as_view(), name='cart_items'),
+    path('cart/items/<int:variant_id>/', CartItemView.as_view(), name='cart_item'),
+
+    # Admin reports (precomputed rollups)
+    path('reports/sales/products/', ProductSalesReportView.as_view(), name='product_sales_report'),
+    path('reports/sales/teams/', TeamSalesReportView.as_view(), name='team_sales_report'),
 ]
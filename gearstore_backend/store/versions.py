@@ -0,0 +1,55 @@
+"""
+Catalog version stamp for caches derived from products
+
+Saving or deleting a product, variant or category replaces the stamp, so
+anything cached under the old stamp (facet counts, the suggest index) is
+ignored from then on. Stock sold through store/stock.py does not change it.
+
+The stamp is only shared between workers if the cache is (CACHE_BACKEND,
+e.g. Redis). With the default per-process LocMemCache a worker never sees
+another worker's bump, so those caches also expire on their own: facet
+counts after FACET_CACHE_TTL and the suggest index after
+SUGGEST_INDEX_MAX_AGE seconds. Run several workers with a shared cache for
+changes to show up everywhere at once.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Category, Product, ProductVariant
+from .signals import catalog_bulk_changed
+
+_CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def catalog_version():
+    """Current catalog version, issuing one if the cache lost it"""
+    version = cache.get(_CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(_CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(_CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    cache.set(_CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def _catalog_changed(sender, **kwargs):
+    # Deferred like the bulk path: a version bumped before commit lets readers
+    # cache the old rows under the new version
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(catalog_bulk_changed)
+def _catalog_bulk_changed(sender, **kwargs):
+    transaction.on_commit(bump_catalog_version)
@@ -1,12 +1,24 @@
 from rest_framework import viewsets, permissions, status, serializers
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.filters import SearchFilter
 from django_filters.rest_framework import DjangoFilterBackend
 import uuid
+from decimal import Decimal
+from django.db.models import Q
+from gearstore_backend.throttling import GCRAIPThrottle, GCRAEmailThrottle
+from gearstore_backend.metrics import CHECKOUT_STOCK_REJECTIONS, CHECKOUT_VALIDATION_FAILURES
 from .models import Category, Product, ProductVariant
-from .serializers import CategorySerializer, ProductSerializer, ProductVariantSerializer
+from .serializers import CategorySerializer, ProductSerializer, ProductVariantSerializer, VariantGridRowSerializer
+from .admission import WaitingRoomMixin
+from .bulk import MAX_BATCH_PRODUCTS, batch_upsert_products, replace_variant_grid
+from .facets import product_facets
+from .product_rows import render_products
+from .recommendations import related_products
+from .suggest import suggest
+from .carts import CART_TOKEN_HEADER, get_cart
+from .quotes import QUOTE_EXPIRED, QuoteError, get_or_create_quote, get_quote
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -29,11 +41,71 @@ class ProductViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'facets', 'suggest', 'related']:
             return [permissions.AllowAny()]
         return [permissions.IsAuthenticated()]
 
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Create or update up to MAX_BATCH_PRODUCTS products with variants; results per item"""
+        items = request.data.get('products') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({"error": "products must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_BATCH_PRODUCTS:
+            return Response(
+                {"error": f"At most {MAX_BATCH_PRODUCTS} products per batch"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = batch_upsert_products(items)
+        counts = {status_name: 0 for status_name in ('created', 'updated', 'error')}
+        for result in results:
+            counts[result['status']] += 1
+        return Response({**counts, "results": results})
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Counts per team, in-stock size and price band for the current filters"""
+        products = self.filter_queryset(self.get_filtered_queryset())
+        return Response(product_facets(products, request.query_params))
+
+    @action(detail=False, methods=['get'], authentication_classes=[])
+    def suggest(self, request):
+        """Typeahead matches for ?q= from the in-process index (?limit=, default 8)"""
+        try:
+            limit = int(request.query_params.get('limit', 8))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(suggest(request.query_params.get('q', ''), limit))
+
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        """Fans-also-bought products, precomputed by manage.py build_related_products"""
+        try:
+            product_id = int(pk)
+        except ValueError:
+            product_id = None
+        related = related_products(product_id, request) if product_id is not None else []
+        # Only an empty answer needs the extra query to tell "none yet" from "no such product"
+        if not related and (product_id is None or not Product.objects.filter(pk=product_id).exists()):
+            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(related)
+
+    # Render list responses from .values() rows (store/product_rows.py)
+    fast_list = True
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_list or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_filtered_queryset())
+        return Response(render_products(queryset, request.query_params, request))
+
     def get_queryset(self):
+        # Load only the columns and relations ?fields= / ?expand= ask for
+        return ProductSerializer.prepare_queryset(self.get_filtered_queryset(), self.request.query_params)
+
+    def get_filtered_queryset(self):
+        """Products matching ?price_min=, ?price_max= and ?size_available="""
         queryset = super().get_queryset()
         price_min = self.request.query_params.get('price_min')
         price_max = self.request.query_params.get('price_max')
@@ -47,7 +119,12 @@ class ProductViewSet(viewsets.ModelViewSet):
 
         # Filter by available size
         if size_available:
-            queryset = queryset.filter(variants__size=size_available, variants__stock__gt=0).distinct()
+            # Sharded variants keep their stock in the shards, not in stock
+            queryset = queryset.filter(
+                Q(variants__sharded=False, variants__stock__gt=0)
+                | Q(variants__sharded=True, variants__stock_shards__stock__gt=0),
+                variants__size=size_available,
+            ).distinct()
 
         return queryset
 
@@ -83,6 +160,22 @@ class ProductVariantViewSet(viewsets.ModelViewSet):
         else:
             serializer.save()
 
+    @action(detail=False, methods=['put'])
+    def bulk(self, request, product_pk=None):
+        """Replace the product's whole size grid with a list of {size, stock, price_override}"""
+        rows = VariantGridRowSerializer(data=request.data, many=True)
+        rows.is_valid(raise_exception=True)
+        not_found = Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            product_id = int(product_pk)
+        except (TypeError, ValueError):
+            return not_found
+        try:
+            variants = replace_variant_grid(product_id, rows.validated_data)
+        except Product.DoesNotExist:
+            return not_found
+        return Response(ProductVariantSerializer(variants, many=True).data)
+
 
 class CartItemSerializer(serializers.Serializer):
     variant_id = serializers.PrimaryKeyRelatedField(queryset=ProductVariant.objects.all(), source='variant')
@@ -93,19 +186,23 @@ class GuestCheckoutView(APIView):
     """Guest checkout for fans buying gear without login"""
 
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [GCRAIPThrottle, GCRAEmailThrottle]
+    throttle_scope = 'checkout'
 
     def post(self, request):
         cart_items_serializer = CartItemSerializer(data=request.data.get('cart_items', []), many=True)
         if not cart_items_serializer.is_valid():
+            CHECKOUT_VALIDATION_FAILURES.inc(endpoint='guest_checkout')
             return Response(cart_items_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         # Validate stock
         for item in cart_items_serializer.validated_data:
             variant = item['variant']
             quantity = item['quantity']
-            if variant.stock < quantity:
+            if variant.available_stock < quantity:
+                CHECKOUT_STOCK_REJECTIONS.inc(endpoint='guest_checkout')
                 return Response(
-                    {"error": f"Insufficient stock for {variant.product.name} - {variant.size}. Available: {variant.stock}"},
+                    {"error": f"Insufficient stock for {variant.product.name} - {variant.size}. Available: {variant.available_stock}"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
@@ -114,14 +211,18 @@ class GuestCheckoutView(APIView):
         return Response({"order_id": order_id}, status=status.HTTP_201_CREATED)
 
 
-class AuthenticatedCheckoutView(APIView):
+class AuthenticatedCheckoutView(WaitingRoomMixin, APIView):
     """Authenticated checkout with loyalty points for registered fans"""
 
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
+        if 'quote_id' in request.data:
+            return self.post_quote(request)
+
         cart_items_serializer = CartItemSerializer(data=request.data.get('cart_items', []), many=True)
         if not cart_items_serializer.is_valid():
+            CHECKOUT_VALIDATION_FAILURES.inc(endpoint='auth_checkout')
             return Response(cart_items_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         total = 0
@@ -129,9 +230,10 @@ class AuthenticatedCheckoutView(APIView):
         for item in cart_items_serializer.validated_data:
             variant = item['variant']
             quantity = item['quantity']
-            if variant.stock < quantity:
+            if variant.available_stock < quantity:
+                CHECKOUT_STOCK_REJECTIONS.inc(endpoint='auth_checkout')
                 return Response(
-                    {"error": f"Insufficient stock for {variant.product.name} - {variant.size}. Available: {variant.stock}"},
+                    {"error": f"Insufficient stock for {variant.product.name} - {variant.size}. Available: {variant.available_stock}"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
@@ -153,3 +255,62 @@ class AuthenticatedCheckoutView(APIView):
             "total": total,
             "points_awarded": points
         }, status=status.HTTP_201_CREATED)
+
+    def post_quote(self, request):
+        """Check out a quote from CheckoutQuoteView without repricing the cart"""
+        quote = get_quote(request.data.get('quote_id'))
+        if quote is None:
+            CHECKOUT_VALIDATION_FAILURES.inc(endpoint='auth_checkout')
+            return Response(QUOTE_EXPIRED, status=status.HTTP_400_BAD_REQUEST)
+
+        order_id = f"auth-{uuid.uuid4()}"
+        return Response({
+            "order_id": order_id,
+            "total": Decimal(quote['subtotal_usd']),
+            "points_awarded": quote['points']
+        }, status=status.HTTP_201_CREATED)
+
+
+class QuoteLineSerializer(serializers.Serializer):
+    variant_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class CheckoutQuoteView(APIView):
+    """
+    Price a cart once for the checkout page
+
+    Takes `cart_items` (or the caller's server-side cart when omitted) and a
+    `delivery_fee`. The returned `quote_id` can be sent to auth-checkout or
+    payment/initialize in place of the cart until the quote expires.
+    """
+
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        if 'cart_items' in request.data:
+            lines_serializer = QuoteLineSerializer(data=request.data.get('cart_items'), many=True)
+            if not lines_serializer.is_valid():
+                CHECKOUT_VALIDATION_FAILURES.inc(endpoint='checkout_quote')
+                return Response(lines_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            lines = [(line['variant_id'], line['quantity']) for line in lines_serializer.validated_data]
+        else:
+            cart = get_cart(request.user, request.headers.get(CART_TOKEN_HEADER))
+            lines = list(cart.items.values_list('variant_id', 'quantity')) if cart is not None else []
+
+        try:
+            delivery_fee = float(request.data.get('delivery_fee', 0))
+        except (TypeError, ValueError):
+            CHECKOUT_VALIDATION_FAILURES.inc(endpoint='checkout_quote')
+            return Response({"error": "Invalid delivery fee"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            quote = get_or_create_quote(lines, delivery_fee)
+        except QuoteError as e:
+            if e.out_of_stock:
+                CHECKOUT_STOCK_REJECTIONS.inc(endpoint='checkout_quote')
+            else:
+                CHECKOUT_VALIDATION_FAILURES.inc(endpoint='checkout_quote')
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(quote, status=status.HTTP_200_OK)
@@ -0,0 +1,91 @@
+"""
+Server-side cart API for guests and signed-in fans
+
+Guests get a `cart_token` in the first write response and send it back in
+the X-Cart-Token header. A signed-in fan who sends a guest token has that
+guest cart merged into theirs.
+"""
+from rest_framework import permissions, serializers, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .carts import (
+    CART_TOKEN_HEADER, cart_summary, clear_cart, empty_summary, get_cart, set_quantity,
+)
+from .models import ProductVariant
+from .serializers import CartItemSerializer
+
+
+class CartQuantitySerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(min_value=0)
+
+
+class CartAPIView(APIView):
+    """Resolves the caller's cart from their login or guest token"""
+
+    permission_classes = [permissions.AllowAny]
+
+    def get_cart(self, create=False):
+        return get_cart(self.request.user, self.request.headers.get(CART_TOKEN_HEADER), create=create)
+
+    def cart_response(self, cart, status_code=status.HTTP_200_OK):
+        summary = cart_summary(cart) if cart is not None else empty_summary()
+        token = cart.token if cart is not None else None
+        response = Response({**summary, "cart_token": token}, status=status_code)
+        if token:
+            response[CART_TOKEN_HEADER] = token
+        return response
+
+
+class CartView(CartAPIView):
+    """Read the cart with current prices and stock, or empty it"""
+
+    def get(self, request):
+        return self.cart_response(self.get_cart())
+
+    def delete(self, request):
+        cart = self.get_cart()
+        if cart is not None:
+            clear_cart(cart)
+        return self.cart_response(cart)
+
+
+class CartItemsView(CartAPIView):
+    """Add a size to the cart, e.g. 2x Barcelona Jersey (XL)"""
+
+    def post(self, request):
+        serializer = CartItemSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        cart = self.get_cart(create=True)
+        set_quantity(cart, serializer.validated_data['variant'], serializer.validated_data['quantity'], add=True)
+        return self.cart_response(cart, status.HTTP_201_CREATED)
+
+
+class CartItemView(CartAPIView):
+    """Change or remove one line; quantity 0 removes it"""
+
+    def _update(self, request, variant_id):
+        serializer = CartQuantitySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return self._set(variant_id, serializer.validated_data['quantity'])
+
+    def _set(self, variant_id, quantity):
+        variant = ProductVariant.objects.select_related('product').filter(pk=variant_id).first()
+        if variant is None:
+            return Response({"error": "Variant not found"}, status=status.HTTP_404_NOT_FOUND)
+        cart = self.get_cart(create=quantity > 0)
+        if cart is not None:
+            set_quantity(cart, variant, quantity)
+        return self.cart_response(cart)
+
+    def put(self, request, variant_id):
+        return self._update(request, variant_id)
+
+    def patch(self, request, variant_id):
+        return self._update(request, variant_id)
+
+    def delete(self, request, variant_id):
+        return self._set(variant_id, 0)
@@ -0,0 +1,50 @@
+"""
+Catalog snapshot endpoints, see store/snapshots.py
+"""
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .snapshots import build_snapshot, read_manifest, snapshot_file
+
+
+class CatalogSnapshotView(APIView):
+    """
+    Serve the pre-built catalog with a strong ETag
+
+    `catalog/` is the latest snapshot and must be revalidated;
+    `catalog/<version>/` never changes and may be cached for good.
+    """
+
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request, version=None):
+        immutable = version is not None
+        if version is None:
+            manifest = read_manifest() or build_snapshot()
+            version = manifest['version']
+
+        path, encoding = snapshot_file(version, request.headers.get('Accept-Encoding', ''))
+        if path is None:
+            return Response({"error": "Snapshot not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        # Strong ETags must differ between encodings of the same version
+        etag = f'"{version}-{encoding}"' if encoding else f'"{version}"'
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(path.read_bytes(), content_type='application/json')
+            if encoding:
+                response['Content-Encoding'] = encoding
+
+        response['ETag'] = etag
+        response['X-Catalog-Version'] = version
+        response['Cache-Control'] = (
+            'public, max-age=31536000, immutable' if immutable else 'public, max-age=0, must-revalidate'
+        )
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
@@ -0,0 +1,31 @@
+"""
+Catalog change feed endpoint, see store/changes.py
+"""
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .changes import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, changes_since
+
+
+class CatalogChangesView(APIView):
+    """
+    Products and variants changed after ?since=<token>
+
+    Start with since=0 for a full sync, apply the page, then ask again with
+    the returned `next` token while `has_more` is true.
+    """
+
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        try:
+            token = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return Response({"error": "since and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if token < 0 or limit < 1:
+            return Response({"error": "since must be >= 0 and limit >= 1"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(changes_since(token, min(limit, MAX_PAGE_SIZE), request))
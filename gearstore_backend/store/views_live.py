@@ -0,0 +1,27 @@
+"""
+Live stock stream for product pages, see store/live_stock.py
+"""
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .live_stock import stock_events
+from .models import Product
+
+
+async def product_stock_stream(request, product_id):
+    """Server-sent stock events for one product's variants (GET only, no auth)"""
+    if request.method != 'GET':
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    if not isinstance(request, ASGIRequest):
+        # WSGI would buffer the endless stream in a worker forever
+        return JsonResponse(
+            {"error": "Live stock needs the ASGI server (gearstore_backend.asgi:application)"}, status=501,
+        )
+    if not await Product.objects.filter(pk=product_id).aexists():
+        return JsonResponse({"error": "Product not found"}, status=404)
+
+    response = StreamingHttpResponse(stock_events(product_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
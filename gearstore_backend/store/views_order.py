@@ -0,0 +1,30 @@
+"""
+Order history for signed-in customers
+"""
+from rest_framework import viewsets, permissions
+from rest_framework.pagination import CursorPagination
+
+from .models import Order
+from .serializers import OrderSerializer
+
+
+class OrderCursorPagination(CursorPagination):
+    """Keyset pagination on -created_at, served by order_user_created_idx"""
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    ordering = '-created_at'
+
+
+class OrderViewSet(viewsets.ReadOnlyModelViewSet):
+    """API for fans to read their own orders, newest first"""
+
+    serializer_class = OrderSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderCursorPagination
+    lookup_field = 'order_id'
+
+    def get_queryset(self):
+        # Items for the whole page come from one prefetch query
+        return Order.objects.filter(user=self.request.user).prefetch_related('items')
@@ -9,18 +9,27 @@ from django.utils.decorators import method_decorator
 from django.conf import settings
 import uuid
 import json
+import hmac
+import hashlib
 import logging
 
-from .models import ProductVariant
+from .models import ProductVariant, Order
+from .orders import mark_order_paid
+from .admission import WaitingRoomMixin
 from .serializers import CartItemSerializer
 from .payment import PaystackAPI, generate_payment_reference
+from .quotes import NAIRA_PER_USD, QUOTE_EXPIRED, get_quote
+from gearstore_backend.throttling import GCRAIPThrottle, GCRAEmailThrottle
+from gearstore_backend.metrics import CHECKOUT_STOCK_REJECTIONS, CHECKOUT_VALIDATION_FAILURES
 
 logger = logging.getLogger(__name__)
 
-class InitializePaymentView(APIView):
+class InitializePaymentView(WaitingRoomMixin, APIView):
     """Initialize Paystack payment"""
     
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [GCRAIPThrottle, GCRAEmailThrottle]
+    throttle_scope = 'checkout'
     
     def post(self, request):
         """
@@ -43,6 +52,9 @@ class InitializePaymentView(APIView):
                 "delivery_zone": "lagos-mainland"
             }
         }
+
+        Send "quote_id" from checkout/quote/ instead of "cart_items" and
+        "delivery_fee" to reuse its pricing and stock check.
         """
         # Log incoming request for debugging
         logger.info(f"Payment initialization request: {request.data}")
@@ -50,11 +62,23 @@ class InitializePaymentView(APIView):
         email = request.data.get('email')
         if not email:
             logger.error("Email is missing from request")
+            CHECKOUT_VALIDATION_FAILURES.inc(endpoint='payment_initialize')
             return Response(
                 {"error": "Email is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        customer_info = request.data.get('customer_info', {})
+        if 'quote_id' in request.data:
+            quote = get_quote(request.data.get('quote_id'))
+            if quote is None:
+                CHECKOUT_VALIDATION_FAILURES.inc(endpoint='payment_initialize')
+                return Response(QUOTE_EXPIRED, status=status.HTTP_400_BAD_REQUEST)
+            return self.initialize(
+                request, email, customer_info, quote['items'],
+                quote['subtotal'], quote['delivery_fee'], quote['total'],
+            )
+
         # Validate cart items
         cart_items_serializer = CartItemSerializer(
             data=request.data.get('cart_items', []),
@@ -63,14 +87,14 @@ class InitializePaymentView(APIView):
         
         if not cart_items_serializer.is_valid():
             logger.error(f"Cart items validation failed: {cart_items_serializer.errors}")
+            CHECKOUT_VALIDATION_FAILURES.inc(endpoint='payment_initialize')
             return Response(
                 cart_items_serializer.errors,
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get delivery fee and customer info
+        # Get delivery fee
         delivery_fee = float(request.data.get('delivery_fee', 0))
-        customer_info = request.data.get('customer_info', {})
         
         # Calculate total and validate stock
         subtotal = 0
@@ -81,17 +105,18 @@ class InitializePaymentView(APIView):
             quantity = item['quantity']
             
             # Check stock
-            if variant.stock < quantity:
+            if variant.available_stock < quantity:
+                CHECKOUT_STOCK_REJECTIONS.inc(endpoint='payment_initialize')
                 return Response(
                     {
-                        "error": f"Insufficient stock for {variant.product.name} - {variant.size}. Available: {variant.stock}"
+                        "error": f"Insufficient stock for {variant.product.name} - {variant.size}. Available: {variant.available_stock}"
                     },
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
             # Calculate price (convert to Naira, assuming prices are in USD)
             price = variant.price_override if variant.price_override else variant.product.base_price
-            price_naira = float(price) * 1600  # Convert USD to Naira
+            price_naira = float(price) * NAIRA_PER_USD  # Convert USD to Naira
             item_subtotal = price_naira * quantity
             subtotal += item_subtotal
             
@@ -105,7 +130,10 @@ class InitializePaymentView(APIView):
         
         # Calculate total with delivery
         total = subtotal + delivery_fee
-        
+        return self.initialize(request, email, customer_info, items_data, subtotal, delivery_fee, total)
+
+    def initialize(self, request, email, customer_info, items_data, subtotal, delivery_fee, total):
+        """Create the Paystack transaction for an already priced cart"""
         # Generate order reference
         order_id = f"AGS-{uuid.uuid4().hex[:8].upper()}"
         payment_reference = generate_payment_reference(order_id)
@@ -184,6 +212,9 @@ class VerifyPaymentView(APIView):
             
             # Check if payment was successful
             if data.get('status') == 'success':
+                order = Order.objects.filter(payment_reference=data.get('reference')).first()
+                if order:
+                    mark_order_paid(order)
                 # TODO: Create order in database
                 # TODO: Update stock
                 # TODO: Award loyalty points if user is authenticated
@@ -230,18 +261,27 @@ class PaymentWebhookView(APIView):
         - transfer.success
         - transfer.failed
         """
-        # TODO: Verify webhook signature
         # TODO: Handle different event types
-        # TODO: Update order status
-        # TODO: Send confirmation emails
+        # Confirmation emails are queued by mark_order_paid (store/outbox.py)
+        
+        signature = request.headers.get('X-Paystack-Signature', '')
+        expected = hmac.new(
+            settings.PAYSTACK_SECRET_KEY.encode(),
+            request.body,
+            hashlib.sha512
+        ).hexdigest()
+        if not hmac.compare_digest(signature, expected):
+            logger.warning("Rejected Paystack webhook with invalid signature")
+            return Response({"status": "invalid signature"}, status=status.HTTP_400_BAD_REQUEST)
         
         event = request.data.get('event')
-        data = request.data.get('data')
+        data = request.data.get('data') or {}
         
         if event == 'charge.success':
             # Payment successful
             reference = data.get('reference')
-            # Process order...
-            pass
+            order = Order.objects.filter(payment_reference=reference).first()
+            if order:
+                mark_order_paid(order)
         
         return Response({"status": "received"}, status=status.HTTP_200_OK)
@@ -0,0 +1,62 @@
+"""
+Admin sales reports served from the precomputed rollup tables
+"""
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status, permissions
+from django.db.models import Sum
+from django.utils.dateparse import parse_date
+
+from .models import DailyProductSales, DailyTeamSales
+
+
+class _SalesReportView(APIView):
+    """Sum a rollup table over ?start=YYYY-MM-DD&end=YYYY-MM-DD"""
+
+    permission_classes = [permissions.IsAdminUser]
+    model = None
+    group_by = ()
+
+    def get(self, request):
+        queryset = self.model.objects.all()
+
+        for param, lookup in (('start', 'date__gte'), ('end', 'date__lte')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    parsed = parse_date(value)
+                except ValueError:
+                    # Well formed but not a real day, e.g. 2026-02-30
+                    parsed = None
+                if parsed is None:
+                    return Response(
+                        {"error": f"Invalid {param} date, expected YYYY-MM-DD"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                queryset = queryset.filter(**{lookup: parsed})
+
+        if request.query_params.get('daily') == 'true':
+            group_by = ('date',) + self.group_by
+        else:
+            group_by = self.group_by
+
+        rows = (
+            queryset.values(*group_by)
+            .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+            .order_by('-revenue', *group_by)
+        )
+        return Response({"results": list(rows)})
+
+
+class ProductSalesReportView(_SalesReportView):
+    """Units and revenue per product and size"""
+
+    model = DailyProductSales
+    group_by = ('product_name', 'variant_size')
+
+
+class TeamSalesReportView(_SalesReportView):
+    """Units and revenue per team"""
+
+    model = DailyTeamSales
+    group_by = ('team',)
@@ -1,7 +1,11 @@
 from rest_framework.generics import CreateAPIView, RetrieveUpdateAPIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from gearstore_backend.throttling import GCRAIPThrottle, GCRAEmailThrottle
 from django.contrib.auth.models import User
+from store.carts import CART_TOKEN_HEADER, merge_guest_cart
 from .models import UserProfile
 from .serializers import RegisterSerializer, UserProfileSerializer
 
@@ -10,11 +14,26 @@ class RegisterView(CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [GCRAIPThrottle, GCRAEmailThrottle]
+    throttle_scope = 'register'
 
 
 class LoginView(TokenObtainPairView):
     permission_classes = [AllowAny]
 
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        # Carry the guest cart over to the fan's account
+        guest_token = request.headers.get(CART_TOKEN_HEADER)
+        if guest_token:
+            merge_guest_cart(guest_token, serializer.user)
+        return Response(serializer.validated_data)
+
 
 class ProfileView(RetrieveUpdateAPIView):
     serializer_class = UserProfileSerializer
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+Concurrent load generator for the browse-to-checkout flow
+
+Grows the sequential walk in test_checkout.py (product list -> variants ->
+payment init) into many asyncio virtual users with ramp-up and a browse-heavy
+traffic mix, then reports throughput, latency percentiles and error rates per
+endpoint.
+
+Point the backend at the local Paystack stub first, so load never reaches
+the real gateway:
+
+    cd gearstore_backend
+    python manage.py paystack_stub --port 8099 &
+    PAYSTACK_BASE_URL=http://127.0.0.1:8099 python manage.py runserver
+
+Then, from the repository root:
+
+    pip install httpx
+    python load_checkout.py --users 200 --ramp-up 30 --duration 120
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+from test_checkout import build_payment_payload
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'gearstore_backend'))
+from store.stats import percentile  # noqa: E402
+
+SEARCH_TERMS = ['Jersey', 'Cleats', 'Barcelona', 'Arsenal', 'Away']
+
+
+class Stats:
+    """Latency samples and errors per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, seconds, ok):
+        self.latencies[endpoint].append(seconds * 1000)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def report(self, elapsed):
+        print(f"\n{'endpoint':<22}{'requests':>10}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+        total = 0
+        total_errors = 0
+        for endpoint in sorted(self.latencies):
+            samples = self.latencies[endpoint]
+            errors = self.errors[endpoint]
+            total += len(samples)
+            total_errors += errors
+            print(
+                f"{endpoint:<22}{len(samples):>10}{len(samples) / elapsed:>9.1f}"
+                f"{percentile(samples, 50):>10.1f}{percentile(samples, 95):>10.1f}"
+                f"{percentile(samples, 99):>10.1f}{errors / len(samples):>9.1%}"
+            )
+        if total:
+            print(f"\nTotal: {total} requests in {elapsed:.1f}s = {total / elapsed:.1f} req/s, "
+                  f"{total_errors / total:.2%} errors")
+
+
+class VirtualUser:
+    """One shopper: browse the catalog, sometimes check out"""
+
+    def __init__(self, user_id, client, api_url, stats, args):
+        self.user_id = user_id
+        self.client = client
+        self.api_url = api_url
+        self.stats = stats
+        self.args = args
+        self.rng = random.Random(args.seed + user_id)
+
+    async def request(self, endpoint, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, f"{self.api_url}{path}", **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response = None
+            ok = False
+        self.stats.record(endpoint, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    async def think(self):
+        await asyncio.sleep(self.rng.expovariate(1 / self.args.think_time))
+
+    async def session(self):
+        """One visit: list -> maybe search -> detail -> variants -> maybe checkout"""
+        response = await self.request('product_list', 'GET', '/products/')
+        if response is None:
+            return
+        products = response.json()
+        products = products.get('results', products) if isinstance(products, dict) else products
+        if not products:
+            return
+        await self.think()
+
+        if self.rng.random() < self.args.search_ratio:
+            await self.request('product_search', 'GET', '/products/',
+                               params={'search': self.rng.choice(SEARCH_TERMS)})
+            await self.think()
+
+        product = self.rng.choice(products)
+        await self.request('product_detail', 'GET', f"/products/{product['id']}/")
+        await self.think()
+
+        response = await self.request('product_variants', 'GET', f"/products/{product['id']}/variants/")
+        if response is None:
+            return
+        in_stock = [v for v in response.json() if v['stock'] > 0]
+        if not in_stock or self.rng.random() >= self.args.checkout_ratio:
+            return
+        await self.think()
+
+        variant = self.rng.choice(in_stock)
+        payload = build_payment_payload(variant['id'], email=f"load-{self.user_id}@example.com")
+        await self.request('payment_initialize', 'POST', '/payment/initialize/', json=payload)
+
+    async def run(self, deadline):
+        while time.monotonic() < deadline:
+            await self.session()
+            await self.think()
+
+
+async def main(args):
+    stats = Stats()
+    api_url = f"{args.base_url.rstrip('/')}/api/store"
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    timeout = httpx.Timeout(args.timeout)
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        start = time.monotonic()
+        deadline = start + args.duration
+        tasks = []
+        for user_id in range(args.users):
+            # Linear ramp-up: user N starts at N/users of the ramp window
+            delay = args.ramp_up * user_id / args.users
+            user = VirtualUser(user_id, client, api_url, stats, args)
+            tasks.append(asyncio.create_task(_delayed(delay, user.run(deadline))))
+        print(f"Running {args.users} virtual users for {args.duration}s (ramp-up {args.ramp_up}s) "
+              f"against {api_url}")
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - start
+
+    stats.report(elapsed)
+
+
+async def _delayed(delay, coro):
+    await asyncio.sleep(delay)
+    await coro
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--users', type=int, default=50, help='Concurrent virtual users')
+    parser.add_argument('--ramp-up', type=float, default=10, help='Seconds to start all users')
+    parser.add_argument('--duration', type=float, default=60, help='Total test length in seconds')
+    parser.add_argument('--think-time', type=float, default=1.0, help='Mean pause between steps (s)')
+    parser.add_argument('--search-ratio', type=float, default=0.3, help='Fraction of visits that search')
+    parser.add_argument('--checkout-ratio', type=float, default=0.1,
+                        help='Fraction of visits that reach payment initialization')
+    parser.add_argument('--max-connections', type=int, default=100)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -2,6 +2,8 @@
 """
 Test script to verify checkout system is working
 Run this from the gearstore_backend directory
+
+For concurrent load, see load_checkout.py
 """
 
 import requests
@@ -48,16 +50,14 @@ def test_product_variants(product_id):
         print(f"   ❌ Failed: {response.status_code}")
         return []
 
-def test_payment_initialization(variant_id):
-    """Test payment initialization"""
-    print(f"\n3. Testing payment initialization with variant {variant_id}...")
-    
-    payload = {
-        "email": "test@example.com",
+def build_payment_payload(variant_id, email="test@example.com", quantity=1):
+    """Payment initialization payload as sent by the checkout page"""
+    return {
+        "email": email,
         "cart_items": [
             {
                 "variant_id": variant_id,
-                "quantity": 1
+                "quantity": quantity
             }
         ],
         "delivery_fee": 2000,
@@ -72,6 +72,12 @@ def test_payment_initialization(variant_id):
             "additional_info": "Test order"
         }
     }
+
+def test_payment_initialization(variant_id):
+    """Test payment initialization"""
+    print(f"\n3. Testing payment initialization with variant {variant_id}...")
+    
+    payload = build_payment_payload(variant_id)
     
     print(f"   Payload: {json.dumps(payload, indent=2)}")
     